@@ -0,0 +1,207 @@
+import os
+import math
+import time
+import hashlib
+from typing import Dict, List, Optional, Tuple
+from rq.registry import DeferredJobRegistry, ScheduledJobRegistry, StartedJobRegistry
+from rq.worker_registration import WORKERS_BY_QUEUE_KEY
+from app.redis_client import get_redis_connection, get_queue
+from app.pipeline import inflight_ttl
+from app.analysis_cache import ACTIVE_STATUSES
+from app.job_store import JobStore
+
+THROUGHPUT_PREFIX = "analysis:throughput:"
+CLIENT_PREFIX = "analysis:client:"
+# Holds a client's slot between admission and the enqueue that fills it with a job id
+RESERVATION_PREFIX = "reserved:"
+RESERVATION_TTL = 60
+
+# Claims a slot in the client's in-flight set unless it is full, in one step so
+# concurrent requests of one client can't both take the last slot.
+# KEYS[1]: client set; ARGV: now, expired-before score, limit, reservation, key TTL
+RESERVE_SCRIPT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], 0, ARGV[2])
+local inflight = redis.call('ZCARD', KEYS[1])
+if inflight >= tonumber(ARGV[3]) then
+    return inflight
+end
+redis.call('ZADD', KEYS[1], ARGV[1], ARGV[4])
+redis.call('EXPIRE', KEYS[1], ARGV[5])
+return -1
+"""
+
+# Used until a stage has recent completions to learn from
+DEFAULT_STAGE_SECONDS: Dict[str, float] = {"fetch": 20.0, "score": 5.0, "llm": 90.0, "analysis": 120.0}
+STAGE_QUEUE_NAMES: Dict[str, str] = {"fetch": "github", "score": "score", "llm": "llm", "analysis": "default"}
+
+def record_stage_duration(stage: str, seconds: float, window_seconds: Optional[int] = None) -> None:
+    """
+    Records one completed run of a pipeline stage (called by the worker).
+    Samples older than the admission window are dropped.
+    """
+    window = window_seconds or int(os.getenv("ADMISSION_WINDOW_SECONDS", "900"))
+    key = f"{THROUGHPUT_PREFIX}{stage}"
+    now = time.time()
+    pipe = get_redis_connection().pipeline()
+    pipe.zadd(key, {f"{now:.6f}:{seconds:.3f}": now})
+    pipe.zremrangebyscore(key, 0, now - window)
+    pipe.zremrangebyrank(key, 0, -501) # Keep at most 500 samples
+    pipe.expire(key, window * 2)
+    pipe.execute()
+
+def client_id_for(api_key: Optional[str], remote_addr: Optional[str]) -> str:
+    """Clients are identified by API key if given, else by address (hashed either way)."""
+    raw = f"key:{api_key}" if api_key else f"addr:{remote_addr or 'unknown'}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+class AdmissionRejected(Exception):
+    """Raised when a new analysis is not admitted; maps to HTTP 429."""
+    def __init__(self, reason: str, message: str, retry_after: int, eta_seconds: Optional[float] = None):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+        self.eta_seconds = eta_seconds
+
+class AdmissionController:
+    """
+    Admission control for new analyses.
+
+    The expected wait of a new analysis is estimated per stage from queue depth
+    (queued, deferred, scheduled and running jobs), the number of workers on the
+    stage's queue and the mean duration of the stage's recent runs. Requests are
+    rejected when that exceeds `ADMISSION_MAX_WAIT_SECONDS`, keeping latency of
+    admitted jobs bounded, or when the client already has
+    `ADMISSION_CLIENT_MAX_INFLIGHT` analyses running. While the system is
+    loaded, each client is limited to one in-flight analysis so a single heavy
+    client can't crowd out the others.
+    """
+    def __init__(self, job_store: Optional[JobStore] = None):
+        self.connection = get_redis_connection()
+        self.job_store = job_store or JobStore()
+        self.max_wait_seconds = float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "600"))
+        self.client_max_inflight = int(os.getenv("ADMISSION_CLIENT_MAX_INFLIGHT", "3"))
+        self.inflight_ttl = inflight_ttl()
+
+    def stage_load(self, stages: List[str]) -> Dict[str, Dict[str, float]]:
+        """Backlog, worker count and mean duration per stage, read in one round trip."""
+        pipe = self.connection.pipeline(transaction=False)
+        for stage in stages:
+            queue = get_queue(STAGE_QUEUE_NAMES[stage])
+            pipe.llen(queue.key)
+            for registry_class in (StartedJobRegistry, DeferredJobRegistry, ScheduledJobRegistry):
+                pipe.zcard(registry_class(queue.name, connection=self.connection).key)
+            pipe.scard(WORKERS_BY_QUEUE_KEY % queue.name)
+            pipe.zrange(f"{THROUGHPUT_PREFIX}{stage}", 0, -1)
+        replies = pipe.execute()
+
+        load = {}
+        for index, stage in enumerate(stages):
+            queued, started, deferred, scheduled, workers, samples = replies[index * 6:(index + 1) * 6]
+            durations = [float(s.split(b":")[1]) for s in samples]
+            avg_seconds = sum(durations) / len(durations) if durations else DEFAULT_STAGE_SECONDS[stage]
+            backlog = queued + started + deferred + scheduled
+            load[stage] = {
+                "backlog": backlog,
+                "workers": workers,
+                "avg_seconds": round(avg_seconds, 3),
+                # Time until a new job reaches the front, plus its own run
+                "wait_seconds": round(backlog * avg_seconds / max(workers, 1) + avg_seconds, 3)
+            }
+        return load
+
+    def estimate_wait(self, staged: bool = True) -> Tuple[float, Dict[str, Dict[str, float]]]:
+        stages = ["fetch", "score", "llm"] if staged else ["analysis"]
+        load = self.stage_load(stages)
+        return round(sum(s["wait_seconds"] for s in load.values()), 1), load
+
+    def _client_key(self, client_id: str) -> str:
+        return f"{CLIENT_PREFIX}{client_id}"
+
+    def client_inflight(self, client_id: str) -> List[str]:
+        """The client's analyses that are still queued or running, and its pending reservations."""
+        key = self._client_key(client_id)
+        now = time.time()
+        self.connection.zremrangebyscore(key, 0, now - self.inflight_ttl)
+        active, done = [], []
+        for member, score in self.connection.zrange(key, 0, -1, withscores=True):
+            member = member.decode("utf-8")
+            if member.startswith(RESERVATION_PREFIX):
+                alive = score > now - RESERVATION_TTL
+            else:
+                alive = self.job_store.get_status(member) in ACTIVE_STATUSES
+            (active if alive else done).append(member)
+        if done:
+            self.connection.zrem(key, *done)
+        return active
+
+    def check(self, client_id: str, staged: bool = True, reservation: Optional[str] = None) -> float:
+        """
+        Admits or rejects a new analysis for `client_id`.
+
+        With `reservation`, the admitted analysis takes one of the client's slots
+        under that name until `register` (or `release`) replaces it.
+
+        Returns:
+            float: The estimated seconds until the report is ready.
+
+        Raises:
+            AdmissionRejected: If the system is overloaded or the client is over quota.
+        """
+        eta, load = self.estimate_wait(staged)
+        if eta > self.max_wait_seconds:
+            retry_after = min(max(math.ceil(eta - self.max_wait_seconds), 1), 3600)
+            raise AdmissionRejected(
+                "overloaded",
+                f"Analysis queue is full (estimated wait {int(eta)}s). Try again in {retry_after} seconds.",
+                retry_after, eta
+            )
+
+        # Fair share: under load, clients get one analysis at a time
+        loaded = eta > self.max_wait_seconds / 2
+        limit = 1 if loaded else self.client_max_inflight
+        inflight = len(self.client_inflight(client_id)) # Also drops finished jobs from the set
+        if reservation is not None:
+            inflight = self._claim(client_id, reservation, limit)
+        if inflight >= limit:
+            bottleneck = max(load.values(), key=lambda s: s["avg_seconds"])
+            retry_after = min(max(math.ceil(bottleneck["avg_seconds"]), 1), 3600)
+            raise AdmissionRejected(
+                "client_quota",
+                f"Too many analyses in progress for this client ({inflight}/{limit}). Try again in {retry_after} seconds.",
+                retry_after, eta
+            )
+        return eta
+
+    def _claim(self, client_id: str, reservation: str, limit: int) -> int:
+        """Reserves a slot; returns -1 if it was taken, else the client's in-flight count."""
+        now = time.time()
+        claimed = self.connection.eval(
+            RESERVE_SCRIPT, 1, self._client_key(client_id),
+            now, now - self.inflight_ttl, limit, f"{RESERVATION_PREFIX}{reservation}", self.inflight_ttl
+        )
+        return int(claimed)
+
+    def reserve(self, client_id: str, reservation: str) -> bool:
+        """
+        Takes one of the client's `ADMISSION_CLIENT_MAX_INFLIGHT` slots without a
+        load estimate (used for batch members as they start). False if none is free.
+        """
+        self.client_inflight(client_id)
+        return self._claim(client_id, reservation, self.client_max_inflight) < 0
+
+    def register(self, client_id: str, job_id: str, reservation: Optional[str] = None) -> None:
+        """Records the client's new job, in place of its reservation if it holds one."""
+        key = self._client_key(client_id)
+        pipe = self.connection.pipeline()
+        if reservation is not None:
+            pipe.zrem(key, f"{RESERVATION_PREFIX}{reservation}")
+        pipe.zadd(key, {job_id: time.time()})
+        pipe.expire(key, self.inflight_ttl)
+        pipe.execute()
+
+    def release(self, client_id: str, reservation: Optional[str] = None, job_id: Optional[str] = None) -> None:
+        """Gives back a reserved slot whose job was never enqueued, or the slot of a settled job."""
+        members = [f"{RESERVATION_PREFIX}{reservation}"] if reservation else []
+        members += [job_id] if job_id else []
+        if members:
+            self.connection.zrem(self._client_key(client_id), *members)
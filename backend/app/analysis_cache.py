@@ -0,0 +1,130 @@
+import os
+import json
+import hashlib
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+from app.redis_client import get_redis_connection
+from app.pipeline import inflight_ttl
+from app.job_store import JobStore
+from app.cancellation import is_cancel_requested, subscribe
+
+ACTIVE_STATUSES = {"queued", "started", "deferred", "scheduled"}
+
+def analysis_key(username: str, model: str, options: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Stable key for identical analysis requests. Usernames are case-insensitive on GitHub.
+    """
+    payload = json.dumps({"u": username.lower(), "m": model, "o": options or {}}, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+class AnalysisCoalescer:
+    """
+    Single-flight deduplication and TTL result cache for analysis jobs.
+
+    Identical requests share the in-flight job, and finished reports are reused
+    until `ANALYSIS_CACHE_TTL` expires. Enqueueing happens under a short Redis
+    lock so a burst of identical requests creates exactly one job.
+    """
+    PREFIX = "analysis:"
+
+    def __init__(self, job_store: Optional[JobStore] = None):
+        self.connection = get_redis_connection()
+        self.job_store = job_store or JobStore()
+        self.cache_ttl = int(os.getenv("ANALYSIS_CACHE_TTL", "3600"))
+        self.inflight_ttl = inflight_ttl()
+
+    def _inflight_key(self, key: str) -> str:
+        return f"{self.PREFIX}inflight:{key}"
+
+    def _cache_key(self, key: str) -> str:
+        return f"{self.PREFIX}cache:{key}"
+
+    def _lock_key(self, key: str) -> str:
+        return f"{self.PREFIX}lock:{key}"
+
+    def _pointer(self, redis_key: str) -> Tuple[Optional[str], Optional[str]]:
+        """The job id stored at `redis_key` and its status; stale pointers are removed."""
+        job_id = self.connection.get(redis_key)
+        if not job_id:
+            return None, None
+        job_id = job_id.decode("utf-8")
+        status = self.job_store.get_status(job_id)
+        # Stale pointer: the job expired, failed or was otherwise lost. Active jobs are
+        # kept, since the worker promotes a job to the cache just before RQ marks it finished.
+        if status != "finished" and status not in ACTIVE_STATUSES:
+            self.connection.delete(redis_key)
+            return None, None
+        return job_id, status
+
+    def _live_job(self, redis_key: str, statuses: Set[str]) -> Optional[str]:
+        """Returns the job id stored at `redis_key` if that job is in one of `statuses`."""
+        job_id, status = self._pointer(redis_key)
+        return job_id if status in statuses else None
+
+    def cached(self, key: str) -> Optional[str]:
+        """Returns the finished job cached for `key`, if any."""
+        return self._live_job(self._cache_key(key), {"finished"})
+
+    def _existing(self, key: str, force_refresh: bool) -> Tuple[Optional[str], Optional[str]]:
+        cached, status = self._pointer(self._cache_key(key))
+        if cached and status == "finished" and not force_refresh:
+            return cached, "cache"
+        if cached and status in ACTIVE_STATUSES:
+            # Promoted by mark_finished while RQ is still storing the result: shared like any in-flight job
+            return cached, "inflight"
+        inflight = self._live_job(self._inflight_key(key), ACTIVE_STATUSES)
+        # A cancelled job may still be running until its next checkpoint; it isn't shared
+        if inflight and not is_cancel_requested(inflight):
+            return inflight, "inflight"
+        return None, None
+
+    def _join(self, job_id: str, source: str, subscriber: Optional[str]) -> bool:
+        """Subscribes to a shared job; False if it was cancelled in the meantime."""
+        if source == "cache" or subscriber is None:
+            return True
+        return subscribe(job_id, subscriber)
+
+    def submit(self, key: str, enqueue: Callable[[], str], force_refresh: bool = False,
+               subscriber: Optional[str] = None) -> Tuple[str, str]:
+        """
+        Returns an existing job for `key` or enqueues a new one.
+
+        Args:
+            key (str): Request key from `analysis_key`.
+            enqueue: Callable that enqueues the job and returns its id.
+            force_refresh (bool): Skip the finished-result cache (in-flight jobs are still shared).
+            subscriber (str, optional): Recorded as waiting for the new or in-flight job;
+                the job is only cancelled once all its subscribers have left (see app/cancellation.py).
+
+        Returns:
+            Tuple[str, str]: The job id and its source: "cache", "inflight" or "new".
+        """
+        job_id, source = self._existing(key, force_refresh)
+        if job_id and self._join(job_id, source, subscriber):
+            return job_id, source
+
+        # If the lock can't be acquired in time we still enqueue rather than fail the request
+        lock = self.connection.lock(self._lock_key(key), timeout=10, blocking_timeout=5)
+        acquired = lock.acquire()
+        try:
+            # Someone may have enqueued while we waited for the lock
+            job_id, source = self._existing(key, force_refresh)
+            if job_id and self._join(job_id, source, subscriber):
+                return job_id, source
+
+            job_id = enqueue()
+            self.connection.set(self._inflight_key(key), job_id, ex=self.inflight_ttl)
+            self._join(job_id, "new", subscriber)
+            return job_id, "new"
+        finally:
+            if acquired:
+                lock.release()
+
+    def mark_finished(self, key: str, job_id: str) -> None:
+        """Called by the worker once a job succeeded: promote it to the result cache."""
+        pipe = self.connection.pipeline()
+        pipe.set(self._cache_key(key), job_id, ex=self.cache_ttl)
+        pipe.delete(self._inflight_key(key))
+        pipe.execute()
+
+    def mark_failed(self, key: str) -> None:
+        self.connection.delete(self._inflight_key(key))
@@ -1,36 +1,230 @@
-from flask import Blueprint, jsonify, request
-from app.redis_client import get_queue
-from app.tasks import run_analysis_task
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from app.redis_client import get_queue, get_redis_connection
+from app.tasks import run_analysis_task, get_github_provider, github_budget
+from app.pipeline import enqueue_analysis, analysis_job_ids
 from app.job_store import JobStore
+from app.repository_store import RepositoryStore, RAW_REPOSITORY_FIELDS
+from app.analysis_cache import AnalysisCoalescer, analysis_key
+from app.admission import AdmissionController, AdmissionRejected, client_id_for
+from app.progress import iter_progress_events
+from app.cancellation import request_cancel, unsubscribe, subscriber_count
+from app.tracing import collect_job_traces
+from app.profiling import ProfileStore, MODES as PROFILE_MODES, parse_mode as parse_profile_mode
+from app import metrics
+from app.batch import BatchCoordinator, iter_batch_events
+from app.history_store import get_history_store
+from app.http_encoding import pick_encoding
+from app.services.llm_provider import allowed_models
+import hashlib
+import time
+import uuid
 import os
+import re
 
 api_bp = Blueprint('api', __name__)
 job_store = JobStore()
+repository_store = RepositoryStore()
+coalescer = AnalysisCoalescer(job_store)
+admission = AdmissionController(job_store)
+batches = BatchCoordinator(job_store, coalescer, github_budget=github_budget, admission=admission)
+
+USERNAME_PATTERN = re.compile(r"^[A-Za-z0-9](?:[A-Za-z0-9-]{0,38})$")
+
+def _unknown_model(model):
+    # Model names end up in metric labels and provider caches, so only configured ones are accepted
+    return jsonify({"error": f"Unknown model {model!r}; available: {', '.join(allowed_models())}"}), 400
+
+@api_bp.route('/analyze/batch', methods=['POST'])
+def analyze_batch():
+    """
+    Starts a batch analysis of `usernames` (a list) or of the public members of `org`.
+    Members share the single-request cache and are scheduled against the GitHub
+    rate limit; progress, per-user results and an org-level aggregate are served
+    under the returned batch id.
+    """
+    data = request.get_json(silent=True) or {}
+    llm_model = data.get('model', 'llama3')
+    force_refresh = bool(data.get('force_refresh', False))
+    org = data.get('org')
+    usernames = data.get('usernames')
+    max_users = int(os.getenv("BATCH_MAX_USERS", "500"))
+    if llm_model not in allowed_models():
+        return _unknown_model(llm_model)
+
+    if bool(org) == bool(usernames):
+        return jsonify({"error": "Provide either 'usernames' (a list) or 'org'"}), 400
+    try:
+        if org:
+            if not isinstance(org, str) or not USERNAME_PATTERN.match(org):
+                return jsonify({"error": "Invalid organization name"}), 400
+            usernames = get_github_provider().get_org_members(org, limit=max_users)
+            if not usernames:
+                return jsonify({"error": f"Organization '{org}' has no public members"}), 404
+        elif not isinstance(usernames, list) or not all(isinstance(u, str) and USERNAME_PATTERN.match(u) for u in usernames):
+            return jsonify({"error": "'usernames' must be a list of GitHub usernames"}), 400
+        if len(usernames) > max_users:
+            return jsonify({"error": f"At most {max_users} users per batch"}), 400
+
+        client_id = client_id_for(request.headers.get('X-API-Key'), request.access_route[0] if request.access_route else None)
+        admission.check(client_id)
+        # Members then take the client's in-flight slots as they start (see BatchCoordinator)
+        batch_id = batches.create(usernames, llm_model, org=org, force_refresh=force_refresh, client_id=client_id)
+        return jsonify({
+            "message": "Batch started",
+            "batch_id": batch_id,
+            "total": len({u.lower() for u in usernames}),
+            "status_url": f"/api/batches/{batch_id}",
+            "stream_url": f"/api/batches/{batch_id}/stream"
+        }), 202
+    except AdmissionRejected as e:
+        response = jsonify({"error": str(e), "reason": e.reason, "retry_after": e.retry_after, "eta_seconds": e.eta_seconds})
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 429
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 404
+    except Exception as e:
+        return jsonify({"error": "Failed to start batch", "details": str(e)}), 500
+
+@api_bp.route('/batches/<batch_id>', methods=['GET'])
+def get_batch_status(batch_id):
+    """Batch progress, per-user results so far and the aggregate over them."""
+    try:
+        state = batches.state(batch_id)
+        if state is None:
+            return jsonify({"error": "Batch not found"}), 404
+        return jsonify(state)
+    except Exception as e:
+        return jsonify({"error": "Internal Server Error", "details": str(e)}), 500
+
+@api_bp.route('/batches/<batch_id>/stream', methods=['GET'])
+def stream_batch(batch_id):
+    """Server-Sent Events: `member` per finished user, `progress` counts, then `aggregate`."""
+    if batches.state(batch_id) is None:
+        return jsonify({"error": "Batch not found"}), 404
+    response = Response(stream_with_context(iter_batch_events(batch_id, batches)), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 @api_bp.route('/analyze/<username>', methods=['POST'])
 def analyze_profile(username):
     """
     Enqueues an analysis task for the given username.
+    Identical requests (username, model, options) share one job, and a recent
+    finished report is returned directly unless `force_refresh` is set.
+    New jobs go through admission control and may be rejected with 429 + Retry-After.
+    With `deadline` (seconds) the report is ready by then, built from whatever
+    was analyzed in time (see `details.coverage`); a cached full report is preferred.
+    With `profile` (true, "deterministic" or "sampling") the jobs run under the
+    profiler; see GET /api/jobs/<job_id>/profile.
     """
     try:
         # Get query params from the POST request (or JSON body? usually params in URL or body)
         # The previous GET used request.args. Let's support JSON body for POST.
         data = request.get_json() or {}
         llm_model = data.get('model', 'llama3')
+        if llm_model not in allowed_models():
+            return _unknown_model(llm_model)
+        force_refresh = bool(data.get('force_refresh', False))
+        options = {k: v for k, v in data.items() if k not in ('model', 'force_refresh')}
+        key = analysis_key(username, llm_model, options)
+
+        profile = data.get('profile')
+        profile_mode = parse_profile_mode(profile)
+        if profile not in (None, False) and profile_mode is None:
+            return jsonify({"error": f"profile must be true or one of: {', '.join(PROFILE_MODES)}"}), 400
+
+        deadline = data.get('deadline')
+        if deadline is not None:
+            max_deadline = int(os.getenv("ANALYSIS_MAX_DEADLINE", "600"))
+            if isinstance(deadline, bool) or not isinstance(deadline, (int, float)) or not 1 <= deadline <= max_deadline:
+                return jsonify({"error": f"deadline must be a number of seconds between 1 and {max_deadline}"}), 400
+            if not force_refresh:
+                full_key = analysis_key(username, llm_model, {k: v for k, v in options.items() if k != 'deadline'})
+                cached = coalescer.cached(full_key)
+                if cached:
+                    metrics.inc("analysis_requests_total", source="cache")
+                    return jsonify({
+                        "message": "Cached analysis available",
+                        "job_id": cached,
+                        "source": "cache",
+                        "status_url": f"/api/status/{cached}"
+                    }), 200
+        # A deadline spans all stages, so those analyses run as a single job
+        staged = os.getenv("ANALYSIS_STAGED", "1") != "0" and deadline is None
+        client_id = client_id_for(request.headers.get('X-API-Key'), request.access_route[0] if request.access_route else None)
+        admitted = {}
         
-        # Enqueue the job
-        queue = get_queue()
-        job = queue.enqueue(
-            run_analysis_task,
-            args=(username, llm_model),
-            job_timeout='10m' # Allow 10 mins for analysis
-        )
-        
-        return jsonify({
-            "message": "Analysis enqueued",
-            "job_id": job.get_id(),
-            "status_url": f"/api/status/{job.get_id()}"
-        }), 202
+        def enqueue():
+            # Only new jobs are admission-controlled; cache hits and shared in-flight jobs are free
+            reservation = uuid.uuid4().hex
+            admitted["eta_seconds"] = admission.check(client_id, staged=staged, reservation=reservation)
+            try:
+                job_id = _enqueue_new()
+            except Exception:
+                admission.release(client_id, reservation)
+                raise
+            admission.register(client_id, job_id, reservation=reservation)
+            return job_id
+
+        def _enqueue_new():
+            if staged:
+                # fetch -> score -> LLM as dependent jobs on the github/score/llm queues
+                return enqueue_analysis(username, llm_model, cache_key=key, result_ttl=max(coalescer.cache_ttl, 500),
+                                        force_refresh=force_refresh, profile=profile_mode)
+            queue = get_queue()
+            if deadline is not None:
+                job = queue.enqueue(
+                    run_analysis_task,
+                    args=(username, llm_model),
+                    kwargs={"cache_key": key, "deadline": time.time() + deadline},
+                    job_timeout=int(deadline) + 30,
+                    result_ttl=max(coalescer.cache_ttl, 500),
+                    meta={"profile": profile_mode} if profile_mode else None
+                )
+                return job.id
+            job = queue.enqueue(
+                run_analysis_task,
+                args=(username, llm_model),
+                kwargs={"cache_key": key},
+                job_timeout='10m', # Allow 10 mins for analysis
+                result_ttl=max(coalescer.cache_ttl, 500), # Keep results for as long as they're cached
+                meta={"profile": profile_mode} if profile_mode else None
+            )
+            return job.id
+
+        subscription = uuid.uuid4().hex
+        try:
+            job_id, source = coalescer.submit(key, enqueue, force_refresh=force_refresh, subscriber=subscription)
+        except AdmissionRejected as e:
+            response = jsonify({
+                "error": str(e),
+                "reason": e.reason,
+                "retry_after": e.retry_after,
+                "eta_seconds": e.eta_seconds
+            })
+            response.headers['Retry-After'] = str(e.retry_after)
+            metrics.inc("analysis_requests_total", source="rejected")
+            return response, 429
+        metrics.inc("analysis_requests_total", source=source)
+
+        messages = {
+            "new": "Analysis enqueued",
+            "inflight": "Analysis already in progress",
+            "cache": "Cached analysis available"
+        }
+        body = {
+            "message": messages[source],
+            "job_id": job_id,
+            "source": source,
+            "status_url": f"/api/status/{job_id}"
+        }
+        if source != "cache":
+            # Passed to DELETE /api/jobs/<job_id>; the job is cancelled once all its subscribers have left
+            body["subscription"] = subscription
+        if "eta_seconds" in admitted:
+            body["eta_seconds"] = admitted["eta_seconds"]
+        return jsonify(body), 200 if source == "cache" else 202
 
     except Exception as e:
         return jsonify({"error": "Failed to enqueue job", "details": str(e)}), 500
@@ -39,24 +233,203 @@ def analyze_profile(username):
 def get_job_status(job_id):
     """
     Checks the status of a background job.
+    Responses carry a weak ETag derived from the job's status and end time, so
+    unchanged polls get a 304 without the result being read. Large finished
+    results are served gzip/br-compressed when the client accepts it.
     """
     try:
-        status = job_store.get_status(job_id)
+        # Skip loading the result when the client may already have it
+        snapshot = job_store.get_snapshot(job_id, include_result=not request.if_none_match)
         
-        if status == "unknown":
+        if snapshot.status == "unknown":
             return jsonify({"error": "Job not found"}), 404
-            
-        response = {"job_id": job_id, "status": status}
-        
-        if status == "finished":
-            result = job_store.get_result(job_id)
-            response["result"] = result
-        elif status == "failed":
-            # Optionally fetch error details from job.exc_info
-            job = job_store.get_job(job_id)
-            response["error"] = job.exc_info if job else "Unknown error"
-
-        return jsonify(response), 200
+
+        etag = hashlib.sha1(f"{job_id}:{snapshot.version}".encode("utf-8")).hexdigest()[:20]
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+        elif snapshot.status == "finished":
+            body = job_store.get_finished_body(snapshot)
+            encoding = pick_encoding(request.accept_encodings, len(body))
+            response = Response(job_store.get_finished_body(snapshot, encoding) if encoding else body,
+                                status=200, mimetype='application/json')
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+            response.vary.add('Accept-Encoding')
+        else:
+            payload = {"job_id": job_id, "status": snapshot.status}
+            if snapshot.status == "failed":
+                payload["error"] = job_store.get_error(job_id, snapshot) or "Unknown error"
+            response = jsonify(payload)
+
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = 'no-cache' # Always revalidate
+        return response
         
     except Exception as e:
-        return jsonify({"error": "Internal Server Error", "details": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": "Internal Server Error", "details": str(e)}), 500
+
+@api_bp.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job_route(job_id):
+    """
+    Drops the `subscription` returned by POST /api/analyze/<username>. The
+    analysis is cancelled once no other request or batch is waiting for it:
+    stages that haven't started are cancelled in RQ; a running stage stops at
+    its next checkpoint (between repository fetches or before the LLM call) and
+    is not retried. Without a subscription only unshared jobs are cancelled.
+    """
+    try:
+        status = job_store.get_status(job_id)
+        if status == "unknown":
+            return jsonify({"error": "Job not found"}), 404
+        if status in ("finished", "failed", "canceled", "stopped"):
+            return jsonify({"error": f"Job already {status}", "job_id": job_id, "status": status}), 409
+
+        subscription = request.args.get('subscription')
+        if subscription:
+            remaining, running = unsubscribe(job_id, subscription, analysis_job_ids(job_id))
+            if remaining < 0:
+                return jsonify({"error": "Unknown subscription for this job", "job_id": job_id}), 403
+        else:
+            remaining = subscriber_count(job_id)
+            if remaining == 0:
+                running = request_cancel(job_id, analysis_job_ids(job_id))
+        if remaining > 0:
+            # Others still wait for this job; only this subscriber left
+            return jsonify({"job_id": job_id, "status": status, "canceled": False, "subscribers": remaining}), 200
+        return jsonify({"job_id": job_id, "status": "canceled", "canceled": True, "stopping": running}), 202
+    except Exception as e:
+        return jsonify({"error": "Failed to cancel job", "details": str(e)}), 500
+
+@api_bp.route('/jobs/<job_id>/trace', methods=['GET'])
+def get_job_trace(job_id):
+    """Per-stage span timing breakdown of an analysis (recorded when workers run with TRACING=1)."""
+    try:
+        if job_store.get_status(job_id) == "unknown":
+            return jsonify({"error": "Job not found"}), 404
+        traces = collect_job_traces(analysis_job_ids(job_id), get_redis_connection())
+        if not traces:
+            return jsonify({"error": "No trace recorded for this job (tracing is off or it hasn't run yet)"}), 404
+        return jsonify({"job_id": job_id, "stages": traces})
+    except Exception as e:
+        return jsonify({"error": "Internal Server Error", "details": str(e)}), 500
+
+@api_bp.route('/jobs/<job_id>/profile', methods=['GET'])
+def get_job_profile(job_id):
+    """Per-stage profiles of an analysis enqueued with the `profile` option (or run with PROFILE_JOBS)."""
+    try:
+        if job_store.get_status(job_id) == "unknown":
+            return jsonify({"error": "Job not found"}), 404
+        profiles = ProfileStore().load_many(analysis_job_ids(job_id))
+        if not profiles:
+            return jsonify({"error": "No profile recorded for this job (profiling was off or it hasn't run yet)"}), 404
+        return jsonify({"job_id": job_id, "stages": profiles})
+    except Exception as e:
+        return jsonify({"error": "Internal Server Error", "details": str(e)}), 500
+
+@api_bp.route('/stream/<job_id>', methods=['GET'])
+def stream_job_progress(job_id):
+    """
+    Server-Sent Events stream of a job's progress. Emits `progress` events
+    published by the worker, then a single `result` or `failed` event.
+    """
+    if job_store.get_status(job_id) == "unknown":
+        return jsonify({"error": "Job not found"}), 404
+
+    response = Response(stream_with_context(iter_progress_events(job_id, job_store)), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no' # Disable proxy buffering (nginx)
+    return response
+
+@api_bp.route('/jobs/<job_id>/repositories', methods=['GET'])
+def get_job_repositories(job_id):
+    """
+    Lazily serves raw repository data (file trees, manifests, READMEs, commits) for a job.
+    Query params: page (1-based), per_page (max 50), fields (comma-separated raw fields),
+    tree=compact to receive file trees as interned segment tables instead of paths.
+    """
+    try:
+        page = max(int(request.args.get('page', 1)), 1)
+        per_page = min(max(int(request.args.get('per_page', 5)), 1), 50)
+    except ValueError:
+        return jsonify({"error": "page and per_page must be integers"}), 400
+
+    fields = [f for f in request.args.get('fields', '').split(',') if f]
+    unknown = set(fields) - RAW_REPOSITORY_FIELDS
+    if unknown:
+        return jsonify({"error": f"Unknown fields: {', '.join(sorted(unknown))}"}), 400
+
+    try:
+        total = repository_store.count(job_id)
+        if total == 0:
+            return jsonify({"error": "No repository data for this job"}), 404
+
+        return jsonify({
+            "job_id": job_id,
+            "page": page,
+            "per_page": per_page,
+            "total": total,
+            "repositories": repository_store.get_page(
+                job_id, page, per_page, fields or None,
+                compact_tree=request.args.get('tree') == 'compact'
+            )
+        }), 200
+
+    except Exception as e:
+        return jsonify({"error": "Internal Server Error", "details": str(e)}), 500
+
+def _history_or_error():
+    store = get_history_store()
+    if store is None:
+        return None, (jsonify({"error": "Analysis history is disabled"}), 404)
+    return store, None
+
+@api_bp.route('/users/<username>/latest', methods=['GET'])
+def get_latest_analysis(username):
+    """The most recent stored report for a user, served from history without queuing a job."""
+    store, error = _history_or_error()
+    if error:
+        return error
+    try:
+        latest = store.latest(username)
+        if latest is None:
+            return jsonify({"error": f"No stored analysis for '{username}'"}), 404
+        return jsonify(latest)
+    except Exception as e:
+        return jsonify({"error": "Internal Server Error", "details": str(e)}), 500
+
+@api_bp.route('/users/<username>/trend', methods=['GET'])
+def get_score_trend(username):
+    """Score snapshots of a user's past analyses, oldest first. Query params: since (Unix time), limit (max 500)."""
+    store, error = _history_or_error()
+    if error:
+        return error
+    try:
+        since = float(request.args['since']) if 'since' in request.args else None
+        limit = min(max(int(request.args.get('limit', 50)), 1), 500)
+    except ValueError:
+        return jsonify({"error": "since must be a number and limit an integer"}), 400
+    try:
+        return jsonify({"username": username.lower(), "analyses": store.trend(username, since=since, limit=limit)})
+    except Exception as e:
+        return jsonify({"error": "Internal Server Error", "details": str(e)}), 500
+
+@api_bp.route('/users/<username>/delta', methods=['GET'])
+def get_analysis_delta(username):
+    """
+    What changed between two of a user's analyses: score differences and
+    repositories added, removed or re-scored. Query params: from, to (analysis
+    ids); defaults to the two most recent analyses.
+    """
+    store, error = _history_or_error()
+    if error:
+        return error
+    from_id, to_id = request.args.get('from'), request.args.get('to')
+    if bool(from_id) != bool(to_id):
+        return jsonify({"error": "Provide both 'from' and 'to', or neither"}), 400
+    try:
+        delta = store.delta(username, from_id, to_id)
+        if delta is None:
+            return jsonify({"error": f"Need two stored analyses of '{username}' to compare"}), 404
+        return jsonify(delta)
+    except Exception as e:
+        return jsonify({"error": "Internal Server Error", "details": str(e)}), 500
@@ -0,0 +1,342 @@
+import os
+import json
+import time
+import uuid
+from collections import Counter
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from app.redis_client import get_redis_connection
+from app.job_store import JobStore
+from app.analysis_cache import AnalysisCoalescer, analysis_key
+from app.admission import AdmissionController
+from app.pipeline import enqueue_analysis
+from app.progress import format_sse
+from app.models.dtos import Repository
+from app.services.insight_engine import TechStackAnalyzer
+
+BATCH_PREFIX = "analysis:batch:"
+MEMBER_PREFIX = "analysis:batch:member:"
+SETTLED_STATUSES = {"finished", "failed", "canceled", "stopped", "unknown"}
+MEMBER_REPO_FIELDS = ("name", "html_url", "language", "dependencies", "maturity_label", "updated_at")
+
+def member_summary(username: str, job_id: str, report: Dict[str, Any]) -> Dict[str, Any]:
+    """Compact per-user result kept with the batch (full reports stay with their jobs)."""
+    details = report.get("details") or {}
+    return {
+        "username": username,
+        "job_id": job_id,
+        "status": "finished",
+        "overall_score": report["overall_score"]["score"],
+        "avg_repo_docs_score": report["avg_repo_docs_score"]["score"],
+        "avg_code_hygiene_score": report["avg_code_hygiene_score"]["score"],
+        "core_stack": details.get("core_stack", []),
+        "repositories": [{k: repo.get(k) for k in MEMBER_REPO_FIELDS} for repo in details.get("repositories", [])],
+        "status_url": f"/api/status/{job_id}"
+    }
+
+def aggregate_members(members: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Organization-level view over the finished members. Repositories are deduplicated
+    by URL before the tech stack is derived, so shared repositories count once.
+    """
+    finished = [m for m in members if m["status"] == "finished"]
+    repositories = {}
+    for member in finished:
+        for repo in member["repositories"]:
+            repositories.setdefault(repo["html_url"], repo)
+
+    scores = [m["overall_score"] for m in finished]
+    languages = Counter(r["language"] for r in repositories.values() if r.get("language"))
+    return {
+        "members_analyzed": len(finished),
+        "members_failed": sum(1 for m in members if m["status"] == "failed"),
+        "repositories": len(repositories),
+        "avg_overall_score": round(sum(scores) / len(scores)) if scores else 0,
+        "top_languages": [{"language": l, "repositories": n} for l, n in languages.most_common(10)],
+        "tech_stack": TechStackAnalyzer().analyze([Repository(**r) for r in repositories.values()])
+    }
+
+class BatchCoordinator:
+    """
+    Runs many analyses as one batch.
+
+    Members go through the same single-flight cache as single requests, so users
+    analyzed recently (or already in flight) cost nothing. At most
+    `BATCH_MAX_INFLIGHT` members run at once, fewer when the GitHub rate limit
+    can't cover them, so a large batch doesn't monopolize the fetch queue or the
+    API budget shared with interactive requests. Running members also take
+    slots of the submitting client's in-flight quota, like single analyses.
+
+    The batch advances when a member settles (workers call `notify_batches`)
+    and whenever its state is read.
+    """
+    def __init__(self, job_store: Optional[JobStore] = None, coalescer: Optional[AnalysisCoalescer] = None,
+                 github_budget: Optional[Callable[[], Tuple[int, float]]] = None,
+                 admission: Optional[AdmissionController] = None):
+        self.connection = get_redis_connection()
+        self.job_store = job_store or JobStore()
+        self.coalescer = coalescer or AnalysisCoalescer(self.job_store)
+        self.admission = admission or AdmissionController(self.job_store)
+        # Returns the remaining GitHub API calls and when they reset
+        self.github_budget = github_budget
+        self.max_inflight = int(os.getenv("BATCH_MAX_INFLIGHT", "10"))
+        self.calls_per_analysis = int(os.getenv("BATCH_CALLS_PER_ANALYSIS", "100"))
+        self.ttl_seconds = int(os.getenv("BATCH_TTL", str(24 * 3600)))
+        self._budget: Optional[Tuple[float, Tuple[int, float]]] = None
+
+    def _key(self, batch_id: str, part: str) -> str:
+        return f"{BATCH_PREFIX}{batch_id}:{part}"
+
+    def create(self, usernames: List[str], model_name: str = "llama3", org: Optional[str] = None,
+               force_refresh: bool = False, client_id: Optional[str] = None) -> str:
+        """Creates a batch (usernames deduplicated case-insensitively) and starts its first members."""
+        unique = list({u.lower(): u for u in reversed(usernames)}.values())[::-1]
+        batch_id = uuid.uuid4().hex
+        pipe = self.connection.pipeline()
+        pipe.hset(self._key(batch_id, "meta"), mapping={
+            "model": model_name,
+            "org": org or "",
+            "force_refresh": int(force_refresh),
+            "usernames": json.dumps(unique),
+            "created_at": time.time(),
+            "status": "running",
+            "client_id": client_id or ""
+        })
+        if unique:
+            pipe.rpush(self._key(batch_id, "pending"), *unique)
+        for part in ("meta", "pending"):
+            pipe.expire(self._key(batch_id, part), self.ttl_seconds)
+        pipe.execute()
+        self.advance(batch_id)
+        return batch_id
+
+    def _budget_slots(self) -> Optional[int]:
+        """How many more analyses the GitHub budget covers (None if unknown)."""
+        if self.github_budget is None:
+            return None
+        now = time.time()
+        if self._budget is None or now - self._budget[0] > 60:
+            try:
+                self._budget = (now, self.github_budget())
+            except Exception as e:
+                print(f"Could not read GitHub rate limit: {e}")
+                return None
+        remaining, _ = self._budget[1]
+        return remaining // self.calls_per_analysis
+
+    def _record(self, batch_id: str, username: str, entry: Dict[str, Any]) -> None:
+        pipe = self.connection.pipeline()
+        pipe.hset(self._key(batch_id, "results"), username, json.dumps(entry))
+        pipe.expire(self._key(batch_id, "results"), self.ttl_seconds)
+        pipe.execute()
+
+    def _release(self, client_id: Optional[str], reservation: Optional[str] = None, job_id: Optional[str] = None) -> None:
+        if client_id:
+            self.admission.release(client_id, reservation=reservation, job_id=job_id)
+
+    def record(self, batch_id: str, username: str, job_id: str, report: Optional[Dict[str, Any]] = None,
+               error: Optional[str] = None) -> None:
+        """Stores a member's outcome (its compact report, or the error it failed with) and frees its client slot."""
+        client_id = self.connection.hget(self._key(batch_id, "meta"), "client_id")
+        self._release(client_id.decode() if client_id else None, job_id=job_id or None)
+        if report is not None:
+            entry = member_summary(username, job_id, report)
+        else:
+            lines = (error or "").strip().splitlines()
+            entry = {"username": username, "job_id": job_id, "status": "failed",
+                     "error": lines[-1] if lines else "Analysis failed"}
+        self._record(batch_id, username, entry)
+
+    def _submit(self, batch_id: str, username: str, meta: Dict[str, str]) -> Tuple[str, str]:
+        model_name = meta["model"]
+        force_refresh = meta["force_refresh"] == "1"
+        # Same key as a plain POST /analyze, so batch members share cache and in-flight jobs with it
+        key = analysis_key(username, model_name, {})
+        job_id, source = self.coalescer.submit(
+            key,
+            lambda: enqueue_analysis(username, model_name, cache_key=key,
+                                     result_ttl=max(self.coalescer.cache_ttl, 500), force_refresh=force_refresh),
+            force_refresh=force_refresh,
+            subscriber=f"batch:{batch_id}" # Keeps the job alive if a client sharing it cancels
+        )
+        pipe = self.connection.pipeline()
+        pipe.hset(self._key(batch_id, "jobs"), username, job_id)
+        pipe.expire(self._key(batch_id, "jobs"), self.ttl_seconds)
+        pipe.hset(f"{MEMBER_PREFIX}{job_id}", batch_id, username)
+        pipe.expire(f"{MEMBER_PREFIX}{job_id}", self.ttl_seconds)
+        pipe.execute()
+        return job_id, source
+
+    def _settle(self, batch_id: str, username: str, job_id: str) -> bool:
+        """Records a member whose job has settled. Returns False while it is still running."""
+        snapshot = self.job_store.get_snapshot(job_id)
+        if snapshot.status not in SETTLED_STATUSES:
+            return False
+        if snapshot.status == "finished":
+            report = self.job_store.get_result(job_id)
+            if report is not None:
+                self.record(batch_id, username, job_id, report=report)
+                return True
+        self.record(batch_id, username, job_id, error=self.job_store.get_error(job_id, snapshot) or f"Analysis {snapshot.status}")
+        return True
+
+    def advance(self, batch_id: str) -> bool:
+        """
+        Records settled members and starts pending ones while there is room.
+        Returns False if the batch doesn't exist.
+        """
+        meta = {k.decode(): v.decode() for k, v in self.connection.hgetall(self._key(batch_id, "meta")).items()}
+        if not meta:
+            return False
+        if meta["status"] == "finished":
+            return True
+
+        # A caller that finds the lock taken leaves the dirty flag behind; the holder
+        # re-runs while it is set (also after releasing), so no notification is lost.
+        dirty_key = self._key(batch_id, "dirty")
+        self.connection.set(dirty_key, 1, ex=60)
+        lock = self.connection.lock(self._key(batch_id, "lock"), timeout=30)
+        while self.connection.exists(dirty_key) and lock.acquire(blocking=False):
+            try:
+                while self.connection.delete(dirty_key):
+                    self._advance_locked(batch_id)
+            finally:
+                lock.release()
+        return True
+
+    def _advance_locked(self, batch_id: str) -> None:
+        meta = {k.decode(): v.decode() for k, v in self.connection.hgetall(self._key(batch_id, "meta")).items()}
+        if not meta or meta["status"] == "finished":
+            return
+        jobs = {k.decode(): v.decode() for k, v in self.connection.hgetall(self._key(batch_id, "jobs")).items()}
+        settled = {k.decode() for k in self.connection.hkeys(self._key(batch_id, "results"))}
+        running = [u for u in jobs if u not in settled and not self._settle(batch_id, u, jobs[u])]
+
+        slots = self.max_inflight - len(running)
+        budget = self._budget_slots()
+        if budget is not None:
+            room = budget - len(running)
+            if room <= 0 and not running and self._budget[1][0] > 0:
+                room = 1 # Keep one member moving while any calls are left
+            slots = min(slots, room)
+        client_id = meta.get("client_id")
+        while slots > 0:
+            reservation = uuid.uuid4().hex
+            if client_id and not self.admission.reserve(client_id, reservation):
+                break # The client's quota is full; members start as its analyses settle
+            username = self.connection.lpop(self._key(batch_id, "pending"))
+            if username is None:
+                self._release(client_id, reservation)
+                break
+            username = username.decode()
+            try:
+                job_id, source = self._submit(batch_id, username, meta)
+            except Exception as e:
+                self._release(client_id, reservation)
+                self.record(batch_id, username, "", error=str(e))
+                continue
+            if source == "cache" and self._settle(batch_id, username, job_id):
+                self._release(client_id, reservation)
+                continue # Cached reports don't take a slot
+            if client_id:
+                self.admission.register(client_id, job_id, reservation=reservation)
+            slots -= 1
+
+        done = not self.connection.llen(self._key(batch_id, "pending")) and \
+            self.connection.hlen(self._key(batch_id, "results")) >= len(json.loads(meta["usernames"]))
+        if done:
+            members = self.members(batch_id, meta)
+            self.connection.hset(self._key(batch_id, "meta"), mapping={
+                "status": "finished",
+                "finished_at": time.time(),
+                "aggregate": json.dumps(aggregate_members(members))
+            })
+
+    def members(self, batch_id: str, meta: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+        """Per-user state in submission order: settled results, or pending/running entries."""
+        if meta is None:
+            meta = {k.decode(): v.decode() for k, v in self.connection.hgetall(self._key(batch_id, "meta")).items()}
+        pipe = self.connection.pipeline(transaction=False)
+        pipe.hgetall(self._key(batch_id, "results"))
+        pipe.hgetall(self._key(batch_id, "jobs"))
+        results, jobs = pipe.execute()
+        results = {k.decode(): json.loads(v) for k, v in results.items()}
+        jobs = {k.decode(): v.decode() for k, v in jobs.items()}
+
+        members = []
+        for username in json.loads(meta["usernames"]):
+            if username in results:
+                members.append(results[username])
+            elif username in jobs:
+                members.append({"username": username, "job_id": jobs[username], "status": "running"})
+            else:
+                members.append({"username": username, "status": "pending"})
+        return members
+
+    def state(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        """The batch's progress, per-user results so far and the aggregate over them."""
+        if not self.advance(batch_id):
+            return None
+        meta = {k.decode(): v.decode() for k, v in self.connection.hgetall(self._key(batch_id, "meta")).items()}
+        members = self.members(batch_id, meta)
+        counts = Counter(m["status"] for m in members)
+        return {
+            "batch_id": batch_id,
+            "status": meta["status"],
+            "org": meta["org"] or None,
+            "model": meta["model"],
+            "total": len(members),
+            "counts": {s: counts.get(s, 0) for s in ("pending", "running", "finished", "failed")},
+            "members": members,
+            # Partial aggregates are computed on read; the final one is stored
+            "aggregate": json.loads(meta["aggregate"]) if "aggregate" in meta else aggregate_members(members)
+        }
+
+def notify_batches(job_id: str, report: Optional[Dict[str, Any]] = None, error: Optional[str] = None,
+                   coordinator: Optional[BatchCoordinator] = None) -> None:
+    """
+    Called by the worker when an analysis settles: records it in every batch that
+    includes it and starts the next members. RQ marks the job finished only after
+    the task returns, so the outcome is passed in rather than read back.
+    """
+    batches = get_redis_connection().hgetall(f"{MEMBER_PREFIX}{job_id}")
+    if not batches:
+        return
+    coordinator = coordinator or BatchCoordinator()
+    for batch_id, username in batches.items():
+        batch_id, username = batch_id.decode(), username.decode()
+        coordinator.record(batch_id, username, job_id, report=report, error=error)
+        coordinator.advance(batch_id)
+
+def iter_batch_events(batch_id: str, coordinator: BatchCoordinator, poll_seconds: float = 2.0,
+                      heartbeat_seconds: float = 15.0, max_seconds: float = 3600.0) -> Iterator[str]:
+    """
+    Server-Sent Events for a batch: a `member` event per settled user, `progress`
+    events with the counts, then one `aggregate` event when the batch finishes.
+    """
+    sent = set()
+    last_counts = None
+    started = last_sent = time.monotonic()
+    while time.monotonic() - started < max_seconds:
+        state = coordinator.state(batch_id)
+        if state is None:
+            yield format_sse("failed", json.dumps({"batch_id": batch_id, "error": "Batch not found or expired"}))
+            return
+        for member in state["members"]:
+            if member["status"] in ("finished", "failed") and member["username"] not in sent:
+                sent.add(member["username"])
+                yield format_sse("member", json.dumps(member))
+                last_sent = time.monotonic()
+        if state["counts"] != last_counts:
+            last_counts = state["counts"]
+            yield format_sse("progress", json.dumps({"batch_id": batch_id, "total": state["total"], **last_counts}))
+            last_sent = time.monotonic()
+        if state["status"] == "finished":
+            yield format_sse("aggregate", json.dumps({"batch_id": batch_id, **state["aggregate"]}))
+            return
+
+        if time.monotonic() - last_sent >= heartbeat_seconds:
+            yield ": keep-alive\n\n"
+            last_sent = time.monotonic()
+        time.sleep(poll_seconds)
+
+    yield format_sse("timeout", json.dumps({"batch_id": batch_id}))
@@ -0,0 +1,135 @@
+import time
+from typing import Callable, List, Optional, Tuple
+from rq.job import Job, cancel_job
+from app.redis_client import get_redis_connection
+from app.pipeline import inflight_ttl
+
+CANCEL_PREFIX = "analysis:cancel:"
+SUBSCRIBERS_PREFIX = "analysis:subscribers:"
+CANCELLABLE_STATUSES = {"queued", "deferred", "scheduled"}
+
+# Drops one subscriber and raises the cancel flag if it was the last, in one step,
+# so a request joining the analysis concurrently either keeps it alive or sees the flag.
+# KEYS: subscriber set, cancel flag; ARGV: subscriber, flag TTL. Returns -1 for an unknown subscriber.
+UNSUBSCRIBE_SCRIPT = """
+if redis.call('SREM', KEYS[1], ARGV[1]) == 0 then
+    return -1
+end
+local remaining = redis.call('SCARD', KEYS[1])
+if remaining == 0 then
+    redis.call('SET', KEYS[2], 1, 'EX', ARGV[2])
+end
+return remaining
+"""
+
+class AnalysisCancelled(Exception):
+    """Raised inside a running stage once its analysis has been cancelled."""
+
+class StageDeadlineExceeded(TimeoutError):
+    """Raised when a stage runs past its configured deadline."""
+
+def cancel_key(analysis_id: str) -> str:
+    return f"{CANCEL_PREFIX}{analysis_id}"
+
+def subscribers_key(analysis_id: str) -> str:
+    return f"{SUBSCRIBERS_PREFIX}{analysis_id}"
+
+def _flag_ttl() -> int:
+    return inflight_ttl() * 2
+
+def is_cancel_requested(analysis_id: str) -> bool:
+    return bool(get_redis_connection().exists(cancel_key(analysis_id)))
+
+def subscribe(analysis_id: str, subscriber: str) -> bool:
+    """
+    Records `subscriber` (a client request or a batch) as waiting for the analysis.
+    Returns False if the analysis has already been cancelled.
+    """
+    key = subscribers_key(analysis_id)
+    pipe = get_redis_connection().pipeline()
+    pipe.sadd(key, subscriber)
+    pipe.expire(key, _flag_ttl())
+    pipe.exists(cancel_key(analysis_id))
+    return not pipe.execute()[2]
+
+def subscriber_count(analysis_id: str) -> int:
+    return get_redis_connection().scard(subscribers_key(analysis_id))
+
+def unsubscribe(analysis_id: str, subscriber: str, job_ids: List[str]) -> Tuple[int, List[str]]:
+    """
+    Removes `subscriber` from the analysis and cancels it once nobody else is
+    waiting for it (other requests sharing the job, or batches it belongs to).
+
+    Returns:
+        Tuple[int, List[str]]: The subscribers left (-1 if `subscriber` wasn't one)
+        and, if the analysis was cancelled, its jobs that will stop cooperatively.
+    """
+    remaining = int(get_redis_connection().eval(
+        UNSUBSCRIBE_SCRIPT, 2, subscribers_key(analysis_id), cancel_key(analysis_id), subscriber, _flag_ttl()
+    ))
+    if remaining != 0:
+        return remaining, []
+    return 0, request_cancel(analysis_id, job_ids)
+
+def request_cancel(analysis_id: str, job_ids: List[str]) -> List[str]:
+    """
+    Flags the analysis as cancelled and cancels its jobs that haven't started.
+    Running jobs see the flag at their next checkpoint and stop cooperatively.
+
+    Args:
+        analysis_id (str): The analysis (final job) id.
+        job_ids (List[str]): All job ids of the analysis (its pipeline stages).
+
+    Returns:
+        List[str]: The job ids that were still running and will stop cooperatively.
+    """
+    connection = get_redis_connection()
+    connection.set(cancel_key(analysis_id), 1, ex=_flag_ttl())
+
+    pipe = connection.pipeline(transaction=False)
+    for job_id in job_ids:
+        pipe.hget(Job.key_for(job_id), "status")
+    statuses = [s.decode("utf-8") if s else None for s in pipe.execute()]
+
+    running = []
+    for job_id, status in zip(job_ids, statuses):
+        if status in CANCELLABLE_STATUSES:
+            try:
+                cancel_job(job_id, connection=connection)
+            except Exception as e:
+                print(f"Could not cancel {job_id}: {e}")
+        elif status == "started":
+            running.append(job_id)
+    return running
+
+class StageGuard:
+    """
+    Cooperative cancellation and deadline checks for one pipeline stage.
+    `check()` is called at safe points: between repository fetches (via the
+    wrapped progress callback), between stages and before the LLM call.
+    """
+    def __init__(self, analysis_id: Optional[str], stage: str, deadline_seconds: Optional[float] = None):
+        self.analysis_id = analysis_id
+        self.stage = stage
+        self.deadline_seconds = deadline_seconds
+        self.started = time.monotonic()
+
+    def remaining(self) -> Optional[float]:
+        if self.deadline_seconds is None:
+            return None
+        return self.deadline_seconds - (time.monotonic() - self.started)
+
+    def check(self) -> None:
+        if self.analysis_id and is_cancel_requested(self.analysis_id):
+            raise AnalysisCancelled(f"Analysis {self.analysis_id} was cancelled")
+        remaining = self.remaining()
+        if remaining is not None and remaining <= 0:
+            raise StageDeadlineExceeded(f"Stage '{self.stage}' exceeded its {self.deadline_seconds}s deadline")
+
+    def wrap(self, progress: Optional[Callable[..., None]]) -> Callable[..., None]:
+        """Returns a progress callback that runs `check()` before forwarding each event."""
+        def guarded(phase: str, **data) -> None:
+            self.check()
+            if progress:
+                progress(phase, **data)
+        return guarded
@@ -0,0 +1,302 @@
+import os
+import json
+import array
+import shutil
+import sys
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from app.core.interfaces import IHistoryStore
+
+# Optional: Parquet via pyarrow; the stdlib column-file format is always available.
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+MANIFEST = "manifest.json"
+INT_NULL = -(2 ** 63) # Null marker for int columns in the column-file format
+
+SCORE_COLUMNS = (
+    "overall_score", "profile_score", "repo_quality_score",
+    "avg_repo_docs_score", "avg_code_hygiene_score", "personal_readme_score"
+)
+
+# Column name -> type ("string", "int", "float" or "bool"), per exported table
+TABLES: Dict[str, List[Tuple[str, str]]] = {
+    "analyses": [
+        ("analysis_id", "string"), ("username", "string"), ("model", "string"), ("created_at", "float"),
+        *[(c, "int") for c in SCORE_COLUMNS],
+        ("overall_level", "string"), ("repo_count", "int"), ("followers", "int"), ("public_repos", "int"),
+        ("partial", "bool")
+    ],
+    "repositories": [
+        ("analysis_id", "string"), ("username", "string"), ("created_at", "float"),
+        ("name", "string"), ("html_url", "string"), ("language", "string"),
+        ("stargazers_count", "int"), ("forks_count", "int"), ("updated_at", "string"),
+        ("maturity_label", "string"), ("maturity_score", "int"),
+        ("repo_documentation_score", "int"), ("code_hygiene_score", "int"),
+        ("has_ci", "bool"), ("has_docker", "bool"), ("has_tests", "bool"), ("has_license", "bool"),
+        ("conventional_commits_ratio", "float"), ("commit_frequency", "float"), ("dependency_count", "int")
+    ],
+    # One row per (repository, dependency), so dependencies can be grouped without list columns
+    "dependencies": [
+        ("analysis_id", "string"), ("username", "string"), ("html_url", "string"),
+        ("language", "string"), ("dependency", "string")
+    ]
+}
+
+def _score(detail: Any) -> Optional[int]:
+    return detail.get("score") if isinstance(detail, dict) else detail
+
+def flatten_record(record: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+    """Splits one stored analysis into rows of the analyses, repositories and dependencies tables."""
+    report = record["report"]
+    details = report.get("details") or {}
+    username = report["username"].lower()
+    base = {"analysis_id": record["analysis_id"], "username": username}
+    repositories = details.get("repositories", [])
+
+    rows: Dict[str, List[Dict[str, Any]]] = {"analyses": [], "repositories": [], "dependencies": []}
+    rows["analyses"].append({
+        **base, "model": record.get("model"), "created_at": record["created_at"],
+        **{c: _score(report.get(c)) for c in SCORE_COLUMNS},
+        "overall_level": (report.get("overall_score") or {}).get("level"),
+        "repo_count": len(repositories), "followers": details.get("followers"),
+        "public_repos": details.get("public_repos"),
+        "partial": bool((details.get("coverage") or {}).get("partial"))
+    })
+    for repo in repositories:
+        dependencies = repo.get("dependencies") or []
+        rows["repositories"].append({
+            **base, "created_at": record["created_at"],
+            **{name: repo.get(name) for name, _ in TABLES["repositories"][3:]},
+            "maturity_score": _score(repo.get("maturity_score")),
+            "repo_documentation_score": _score(repo.get("repo_documentation_score")),
+            "code_hygiene_score": _score(repo.get("code_hygiene_score")),
+            "dependency_count": len(dependencies)
+        })
+        for dependency in dependencies:
+            rows["dependencies"].append({
+                **base, "html_url": repo.get("html_url"), "language": repo.get("language"), "dependency": dependency
+            })
+    return rows
+
+def to_columns(table: str, rows: List[Dict[str, Any]]) -> Dict[str, list]:
+    return {name: [row.get(name) for row in rows] for name, _ in TABLES[table]}
+
+class ParquetPartWriter:
+    """Writes one table's part as a Parquet file, one row group per chunk."""
+    extension = ".parquet"
+    TYPES = {"string": "string", "int": "int64", "float": "float64", "bool": "bool_"}
+
+    def __init__(self, path: str, table: str):
+        self.schema = pyarrow.schema([(name, getattr(pyarrow, self.TYPES[kind])()) for name, kind in TABLES[table]])
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema, compression="zstd")
+
+    def write(self, columns: Dict[str, list]) -> None:
+        self.writer.write_table(pyarrow.table(columns, schema=self.schema))
+
+    def close(self) -> None:
+        self.writer.close()
+
+class ColumnPartWriter:
+    """
+    Stdlib fallback: one table's part as a directory with a file per column.
+    Numbers and bools are raw little-endian arrays (int64, float64, int8) that
+    `numpy.fromfile` reads directly; strings are an int64 end-offset array
+    (`<col>.offsets`, -1 for null) plus the concatenated UTF-8 bytes (`<col>.data`).
+    Chunks are appended as they arrive, so memory holds one chunk at a time.
+    """
+    extension = ""
+    TYPECODES = {"int": "q", "float": "d", "bool": "b"}
+
+    def __init__(self, path: str, table: str):
+        os.makedirs(path, exist_ok=True)
+        self.columns = TABLES[table]
+        self.files = {}
+        self.data_sizes = {}
+        for name, kind in self.columns:
+            if kind == "string":
+                self.files[name] = (open(os.path.join(path, f"{name}.offsets"), "wb"),
+                                    open(os.path.join(path, f"{name}.data"), "wb"))
+                self.data_sizes[name] = 0
+            else:
+                self.files[name] = (open(os.path.join(path, f"{name}.{kind}64" if kind != "bool" else f"{name}.bool"), "wb"),)
+
+    def _array(self, kind: str, values: list) -> array.array:
+        if kind == "int":
+            return array.array("q", [INT_NULL if v is None else int(v) for v in values])
+        if kind == "float":
+            return array.array("d", [float("nan") if v is None else float(v) for v in values])
+        return array.array("b", [-1 if v is None else int(bool(v)) for v in values])
+
+    def _write_array(self, f, values: array.array) -> None:
+        if sys.byteorder != "little":
+            values.byteswap()
+        values.tofile(f)
+
+    def write(self, columns: Dict[str, list]) -> None:
+        for name, kind in self.columns:
+            values = columns[name]
+            if kind != "string":
+                self._write_array(self.files[name][0], self._array(kind, values))
+                continue
+            offsets_file, data_file = self.files[name]
+            offsets = array.array("q")
+            for value in values:
+                if value is None:
+                    offsets.append(-1)
+                    continue
+                encoded = str(value).encode("utf-8")
+                data_file.write(encoded)
+                self.data_sizes[name] += len(encoded)
+                offsets.append(self.data_sizes[name])
+            self._write_array(offsets_file, offsets)
+
+    def close(self) -> None:
+        for handles in self.files.values():
+            for f in handles:
+                f.close()
+
+WRITERS = {"columnar": ColumnPartWriter}
+if pyarrow is not None:
+    WRITERS["parquet"] = ParquetPartWriter
+
+def default_format() -> str:
+    return "parquet" if pyarrow is not None else "columnar"
+
+def load_manifest(directory: str) -> Optional[Dict[str, Any]]:
+    path = os.path.join(directory, MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def _save_manifest(directory: str, manifest: Dict[str, Any]) -> None:
+    # Written last and atomically: a part that isn't listed here never finished
+    tmp = os.path.join(directory, f"{MANIFEST}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(directory, MANIFEST))
+
+def export_history(store: IHistoryStore, directory: str, fmt: Optional[str] = None, chunk_size: int = 500,
+                   full: bool = False, log: Optional[Callable[[str], None]] = None) -> Dict[str, int]:
+    """
+    Exports stored analyses into `directory` as columnar tables (analyses,
+    repositories, dependencies). Each run adds one part per table containing
+    only the analyses stored since the previous run (tracked in manifest.json),
+    so re-exports append incrementally; `full=True` starts over.
+
+    Returns:
+        Dict[str, int]: Rows written per table in this run.
+    """
+    manifest = None if full else load_manifest(directory)
+    fmt = (manifest or {}).get("format") or fmt or default_format()
+    if fmt not in WRITERS:
+        raise ValueError(f"Unknown or unavailable export format '{fmt}' (available: {', '.join(WRITERS)})")
+    if manifest is not None and fmt != manifest["format"]:
+        raise ValueError(f"{directory} holds a '{manifest['format']}' export; use --full to switch formats")
+    if full and os.path.isdir(directory):
+        for table in TABLES:
+            shutil.rmtree(os.path.join(directory, table), ignore_errors=True)
+    manifest = manifest or {"format": fmt, "cursor": 0, "parts": 0, "rows": {table: 0 for table in TABLES}}
+
+    part = manifest["parts"]
+    writer_class = WRITERS[fmt]
+    for table in TABLES: # Leftovers of an interrupted run that never reached the manifest
+        leftover = os.path.join(directory, table, f"part-{part:05d}{writer_class.extension}")
+        if os.path.isdir(leftover):
+            shutil.rmtree(leftover)
+        elif os.path.exists(leftover):
+            os.remove(leftover)
+    writers = {}
+    counts = {table: 0 for table in TABLES}
+    cursor = manifest["cursor"]
+    try:
+        for chunk in store.iter_reports(after=cursor, chunk_size=chunk_size):
+            rows: Dict[str, List[Dict[str, Any]]] = {table: [] for table in TABLES}
+            for record in chunk:
+                for table, table_rows in flatten_record(record).items():
+                    rows[table].extend(table_rows)
+            for table, table_rows in rows.items():
+                if not table_rows:
+                    continue
+                if table not in writers:
+                    os.makedirs(os.path.join(directory, table), exist_ok=True)
+                    path = os.path.join(directory, table, f"part-{part:05d}{writer_class.extension}")
+                    writers[table] = writer_class(path, table)
+                writers[table].write(to_columns(table, table_rows))
+                counts[table] += len(table_rows)
+            cursor = chunk[-1]["cursor"]
+            if log:
+                log(f"Exported {counts['analyses']} analyses ({counts['repositories']} repositories)")
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    if writers:
+        manifest["parts"] = part + 1
+        manifest["cursor"] = cursor
+        for table, count in counts.items():
+            manifest["rows"][table] += count
+        os.makedirs(directory, exist_ok=True)
+        _save_manifest(directory, manifest)
+    return counts
+
+def read_column_part(path: str, table: str) -> Dict[str, Any]:
+    """
+    Reads a column-file part back: numpy arrays when numpy is installed (nulls
+    are NaN, INT_NULL or -1 for bools), else Python lists with None.
+    """
+    columns = {}
+    for name, kind in TABLES[table]:
+        if kind == "string":
+            offsets = array.array("q")
+            with open(os.path.join(path, f"{name}.offsets"), "rb") as f:
+                offsets.frombytes(f.read())
+            with open(os.path.join(path, f"{name}.data"), "rb") as f:
+                data = f.read()
+            if sys.byteorder != "little":
+                offsets.byteswap()
+            values, start = [], 0
+            for end in offsets:
+                if end < 0:
+                    values.append(None)
+                    continue
+                values.append(data[start:end].decode("utf-8"))
+                start = end
+            columns[name] = values
+            continue
+
+        filename = os.path.join(path, f"{name}.{kind}64" if kind != "bool" else f"{name}.bool")
+        typecode = ColumnPartWriter.TYPECODES[kind]
+        if numpy is not None:
+            columns[name] = numpy.fromfile(filename, dtype={"q": "<i8", "d": "<f8", "b": "i1"}[typecode])
+            continue
+        values = array.array(typecode)
+        with open(filename, "rb") as f:
+            values.frombytes(f.read())
+        if sys.byteorder != "little":
+            values.byteswap()
+        null = {"q": INT_NULL, "b": -1}.get(typecode)
+        if kind == "float":
+            columns[name] = [None if v != v else v for v in values]
+        elif kind == "bool":
+            columns[name] = [None if v == null else bool(v) for v in values]
+        else:
+            columns[name] = [None if v == null else v for v in values]
+    return columns
+
+def iter_parts(directory: str, table: str) -> Iterable[str]:
+    """Paths of a table's finished parts, oldest first."""
+    manifest = load_manifest(directory) or {"parts": 0, "format": default_format()}
+    extension = WRITERS[manifest["format"]].extension if manifest["format"] in WRITERS else ""
+    for part in range(manifest["parts"]):
+        path = os.path.join(directory, table, f"part-{part:05d}{extension}")
+        if os.path.exists(path):
+            yield path
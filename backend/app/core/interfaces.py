@@ -1,6 +1,28 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any
-from app.models.dtos import UserProfile
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from app.models.dtos import UserProfile, Repository
+
+class RepositoryStream:
+    """
+    Iterator over fetched repositories that also exposes how many are expected.
+    `skipped` lists parts of the profile left unfetched at the deadline (e.g. "profile_readme").
+    """
+    def __init__(self, iterator: Iterator[Repository], total: Optional[int] = None, skipped: Optional[List[str]] = None):
+        self._iterator = iterator
+        self.total = total
+        self.skipped = skipped if skipped is not None else []
+
+    def __iter__(self) -> "RepositoryStream":
+        return self
+
+    def __next__(self) -> Repository:
+        return next(self._iterator)
+
+    def close(self) -> None:
+        """Stops the stream early, letting the provider cancel outstanding fetches."""
+        close = getattr(self._iterator, "close", None)
+        if close:
+            close()
 
 class IGithubProvider(ABC):
     """
@@ -25,20 +47,85 @@ class IGithubProvider(ABC):
         """
         pass
 
+    def stream_user_profile(self, username: str, deadline: Optional[float] = None) -> Tuple[UserProfile, RepositoryStream]:
+        """
+        Fetches the user profile and yields repositories as they become available.
+
+        The returned UserProfile has an empty `repositories` list; consumers collect
+        them from the iterator. Repositories are yielded in completion order.
+        The default implementation fetches everything eagerly via get_user_profile.
+
+        Args:
+            username (str): The GitHub username.
+            deadline (float, optional): Unix timestamp; the stream ends there and
+                fetches still pending are dropped.
+
+        Returns:
+            Tuple[UserProfile, RepositoryStream]: The profile and a repository stream.
+        """
+        profile = self.get_user_profile(username)
+        repositories = list(profile.repositories)
+        profile.repositories = []
+        return profile, RepositoryStream(iter(repositories), len(repositories))
+
 class ILLMProvider(ABC):
     """
     Abstract Interface for LLM Provider.
     """
     
     @abstractmethod
-    def generate_analysis(self, context_data: str) -> Dict[str, Any]:
+    def generate_analysis(self, context_data: str, timeout: Optional[float] = None) -> Dict[str, Any]:
         """
         Generates analysis based on the provided context data.
         
         Args:
             context_data (str): Data context for the LLM (e.g. profile info).
+            timeout (float, optional): Total time budget in seconds, including retries.
             
         Returns:
             Dict[str, Any]: structured analysis result.
         """
         pass
+
+class IHistoryStore(ABC):
+    """
+    Abstract Interface for the durable store of finished analyses.
+    """
+
+    @abstractmethod
+    def save_many(self, records: List[Dict[str, Any]]) -> None:
+        """
+        Stores finished analyses in one write.
+
+        Args:
+            records: Dicts with `analysis_id`, `model`, `created_at` (Unix time)
+                and `report` (a dumped AnalysisReport).
+        """
+        pass
+
+    @abstractmethod
+    def latest(self, username: str) -> Optional[Dict[str, Any]]:
+        """Returns the most recent stored analysis of a user, with its report."""
+        pass
+
+    @abstractmethod
+    def trend(self, username: str, since: Optional[float] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Returns a user's score snapshots over time, oldest first (no reports)."""
+        pass
+
+    @abstractmethod
+    def delta(self, username: str, from_id: Optional[str] = None, to_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Returns what changed between two analyses of a user (default: the last two):
+        score differences and added, removed or re-scored repositories.
+        """
+        pass
+
+    @abstractmethod
+    def iter_reports(self, after: int = 0, chunk_size: int = 500) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Streams stored analyses written after the `after` cursor, in insertion
+        order and in chunks of at most `chunk_size`. Each record has `cursor`,
+        `analysis_id`, `model`, `created_at` and `report`.
+        """
+        pass
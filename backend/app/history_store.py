@@ -0,0 +1,251 @@
+import os
+import queue
+import atexit
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+from app.core.interfaces import IHistoryStore
+from app.result_codec import encode_result, decode_result
+
+# Report-level scores kept as indexed columns (report key == column name)
+SCORE_COLUMNS = (
+    "overall_score", "profile_score", "repo_quality_score",
+    "avg_repo_docs_score", "avg_code_hygiene_score", "personal_readme_score"
+)
+REPO_SCORE_COLUMNS = ("maturity_score", "docs_score", "hygiene_score")
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS analyses (
+    analysis_id TEXT PRIMARY KEY,
+    username TEXT NOT NULL,
+    model TEXT,
+    created_at REAL NOT NULL,
+    {", ".join(f"{c} INTEGER" for c in SCORE_COLUMNS)},
+    repo_count INTEGER,
+    report BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_analyses_user_time ON analyses (username, created_at);
+CREATE INDEX IF NOT EXISTS idx_analyses_time ON analyses (created_at);
+CREATE INDEX IF NOT EXISTS idx_analyses_overall ON analyses (overall_score);
+CREATE TABLE IF NOT EXISTS repo_snapshots (
+    analysis_id TEXT NOT NULL,
+    html_url TEXT NOT NULL,
+    name TEXT,
+    language TEXT,
+    maturity_label TEXT,
+    {", ".join(f"{c} INTEGER" for c in REPO_SCORE_COLUMNS)},
+    PRIMARY KEY (analysis_id, html_url)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_repo_snapshots_url ON repo_snapshots (html_url, analysis_id);
+"""
+
+def _score(detail: Any) -> Optional[int]:
+    return detail.get("score") if isinstance(detail, dict) else detail
+
+class SQLiteHistoryStore(IHistoryStore):
+    """
+    History of finished analyses in SQLite: the full report (encoded with the
+    result codec) plus indexed score columns and per-repository score snapshots,
+    so latest-report, trend and delta queries never decode more than they return.
+
+    Each thread gets its own connection; WAL mode lets the API read while
+    workers write.
+    """
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("HISTORY_DB_PATH", "analysis_history.db")
+        self._local = threading.local()
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def save_many(self, records: List[Dict[str, Any]]) -> None:
+        analyses, snapshots = [], []
+        for record in records:
+            report = record["report"]
+            repositories = (report.get("details") or {}).get("repositories", [])
+            analyses.append((
+                record["analysis_id"], report["username"].lower(), record.get("model"), record["created_at"],
+                *[_score(report.get(c)) for c in SCORE_COLUMNS],
+                len(repositories), encode_result(report)
+            ))
+            for repo in repositories:
+                snapshots.append((
+                    record["analysis_id"], repo["html_url"], repo.get("name"), repo.get("language"),
+                    repo.get("maturity_label"), _score(repo.get("maturity_score")),
+                    _score(repo.get("repo_documentation_score")), _score(repo.get("code_hygiene_score"))
+                ))
+
+        columns = ("analysis_id", "username", "model", "created_at", *SCORE_COLUMNS, "repo_count", "report")
+        connection = self._connection()
+        with connection: # One transaction per batch
+            connection.executemany(
+                f"INSERT OR REPLACE INTO analyses ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                analyses
+            )
+            connection.executemany(
+                f"INSERT OR REPLACE INTO repo_snapshots VALUES ({', '.join('?' * 8)})", snapshots
+            )
+
+    def _summary(self, row: sqlite3.Row) -> Dict[str, Any]:
+        return {k: row[k] for k in ("analysis_id", "username", "model", "created_at", *SCORE_COLUMNS, "repo_count")}
+
+    def latest(self, username: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute(
+            "SELECT * FROM analyses WHERE username = ? ORDER BY created_at DESC LIMIT 1", (username.lower(),)
+        ).fetchone()
+        if row is None:
+            return None
+        return {**self._summary(row), "report": decode_result(row["report"])}
+
+    def trend(self, username: str, since: Optional[float] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        columns = ", ".join(("analysis_id", "username", "model", "created_at", *SCORE_COLUMNS, "repo_count"))
+        # Newest `limit` snapshots via the (username, created_at) index, returned oldest first
+        rows = self._connection().execute(
+            f"SELECT {columns} FROM analyses WHERE username = ? AND created_at >= ? ORDER BY created_at DESC LIMIT ?",
+            (username.lower(), since or 0, limit)
+        ).fetchall()
+        return [self._summary(row) for row in reversed(rows)]
+
+    def _analysis_pair(self, username: str, from_id: Optional[str], to_id: Optional[str]) -> List[sqlite3.Row]:
+        connection = self._connection()
+        columns = ", ".join(("analysis_id", "username", "model", "created_at", *SCORE_COLUMNS, "repo_count"))
+        if from_id and to_id:
+            rows = connection.execute(
+                f"SELECT {columns} FROM analyses WHERE username = ? AND analysis_id IN (?, ?) ORDER BY created_at",
+                (username.lower(), from_id, to_id)
+            ).fetchall()
+            return rows if len(rows) == 2 else []
+        rows = connection.execute(
+            f"SELECT {columns} FROM analyses WHERE username = ? ORDER BY created_at DESC LIMIT 2", (username.lower(),)
+        ).fetchall()
+        return list(reversed(rows)) if len(rows) == 2 else []
+
+    def _snapshots(self, analysis_id: str) -> Dict[str, sqlite3.Row]:
+        rows = self._connection().execute("SELECT * FROM repo_snapshots WHERE analysis_id = ?", (analysis_id,)).fetchall()
+        return {row["html_url"]: row for row in rows}
+
+    def delta(self, username: str, from_id: Optional[str] = None, to_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        pair = self._analysis_pair(username, from_id, to_id)
+        if not pair:
+            return None
+        old, new = pair
+        scores = {c: new[c] - old[c] for c in SCORE_COLUMNS if old[c] is not None and new[c] is not None and new[c] != old[c]}
+
+        before, after = self._snapshots(old["analysis_id"]), self._snapshots(new["analysis_id"])
+        changed = []
+        for url in after.keys() & before.keys():
+            changes = {c: after[url][c] - before[url][c] for c in REPO_SCORE_COLUMNS
+                       if after[url][c] is not None and before[url][c] is not None and after[url][c] != before[url][c]}
+            if after[url]["maturity_label"] != before[url]["maturity_label"]:
+                changes["maturity_label"] = after[url]["maturity_label"]
+            if changes:
+                changed.append({"html_url": url, "name": after[url]["name"], "changes": changes})
+
+        return {
+            "username": new["username"],
+            "from": {"analysis_id": old["analysis_id"], "created_at": old["created_at"]},
+            "to": {"analysis_id": new["analysis_id"], "created_at": new["created_at"]},
+            "scores": scores,
+            "repositories": {
+                "added": sorted(after[url]["name"] for url in after.keys() - before.keys()),
+                "removed": sorted(before[url]["name"] for url in before.keys() - after.keys()),
+                "changed": sorted(changed, key=lambda c: c["name"] or "")
+            }
+        }
+
+    def iter_reports(self, after: int = 0, chunk_size: int = 500) -> Iterator[List[Dict[str, Any]]]:
+        # The rowid grows with every insert (a replaced analysis gets a new one), so it is the export cursor
+        connection = self._connection()
+        while True:
+            rows = connection.execute(
+                "SELECT rowid, analysis_id, model, created_at, report FROM analyses WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                (after, chunk_size)
+            ).fetchall()
+            if not rows:
+                return
+            yield [
+                {"cursor": row["rowid"], "analysis_id": row["analysis_id"], "model": row["model"],
+                 "created_at": row["created_at"], "report": decode_result(row["report"])}
+                for row in rows
+            ]
+            after = rows[-1]["rowid"]
+
+class HistoryWriter:
+    """
+    Buffers finished analyses and writes them to the history store in batches
+    from a background thread, so a worker's job never waits on the database.
+    A batch is written once `batch_size` records are queued or `flush_seconds`
+    after its first record, whichever comes first.
+    """
+    _STOP = object()
+
+    def __init__(self, store: IHistoryStore, batch_size: Optional[int] = None, flush_seconds: Optional[float] = None):
+        self.store = store
+        self.batch_size = batch_size or int(os.getenv("HISTORY_BATCH_SIZE", "50"))
+        self.flush_seconds = flush_seconds or float(os.getenv("HISTORY_FLUSH_SECONDS", "2"))
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, analysis_id: str, model: Optional[str], report: Dict[str, Any]) -> None:
+        self._queue.put({"analysis_id": analysis_id, "model": model, "created_at": time.time(), "report": report})
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is self._STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_seconds
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is self._STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            try:
+                self.store.save_many(batch)
+            except Exception as e:
+                print(f"Could not write {len(batch)} analyses to history: {e}")
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Writes everything still buffered and stops the thread."""
+        self._queue.put(self._STOP)
+        self._thread.join(timeout)
+
+_store: Optional[IHistoryStore] = None
+_writer: Optional[HistoryWriter] = None
+_writer_pid: Optional[int] = None
+
+def get_history_store() -> Optional[IHistoryStore]:
+    """The process-wide history store, or None if disabled (HISTORY_STORE=none)."""
+    global _store
+    if os.getenv("HISTORY_STORE", "sqlite") == "none":
+        return None
+    if _store is None:
+        _store = SQLiteHistoryStore()
+    return _store
+
+def get_history_writer() -> Optional[HistoryWriter]:
+    """The process's batching writer, started on first use (after any fork)."""
+    global _writer, _writer_pid
+    store = get_history_store()
+    if store is None:
+        return None
+    if _writer is None or _writer_pid != os.getpid():
+        _writer, _writer_pid = HistoryWriter(store), os.getpid()
+        atexit.register(_writer.close)
+    return _writer
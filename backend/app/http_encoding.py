@@ -0,0 +1,36 @@
+import gzip
+from typing import Optional
+
+# Brotli is optional; gzip from the stdlib is always available.
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are cheaper to send as-is than to compress.
+MIN_COMPRESS_BYTES = 1024
+
+def supported_encodings():
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+def pick_encoding(accept_encodings, size: int) -> Optional[str]:
+    """
+    Chooses a content-coding for a response body of `size` bytes.
+
+    Args:
+        accept_encodings: The request's parsed Accept-Encoding header (werkzeug MIMEAccept-like).
+        size (int): Uncompressed body size.
+
+    Returns:
+        Optional[str]: "br", "gzip" or None to send the body uncompressed.
+    """
+    if size < MIN_COMPRESS_BYTES:
+        return None
+    return accept_encodings.best_match(supported_encodings())
+
+def compress_body(body: bytes, encoding: Optional[str]) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6)
+    return body
@@ -1,14 +1,51 @@
+import os
+from collections import OrderedDict
+from typing import Any, Optional
 from rq.job import Job
+from rq.results import Result
 from app.redis_client import get_redis_connection
+from app.result_codec import decode_result, to_json_bytes
+from app.http_encoding import compress_body
+from app.pipeline import upstream_job_ids
+from app.cancellation import cancel_key
 from rq.exceptions import NoSuchJobError
 
+class JobSnapshot:
+    """
+    Point-in-time view of a job: status, a version for conditional requests and,
+    when requested, the raw latest-result entry. Built from one pipelined round trip.
+    For staged analyses, `failed_job_id` names the stage job holding the error.
+    """
+    __slots__ = ("job_id", "status", "version", "failed_job_id", "_result_entry")
+
+    def __init__(self, job_id: str, status: str, version: str, result_entry: Optional[Any] = None,
+                 failed_job_id: Optional[str] = None):
+        self.job_id = job_id
+        self.status = status
+        self.version = version
+        self.failed_job_id = failed_job_id or job_id
+        self._result_entry = result_entry
+
+    @property
+    def has_result_entry(self) -> bool:
+        return self._result_entry is not None
+
+    def latest_result(self, connection) -> Optional[Result]:
+        if not self._result_entry:
+            return None
+        result_id, payload = self._result_entry
+        return Result.restore(self.job_id, result_id.decode(), payload, connection=connection)
+
 class JobStore:
     """
     Simple abstraction to track and retrieve job statuses.
     Relies on Redis/RQ as the backing store.
     """
-    def __init__(self):
+    def __init__(self, json_cache_size: Optional[int] = None):
         self.connection = get_redis_connection()
+        # Finished results never change, so their serialized JSON is cached per process.
+        self.json_cache_size = json_cache_size or int(os.getenv("RESULT_JSON_CACHE_SIZE", "128"))
+        self._json_cache: "OrderedDict[Any, bytes]" = OrderedDict()
 
     def get_job(self, job_id: str):
         try:
@@ -16,18 +53,117 @@ class JobStore:
         except NoSuchJobError:
             return None
 
+    def get_snapshot(self, job_id: str, include_result: bool = False) -> JobSnapshot:
+        """
+        Reads only the job's status and end time (plus the latest result entry if
+        `include_result` is set and its JSON isn't cached yet) in a single pipeline,
+        instead of deserializing the whole job with `Job.fetch`.
+        """
+        include_result = include_result and job_id not in self._json_cache
+        upstream_ids = upstream_job_ids(job_id)
+        pipe = self.connection.pipeline(transaction=False)
+        pipe.hmget(Job.key_for(job_id), "status", "ended_at")
+        for upstream_id in upstream_ids:
+            pipe.hget(Job.key_for(upstream_id), "status")
+        pipe.exists(cancel_key(job_id))
+        if include_result:
+            pipe.xrevrange(Result.get_key(job_id), "+", "-", count=1)
+        replies = pipe.execute()
+
+        status, ended_at = replies[0]
+        if status is None:
+            return JobSnapshot(job_id, "unknown", "unknown")
+        # RQ statuses: queued, started, finished, failed, deferred, scheduled, stopped, canceled
+        status = status.decode("utf-8")
+        upstream = [(upstream_id, s.decode("utf-8")) for upstream_id, s in zip(upstream_ids, replies[1:1 + len(upstream_ids)]) if s]
+        cancel_requested = bool(replies[1 + len(upstream_ids)])
+        version = ":".join([status, ended_at.decode("utf-8") if ended_at else ""] + [s for _, s in upstream])
+        if cancel_requested:
+            version += ":cancel"
+        entry = replies[-1][0] if include_result and replies[-1] else None
+
+        # A staged analysis waits in "deferred" until its earlier stages finish;
+        # report the pipeline's progress (or an earlier stage's failure) instead.
+        failed_job_id = None
+        if upstream and status in ("deferred", "canceled"):
+            failed = [upstream_id for upstream_id, s in upstream if s in ("failed", "stopped")]
+            if failed:
+                status, failed_job_id = "failed", failed[0]
+            elif status == "deferred":
+                status = "queued" if upstream[0][1] == "queued" else "started"
+        # Running stages stop at their next checkpoint; report the cancel right away
+        if cancel_requested and status != "finished":
+            status = "canceled"
+        return JobSnapshot(job_id, status, version, entry, failed_job_id)
+
     def get_status(self, job_id: str):
-        job = self.get_job(job_id)
-        if not job:
-            return "unknown"
-        
-        status = job.get_status()
-        # Map RQ statuses to our API statuses if needed, or return as is.
-        # RQ statuses: queued, started, finished, failed, deferred, scheduled
-        return status
-
-    def get_result(self, job_id: str):
+        return self.get_snapshot(job_id).status
+
+    def get_result(self, job_id: str, snapshot: Optional[JobSnapshot] = None):
+        if snapshot is None or not snapshot.has_result_entry:
+            snapshot = self.get_snapshot(job_id, include_result=True)
+        result = snapshot.latest_result(self.connection)
+        if result is not None:
+            return decode_result(result.return_value) if result.type == Result.Type.SUCCESSFUL else None
+
+        # Results written to the job hash by older RQ versions
         job = self.get_job(job_id)
         if not job:
             return None
-        return job.result
+        return decode_result(job.return_value())
+
+    def get_error(self, job_id: str, snapshot: Optional[JobSnapshot] = None) -> Optional[str]:
+        """Returns the traceback of a failed job (or of the pipeline stage that failed)."""
+        if snapshot is None or not snapshot.has_result_entry:
+            snapshot = self.get_snapshot(job_id, include_result=True)
+        if snapshot.failed_job_id != job_id:
+            # Upstream stage failures live in that stage's result stream
+            entry = self.connection.xrevrange(Result.get_key(snapshot.failed_job_id), "+", "-", count=1)
+            snapshot = JobSnapshot(snapshot.failed_job_id, snapshot.status, snapshot.version, entry[0] if entry else None)
+        result = snapshot.latest_result(self.connection)
+        if result is not None and result.type == Result.Type.FAILED:
+            return result.exc_string
+        return None
+
+    def _cache_get(self, key: Any) -> Optional[bytes]:
+        cached = self._json_cache.get(key)
+        if cached is not None:
+            self._json_cache.move_to_end(key)
+        return cached
+
+    def _cache_put(self, key: Any, value: bytes) -> None:
+        self._json_cache[key] = value
+        if len(self._json_cache) > self.json_cache_size:
+            self._json_cache.popitem(last=False)
+
+    def get_result_json(self, job_id: str, snapshot: Optional[JobSnapshot] = None) -> Optional[bytes]:
+        """
+        Returns the finished result pre-serialized as JSON bytes.
+        """
+        cached = self._cache_get(job_id)
+        if cached is not None:
+            return cached
+
+        result = self.get_result(job_id, snapshot)
+        if result is None:
+            return None
+
+        encoded = to_json_bytes(result)
+        self._cache_put(job_id, encoded)
+        return encoded
+
+    def get_finished_body(self, snapshot: JobSnapshot, encoding: Optional[str] = None) -> bytes:
+        """
+        Status response body for a finished job, optionally content-encoded.
+        The result JSON is spliced in rather than re-encoded, and each encoding is cached.
+        """
+        key = (snapshot.job_id, encoding)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+
+        result_json = self.get_result_json(snapshot.job_id, snapshot) or b"null"
+        envelope = to_json_bytes({"job_id": snapshot.job_id, "status": snapshot.status})
+        body = compress_body(envelope[:-1] + b',"result":' + result_json + b'}', encoding)
+        self._cache_put(key, body)
+        return body
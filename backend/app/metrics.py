@@ -0,0 +1,239 @@
+"""
+Operational metrics in Prometheus text format, aggregated across processes in Redis.
+
+Workers and API processes record into a local buffer (`inc`, `observe`,
+`set_gauge`), which is written to Redis in one pipeline at most every
+METRICS_FLUSH_SECONDS and at the end of every job. Redis therefore holds the
+totals of all processes. `/metrics` renders them together with queue and
+worker gauges read at scrape time. METRICS=0 turns recording off.
+"""
+import os
+import re
+import time
+import atexit
+import bisect
+import threading
+from typing import Dict, List, Optional, Tuple
+from app import redis_client
+from app.redis_client import get_redis_connection
+
+VALUES_KEY = "metrics:values" # Counters and histogram series (HINCRBYFLOAT)
+GAUGES_KEY = "metrics:gauges" # Last written value (HSET)
+
+STAGE_BUCKETS = (0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+# name -> (type, help, histogram buckets)
+DEFINITIONS: Dict[str, Tuple[str, str, Tuple[float, ...]]] = {
+    "analysis_requests_total": ("counter", "Analysis requests by how they were served (new, inflight, cache, rejected).", ()),
+    "analysis_jobs_total": ("counter", "Finished pipeline jobs by stage and outcome (success, failure, retry, canceled).", ()),
+    "analysis_stage_duration_seconds": ("histogram", "Wall time of successful pipeline stages.", STAGE_BUCKETS),
+    "github_requests_total": ("counter", "GitHub API requests by response status class.", ()),
+    "github_response_bytes_total": ("counter", "Bytes received from the GitHub API.", ()),
+    "github_rate_limit_remaining": ("gauge", "Remaining GitHub core API calls, from the latest response.", ()),
+    "github_rate_limit_reset_timestamp": ("gauge", "When the GitHub rate limit resets (Unix time).", ()),
+    "cache_requests_total": ("counter", "Cache lookups by cache and result (hit or miss).", ()),
+    "llm_requests_total": ("counter", "LLM requests by model and outcome.", ()),
+    "llm_request_duration_seconds": ("histogram", "Duration of LLM requests.", (1, 5, 10, 30, 60, 120, 300)),
+    "llm_prompt_chars": ("histogram", "Size of LLM prompts in characters.", (1000, 2000, 4000, 8000, 16000, 32000, 64000)),
+    "llm_tokens_total": ("counter", "Tokens processed by the LLM (kind: prompt or response).", ()),
+    "llm_tokens_per_second": ("histogram", "LLM generation speed.", (1, 5, 10, 20, 40, 80, 160)),
+}
+
+# One `name="value"` pair of a rendered series; values may contain escaped quotes and commas
+LABEL_PATTERN = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+def _escape(value: str) -> str:
+    """Label value escaping of the Prometheus text format."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _series(name: str, labels: Dict[str, str]) -> str:
+    if not labels:
+        return name
+    rendered = ",".join(f'{k}="{_escape(str(v))}"' for k, v in sorted(labels.items()))
+    return f"{name}{{{rendered}}}"
+
+def _labels(series: str) -> List[Tuple[str, str]]:
+    """The (name, escaped value) pairs of a rendered series."""
+    return LABEL_PATTERN.findall(series[series.index("{") + 1:-1]) if "{" in series else []
+
+def _format_bound(bound: float) -> str:
+    return str(int(bound)) if float(bound).is_integer() else str(bound)
+
+class MetricsBuffer:
+    """Per-process buffer of metric updates, flushed to Redis in batches."""
+    def __init__(self, flush_seconds: Optional[float] = None):
+        self.flush_seconds = flush_seconds if flush_seconds is not None else float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+        self.enabled = os.getenv("METRICS", "1") != "0"
+        self._lock = threading.Lock()
+        self._values: Dict[str, float] = {}
+        self._gauges: Dict[str, float] = {}
+        self._last_flush = time.monotonic()
+
+    def _add(self, series: str, amount: float) -> None:
+        self._values[series] = self._values.get(series, 0.0) + amount
+
+    def inc(self, name: str, amount: float = 1.0, **labels) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._add(_series(name, labels), amount)
+        self._maybe_flush()
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        if not self.enabled:
+            return
+        buckets = DEFINITIONS[name][2]
+        with self._lock:
+            # Stored non-cumulatively; render() accumulates
+            index = bisect.bisect_left(buckets, value)
+            bound = _format_bound(buckets[index]) if index < len(buckets) else "+Inf"
+            self._add(_series(f"{name}_bucket", {**labels, "le": bound}), 1)
+            self._add(_series(f"{name}_sum", labels), value)
+            self._add(_series(f"{name}_count", labels), 1)
+        self._maybe_flush()
+
+    def set_gauge(self, name: str, value: float, **labels) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._gauges[_series(name, labels)] = value
+        self._maybe_flush()
+
+    def _maybe_flush(self) -> None:
+        if time.monotonic() - self._last_flush >= self.flush_seconds:
+            self.flush()
+
+    def pending(self) -> bool:
+        with self._lock:
+            return bool(self._values or self._gauges)
+
+    def flush(self) -> None:
+        with self._lock:
+            values, gauges = self._values, self._gauges
+            self._values, self._gauges = {}, {}
+            self._last_flush = time.monotonic()
+        if not values and not gauges:
+            return
+        try:
+            pipe = get_redis_connection().pipeline(transaction=False)
+            for series, amount in values.items():
+                pipe.hincrbyfloat(VALUES_KEY, series, amount)
+            if gauges:
+                pipe.hset(GAUGES_KEY, mapping=gauges)
+            pipe.execute()
+        except Exception as e:
+            print(f"Could not flush metrics: {e}")
+
+_buffer: Optional[MetricsBuffer] = None
+_buffer_pid: Optional[int] = None
+
+def _flush_at_exit(buffer: MetricsBuffer) -> None:
+    # Skipped when nothing was recorded, or when the process has no Redis connection left to reuse:
+    # connecting at exit would only fail noisily (e.g. in scripts and tests)
+    if buffer.pending() and redis_client._connection is not None:
+        buffer.flush()
+
+def get_buffer() -> MetricsBuffer:
+    global _buffer, _buffer_pid
+    if _buffer is None or _buffer_pid != os.getpid():
+        _buffer, _buffer_pid = MetricsBuffer(), os.getpid()
+        atexit.register(_flush_at_exit, _buffer)
+    return _buffer
+
+def inc(name: str, amount: float = 1.0, **labels) -> None:
+    get_buffer().inc(name, amount, **labels)
+
+def observe(name: str, value: float, **labels) -> None:
+    get_buffer().observe(name, value, **labels)
+
+def set_gauge(name: str, value: float, **labels) -> None:
+    get_buffer().set_gauge(name, value, **labels)
+
+def flush() -> None:
+    get_buffer().flush()
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+def _decode(value) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+def _metric_name(series: str) -> str:
+    name = series.split("{", 1)[0]
+    for suffix in ("_bucket", "_sum", "_count"):
+        if name.endswith(suffix) and name[:-len(suffix)] in DEFINITIONS:
+            return name[:-len(suffix)]
+    return name
+
+def _cumulative_buckets(name: str, series: Dict[str, float]) -> List[Tuple[str, float]]:
+    """Turns per-bucket counts into Prometheus' cumulative `le` buckets, per label set."""
+    buckets = [_format_bound(b) for b in DEFINITIONS[name][2]] + ["+Inf"]
+    by_labels: Dict[str, Dict[str, float]] = {}
+    for key, value in series.items():
+        labels = _labels(key)
+        le = next(v for k, v in labels if k == "le")
+        rest = ",".join(f'{k}="{v}"' for k, v in labels if k != "le")
+        by_labels.setdefault(rest, {})[le] = value
+    lines = []
+    for rest, counts in sorted(by_labels.items()):
+        total = 0.0
+        for bound in buckets:
+            total += counts.get(bound, 0.0)
+            labels = f'{rest},le="{bound}"' if rest else f'le="{bound}"'
+            lines.append((f"{name}_bucket{{{labels}}}", total))
+    return lines
+
+def _scrape_gauges(connection) -> List[Tuple[str, str, str, List[Tuple[str, float]]]]:
+    """Queue depth per queue and state, and workers per queue, read from RQ at scrape time."""
+    from rq.registry import DeferredJobRegistry, ScheduledJobRegistry, StartedJobRegistry
+    from rq.worker_registration import WORKERS_BY_QUEUE_KEY
+    from app.redis_client import get_queue
+    from app.pipeline import STAGE_QUEUES
+
+    depth, workers = [], []
+    for queue_name in list(STAGE_QUEUES.values()) + ["default"]:
+        queue = get_queue(queue_name)
+        for state, count in (
+            ("queued", queue.count),
+            ("started", StartedJobRegistry(queue=queue).count),
+            ("deferred", DeferredJobRegistry(queue=queue).count),
+            ("scheduled", ScheduledJobRegistry(queue=queue).count),
+        ):
+            depth.append((_series("analysis_queue_jobs", {"queue": queue_name, "state": state}), count))
+        workers.append((_series("analysis_workers", {"queue": queue_name}),
+                        connection.scard(WORKERS_BY_QUEUE_KEY % queue_name)))
+    return [
+        ("analysis_queue_jobs", "gauge", "Jobs per queue and state.", depth),
+        ("analysis_workers", "gauge", "Workers listening on each queue.", workers),
+    ]
+
+def render() -> str:
+    """All metrics in Prometheus text exposition format (version 0.0.4)."""
+    flush() # Include this process's buffered updates
+    connection = get_redis_connection()
+    stored = {_decode(k): float(v) for k, v in connection.hgetall(VALUES_KEY).items()}
+    stored.update({_decode(k): float(v) for k, v in connection.hgetall(GAUGES_KEY).items()})
+
+    grouped: Dict[str, Dict[str, float]] = {}
+    for series, value in stored.items():
+        grouped.setdefault(_metric_name(series), {})[series] = value
+
+    lines = []
+    for name, (kind, help_text, _) in DEFINITIONS.items():
+        series = grouped.get(name)
+        if not series:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        if kind == "histogram":
+            samples = _cumulative_buckets(name, {k: v for k, v in series.items() if k.startswith(f"{name}_bucket")})
+            samples += sorted((k, v) for k, v in series.items() if not k.startswith(f"{name}_bucket"))
+        else:
+            samples = sorted(series.items())
+        lines.extend(f"{key} {_format_value(value)}" for key, value in samples)
+
+    for name, kind, help_text, samples in _scrape_gauges(connection):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(f"{key} {_format_value(value)}" for key, value in samples)
+    return "\n".join(lines) + "\n"
@@ -1,5 +1,81 @@
-from typing import List, Optional, Dict, Any
+from copy import copy
+from typing import List, Optional, Dict, Any, Tuple, Type, TypeVar, get_args, get_origin
 from pydantic import BaseModel, Field
+from app.models.file_tree import FileTree
+
+PYDANTIC_V2 = hasattr(BaseModel, "model_construct")
+if PYDANTIC_V2:
+    from pydantic_core import PydanticUndefined
+
+M = TypeVar("M", bound=BaseModel)
+
+def _construct_plan(model_cls: Type[BaseModel]):
+    """
+    Per-class construction plan for `trusted`: a template of the static
+    defaults in field order, (name, factory) for defaults that must be fresh
+    per instance, the required field names, and the fields holding a model or
+    a list of models (name -> (model class, is_list)).
+    """
+    template, factories, required, nested = {}, [], [], {}
+    for name, field in model_cls.model_fields.items():
+        template[name] = field.default
+        if field.default_factory is not None:
+            factories.append((name, field.default_factory))
+        elif field.default is PydanticUndefined:
+            required.append(name)
+        elif isinstance(field.default, (list, dict, set)):
+            factories.append((name, lambda default=field.default: copy(default)))
+        annotation, is_list = field.annotation, False
+        if get_origin(annotation) in (list, List):
+            annotation, is_list = (get_args(annotation) or (None,))[0], True
+        if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+            nested[name] = (annotation, is_list)
+    return template, factories, required, nested
+
+_construct_plans: Dict[type, Any] = {}
+
+def trusted(model_cls: Type[M], **fields: Any) -> M:
+    """
+    Builds a DTO from internally produced data without validation. Missing
+    fields get their defaults (mutable ones copied) or default factories;
+    nested models given as dicts are built the same way. Values must already
+    have their field types (e.g. a FileTree, not a list of paths).
+    Never rely on this for external input (API payloads, LLM output).
+    """
+    if not PYDANTIC_V2:
+        return model_cls.construct(**fields)
+    plan = _construct_plans.get(model_cls)
+    if plan is None:
+        plan = _construct_plans[model_cls] = _construct_plan(model_cls)
+    template, factories, required, nested = plan
+    for name, (nested_cls, is_list) in nested.items():
+        value = fields.get(name)
+        if is_list and isinstance(value, list):
+            fields[name] = [trusted(nested_cls, **v) if isinstance(v, dict) else v for v in value]
+        elif isinstance(value, dict):
+            fields[name] = trusted(nested_cls, **value)
+
+    # model_construct() without its per-field bookkeeping: the plan is computed once per class
+    values = template.copy()
+    values.update(fields)
+    for name, factory in factories:
+        if name not in fields:
+            values[name] = factory()
+    for name in required:
+        if name not in fields:
+            raise TypeError(f"{model_cls.__name__}: missing required field '{name}'")
+    instance = model_cls.__new__(model_cls)
+    object.__setattr__(instance, "__dict__", values)
+    object.__setattr__(instance, "__pydantic_fields_set__", set(fields))
+    object.__setattr__(instance, "__pydantic_extra__", None)
+    object.__setattr__(instance, "__pydantic_private__", None)
+    return instance
+
+def dump_model(model: BaseModel, **kwargs: Any) -> Dict[str, Any]:
+    """Version-independent `model_dump()` / `dict()`."""
+    if PYDANTIC_V2:
+        return model.model_dump(**kwargs)
+    return model.dict(**kwargs)
 
 class ScoreDetail(BaseModel):
     score: int
@@ -23,9 +99,9 @@ class Repository(BaseModel):
     topics: List[str] = []
     
     # Scores as Detailed Objects
-    maturity_score: ScoreDetail = Field(default_factory=lambda: ScoreDetail(score=0, level="Hobby"))
-    repo_documentation_score: ScoreDetail = Field(default_factory=lambda: ScoreDetail(score=0, level="None"))
-    code_hygiene_score: ScoreDetail = Field(default_factory=lambda: ScoreDetail(score=0, level="Standard"))
+    maturity_score: ScoreDetail = Field(default_factory=lambda: trusted(ScoreDetail, score=0, level="Hobby"))
+    repo_documentation_score: ScoreDetail = Field(default_factory=lambda: trusted(ScoreDetail, score=0, level="None"))
+    code_hygiene_score: ScoreDetail = Field(default_factory=lambda: trusted(ScoreDetail, score=0, level="Standard"))
     
     # Deprecated/Derived Simple Fields
     maturity_label: str = "Hobby"
@@ -39,11 +115,27 @@ class Repository(BaseModel):
     recommendations: List[str] = []
 
     # Raw Data Fields
-    file_tree: List[str] = []
+    file_tree: FileTree = Field(default_factory=FileTree)
     dependency_files: Dict[str, str] = Field(default_factory=dict)
     readme_content: Optional[str] = None
     commit_history: List[Dict[str, Any]] = []
 
+# Bulky fetch-time fields kept out of reports; served lazily by RepositoryStore.
+RAW_REPOSITORY_FIELDS = {"file_tree", "dependency_files", "readme_content", "commit_history"}
+
+class RepoScores(BaseModel):
+    """Deterministic scoring output for one repository (see ScoringEngine)."""
+    has_ci: bool = False
+    has_docker: bool = False
+    has_tests: bool = False
+    has_license: bool = False
+    dependencies: List[str] = []
+    conventional_commits_ratio: float = 0.0
+    commit_frequency: float = 0.0
+    code_hygiene_score: ScoreDetail
+    repo_documentation_score: ScoreDetail
+    maturity_score: ScoreDetail
+
 class UserProfile(BaseModel):
     username: str
     name: Optional[str] = None
@@ -0,0 +1,138 @@
+import sys
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+class FileTree:
+    """
+    Compact, immutable representation of a repository file tree.
+
+    Paths are split into segments that are interned once; the tree itself is a
+    parent/name table stored in `array`s, so a 200k-entry monorepo keeps each
+    directory name once instead of repeating it in every path. Iterating yields
+    the original paths, in their original order.
+    """
+    __slots__ = ("segments", "parents", "names", "entries")
+
+    def __init__(self, segments: Optional[List[str]] = None, parents: Optional[array] = None,
+                 names: Optional[array] = None, entries: Optional[array] = None):
+        self.segments: List[str] = segments if segments is not None else []
+        self.parents = parents if parents is not None else array("i")  # node -> parent node (-1 = root)
+        self.names = names if names is not None else array("i")        # node -> segment id
+        self.entries = entries if entries is not None else array("i")  # listed paths, as node ids
+
+    @classmethod
+    def from_paths(cls, paths: Iterable[str]) -> "FileTree":
+        tree = cls()
+        segment_ids: Dict[str, int] = {}
+        children: Dict[int, int] = {}
+        segments, parents, names, entries = tree.segments, tree.parents, tree.names, tree.entries
+
+        for path in paths:
+            parent = -1
+            for part in path.split("/"):
+                segment_id = segment_ids.get(part)
+                if segment_id is None:
+                    segment_id = len(segments)
+                    segment_ids[part] = segment_id
+                    segments.append(sys.intern(part))
+                key = ((parent + 1) << 32) | segment_id
+                node = children.get(key)
+                if node is None:
+                    node = len(parents)
+                    children[key] = node
+                    parents.append(parent)
+                    names.append(segment_id)
+                parent = node
+            entries.append(parent)
+        return tree
+
+    @classmethod
+    def from_compact(cls, data: Dict[str, List[Any]]) -> "FileTree":
+        return cls(
+            segments=[sys.intern(s) for s in data["segments"]],
+            parents=array("i", data["parents"]),
+            names=array("i", data["names"]),
+            entries=array("i", data["entries"])
+        )
+
+    @classmethod
+    def validate(cls, value: Any) -> "FileTree":
+        """Accepts a FileTree, a list of paths, or the compact dict form."""
+        if isinstance(value, FileTree):
+            return value
+        if isinstance(value, dict):
+            return cls.from_compact(value)
+        if isinstance(value, (list, tuple)):
+            return cls.from_paths(value)
+        raise TypeError("file_tree must be a FileTree, a list of paths or a compact tree dict")
+
+    # pydantic v1
+    @classmethod
+    def __get_validators__(cls):
+        yield cls.validate
+
+    # pydantic v2: validate from lists/dicts, serialize as plain paths
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source: Any, handler: Any):
+        from pydantic_core import core_schema
+        return core_schema.no_info_plain_validator_function(
+            cls.validate,
+            serialization=core_schema.plain_serializer_function_ser_schema(lambda tree: tree.to_list())
+        )
+
+    def to_compact(self) -> Dict[str, List[Any]]:
+        return {
+            "segments": list(self.segments),
+            "parents": self.parents.tolist(),
+            "names": self.names.tolist(),
+            "entries": self.entries.tolist()
+        }
+
+    def to_list(self) -> List[str]:
+        return list(self)
+
+    def root_names(self) -> List[str]:
+        """Names of listed entries at the top level of the tree."""
+        return [self.segments[self.names[node]] for node in self.entries if self.parents[node] == -1]
+
+    def __iter__(self) -> Iterator[str]:
+        # Directory paths are built once per iteration and dropped afterwards.
+        dir_paths: Dict[int, str] = {}
+        segments, parents, names = self.segments, self.parents, self.names
+
+        def path_of(node: int) -> str:
+            parent = parents[node]
+            name = segments[names[node]]
+            if parent == -1:
+                return name
+            prefix = dir_paths.get(parent)
+            if prefix is None:
+                prefix = path_of(parent)
+                dir_paths[parent] = prefix
+            return prefix + "/" + name
+
+        for node in self.entries:
+            yield path_of(node)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, path: object) -> bool:
+        # Linear scan; prefer root_names() for repeated top-level lookups.
+        return any(p == path for p in self)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, FileTree):
+            return self.to_list() == other.to_list()
+        if isinstance(other, (list, tuple)):
+            return self.to_list() == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"FileTree({len(self)} entries, {len(self.segments)} segments)"
+
+    def __getstate__(self):
+        return (self.segments, self.parents, self.names, self.entries)
+
+    def __setstate__(self, state) -> None:
+        self.segments, self.parents, self.names, self.entries = state
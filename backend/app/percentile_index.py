@@ -0,0 +1,172 @@
+import os
+import time
+from typing import Any, Dict, List, Optional
+from app.redis_client import get_redis_connection
+
+INDEX_PREFIX = "analysis:percentile:"
+SEEN_KEY = f"{INDEX_PREFIX}seen"
+LANGUAGES_KEY = f"{INDEX_PREFIX}languages"
+# Per user: the sorted sets holding their values, so a re-analysis can leave the ones it no longer has
+USER_PREFIX = f"{INDEX_PREFIX}user:"
+COMPACTION_LOCK_KEY = f"{INDEX_PREFIX}compaction"
+
+# Report-level dimensions, ranked across users
+SCORE_DIMENSIONS = (
+    "overall_score", "profile_score", "repo_quality_score",
+    "avg_repo_docs_score", "avg_code_hygiene_score", "personal_readme_score"
+)
+# Repository dimensions, averaged per user and language and ranked among users of that language
+LANGUAGE_DIMENSIONS = ("maturity_score", "repo_documentation_score", "code_hygiene_score")
+
+def _score(detail: Any) -> Optional[float]:
+    value = detail.get("score") if isinstance(detail, dict) else detail
+    return float(value) if value is not None else None
+
+def language_averages(repositories: List[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    """Mean repository scores per language, e.g. {"Python": {"maturity_score": 61.5, ...}}."""
+    totals: Dict[str, Dict[str, List[float]]] = {}
+    for repo in repositories:
+        language = repo.get("language")
+        if not language:
+            continue
+        for dimension in LANGUAGE_DIMENSIONS:
+            value = _score(repo.get(dimension))
+            if value is not None:
+                totals.setdefault(language, {}).setdefault(dimension, []).append(value)
+    return {
+        language: {d: round(sum(v) / len(v), 2) for d, v in values.items()}
+        for language, values in totals.items()
+    }
+
+class PercentileIndex:
+    """
+    Percentile ranks of report scores among all analyzed users.
+
+    Each dimension is a Redis sorted set (member: lowercased username, score:
+    the user's latest value), and per language one set per repository dimension
+    holding each user's average for that language. Re-analyzing a user replaces
+    their entries, including removing them from languages and dimensions their
+    new report no longer has. Redis keeps sorted sets ordered, so a rank is two
+    O(log n) ZCOUNTs and nothing is rescanned when reports land.
+
+    Users not re-analyzed within `PERCENTILE_RETENTION_DAYS` are dropped by
+    `compact()`, which `record()` runs at most every `PERCENTILE_COMPACT_SECONDS`.
+    """
+    def __init__(self, connection=None):
+        self.connection = connection or get_redis_connection()
+        self.retention_seconds = float(os.getenv("PERCENTILE_RETENTION_DAYS", "180")) * 86400
+        self.compact_seconds = int(os.getenv("PERCENTILE_COMPACT_SECONDS", "3600"))
+
+    @staticmethod
+    def _key(dimension: str, language: Optional[str] = None) -> str:
+        if language:
+            return f"{INDEX_PREFIX}lang:{language.lower()}:{dimension}"
+        return f"{INDEX_PREFIX}{dimension}"
+
+    def _values(self, report: Dict[str, Any]) -> Dict[str, Any]:
+        scores = {d: _score(report.get(d)) for d in SCORE_DIMENSIONS}
+        repositories = (report.get("details") or {}).get("repositories", [])
+        return {
+            "scores": {d: v for d, v in scores.items() if v is not None},
+            "languages": language_averages(repositories)
+        }
+
+    def _all_keys(self, connection=None) -> List[str]:
+        """Every dimension's sorted set, across all languages seen so far."""
+        keys = [self._key(d) for d in SCORE_DIMENSIONS]
+        for language in (connection or self.connection).smembers(LANGUAGES_KEY):
+            language = language.decode("utf-8") if isinstance(language, bytes) else language
+            keys.extend(self._key(d, language) for d in LANGUAGE_DIMENSIONS)
+        return keys
+
+    def record(self, report: Dict[str, Any], now: Optional[float] = None) -> None:
+        """Adds (or replaces) a user's scores in every dimension's sorted set."""
+        now = now or time.time()
+        member = report["username"].lower()
+        values = self._values(report)
+        entries = {self._key(d): v for d, v in values["scores"].items()}
+        for language, averages in values["languages"].items():
+            entries.update({self._key(d, language): v for d, v in averages.items()})
+        user_key = f"{USER_PREFIX}{member}"
+
+        def replace(pipe) -> None:
+            previous = pipe.get(user_key)
+            # Users recorded before their sets were tracked may be in any of them
+            stale = previous.decode("utf-8").split() if previous is not None else self._all_keys(pipe)
+            pipe.multi()
+            for key in stale:
+                if key not in entries:
+                    pipe.zrem(key, member)
+            for key, value in entries.items():
+                pipe.zadd(key, {member: value})
+            for language in values["languages"]:
+                pipe.sadd(LANGUAGES_KEY, language.lower())
+            pipe.set(user_key, " ".join(entries))
+            pipe.zadd(SEEN_KEY, {member: now})
+
+        # Retried if the same user is recorded concurrently
+        self.connection.transaction(replace, user_key)
+
+        if self.connection.set(COMPACTION_LOCK_KEY, 1, nx=True, ex=self.compact_seconds):
+            self.compact(now)
+
+    def _rank(self, pipe, key: str, value: float) -> None:
+        pipe.zcard(key)
+        pipe.zcount(key, "-inf", f"({value}")
+        pipe.zcount(key, value, value)
+
+    @staticmethod
+    def _percentile(population: int, below: int, equal: int) -> Optional[float]:
+        # Mid-rank: ties count half, so everyone sharing the top score isn't "100th"
+        if not population:
+            return None
+        return round(100.0 * (below + 0.5 * equal) / population, 1)
+
+    def lookup(self, report: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Percentile of each of the report's scores, e.g.
+        {"population": 1200, "scores": {"overall_score": 88.0, ...},
+         "languages": {"Python": {"population": 400, "maturity_score": 61.5, ...}}}
+        """
+        values = self._values(report)
+        pipe = self.connection.pipeline(transaction=False)
+        pipe.zcard(SEEN_KEY)
+        for dimension, value in values["scores"].items():
+            self._rank(pipe, self._key(dimension), value)
+        for language, averages in values["languages"].items():
+            for dimension, value in averages.items():
+                self._rank(pipe, self._key(dimension, language), value)
+        results = iter(pipe.execute())
+
+        percentiles: Dict[str, Any] = {"population": next(results), "scores": {}, "languages": {}}
+        for dimension in values["scores"]:
+            percentiles["scores"][dimension] = self._percentile(next(results), next(results), next(results))
+        for language, averages in values["languages"].items():
+            entry: Dict[str, Any] = {}
+            for dimension in averages:
+                population = next(results)
+                entry["population"] = max(entry.get("population", 0), population)
+                entry[dimension] = self._percentile(population, next(results), next(results))
+            percentiles["languages"][language] = entry
+        return percentiles
+
+    def record_and_lookup(self, report: Dict[str, Any], include: bool = True) -> Dict[str, Any]:
+        """Records the report (unless `include` is False, e.g. for partial reports) and ranks it."""
+        if include:
+            self.record(report)
+        return self.lookup(report)
+
+    def compact(self, now: Optional[float] = None) -> int:
+        """Removes users not analyzed within the retention period from every set. Returns how many."""
+        cutoff = (now or time.time()) - self.retention_seconds
+        stale = self.connection.zrangebyscore(SEEN_KEY, "-inf", cutoff)
+        if not stale:
+            return 0
+        pipe = self.connection.pipeline(transaction=False)
+        for key in self._all_keys():
+            pipe.zrem(key, *stale)
+        pipe.zrem(SEEN_KEY, *stale)
+        pipe.delete(*(f"{USER_PREFIX}{m.decode('utf-8') if isinstance(m, bytes) else m}" for m in stale))
+        pipe.execute()
+        print(f"Percentile index: dropped {len(stale)} users not analyzed since {time.ctime(cutoff)}")
+        return len(stale)
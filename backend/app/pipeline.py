@@ -0,0 +1,116 @@
+import os
+import uuid
+import hashlib
+from typing import Dict, Optional
+from rq import Retry
+from app.redis_client import get_queue
+from app.stage_store import StageStore
+
+# Stage -> RQ queue. Workers can subscribe to any subset (see worker.py), so
+# cheap GitHub I/O workers scale independently of the few LLM workers.
+STAGE_QUEUES: Dict[str, str] = {"fetch": "github", "score": "score", "llm": "llm"}
+STAGES = ("fetch", "score", "llm")
+
+# Per-stage deadlines in seconds, checked cooperatively inside the stage. RQ's
+# job_timeout adds a grace period on top as a hard stop.
+STAGE_DEADLINES: Dict[str, int] = {
+    "fetch": int(os.getenv("FETCH_STAGE_DEADLINE", "180")),
+    "score": int(os.getenv("SCORE_STAGE_DEADLINE", "120")),
+    "llm": int(os.getenv("LLM_STAGE_DEADLINE", "420")),
+}
+DEADLINE_GRACE_SECONDS = 30
+STAGE_RETRIES: Dict[str, int] = {
+    "fetch": int(os.getenv("FETCH_STAGE_RETRIES", "2")),
+    "score": 0,
+    "llm": int(os.getenv("LLM_STAGE_RETRIES", "1")),
+}
+RETRY_INTERVALS = [5, 30]
+# Time an analysis may spend waiting for a worker, on top of running its stages
+QUEUE_ALLOWANCE_SECONDS = int(os.getenv("ANALYSIS_QUEUE_ALLOWANCE", "300"))
+
+def inflight_ttl() -> int:
+    """
+    How long an analysis may stay in flight (ANALYSIS_INFLIGHT_TTL). The default
+    covers every attempt of every stage running to its hard stop, the waits
+    between retries and the queue allowance, so in-flight pointers and client
+    slots don't expire under a slow but healthy staged analysis.
+    """
+    configured = os.getenv("ANALYSIS_INFLIGHT_TTL")
+    if configured:
+        return int(configured)
+    running = sum((STAGE_RETRIES[s] + 1) * (STAGE_DEADLINES[s] + DEADLINE_GRACE_SECONDS) for s in STAGES)
+    waiting = sum(STAGE_RETRIES[s] * max(RETRY_INTERVALS) for s in STAGES)
+    return running + waiting + QUEUE_ALLOWANCE_SECONDS
+
+def stage_job_id(analysis_id: str, stage: str) -> str:
+    """
+    RQ job id of a pipeline stage. The final (LLM) stage uses the analysis id
+    itself, so the id handed to clients tracks the finished report.
+    """
+    return analysis_id if stage == STAGES[-1] else f"{analysis_id}-{stage}"
+
+def upstream_job_ids(analysis_id: str):
+    return [stage_job_id(analysis_id, stage) for stage in STAGES[:-1]]
+
+def downstream_job_ids(analysis_id: str, stage: str):
+    return [stage_job_id(analysis_id, s) for s in STAGES[STAGES.index(stage) + 1:]]
+
+def analysis_job_ids(analysis_id: str):
+    return [stage_job_id(analysis_id, stage) for stage in STAGES]
+
+def stage_fingerprints(username: str) -> Dict[str, str]:
+    """
+    Input fingerprints of the deterministic stages. Fetching depends only on the
+    user; scoring also on the rule specs in effect. The model only affects the
+    LLM stage, so switching models reuses both checkpoints.
+    """
+    from app.services.insight_engine import DEFAULT_RULE_SETS
+    from app.services.scoring_rules import rules_fingerprint
+
+    fetch = hashlib.sha1(f"fetch:{username.lower()}".encode("utf-8")).hexdigest()
+    score = hashlib.sha1(f"score:{fetch}:{rules_fingerprint(DEFAULT_RULE_SETS)}".encode("utf-8")).hexdigest()
+    return {"fetch": fetch, "score": score}
+
+def enqueue_analysis(username: str, model_name: str = "llama3", cache_key: Optional[str] = None,
+                     result_ttl: int = 500, force_refresh: bool = False, profile: Optional[str] = None) -> str:
+    """
+    Enqueues the fetch -> score -> LLM stages as dependent jobs on their queues,
+    starting after the last stage with a checkpoint for the same inputs
+    (unless `force_refresh` is set). With a `profile` mode (see app/profiling.py)
+    every stage job runs under the profiler.
+
+    Returns:
+        str: The analysis id (the id of the final job).
+    """
+    analysis_id = str(uuid.uuid4())
+    fingerprints = stage_fingerprints(username)
+
+    resume_at = 0
+    if not force_refresh:
+        stage_store = StageStore()
+        for index in (1, 0):
+            stage = STAGES[index]
+            if stage_store.link(analysis_id, stage, fingerprints[stage]):
+                resume_at = index + 1
+                break
+
+    stage_calls = (
+        ("fetch", "app.tasks.fetch_stage", (analysis_id, username), {"fingerprint": fingerprints["fetch"]}),
+        ("score", "app.tasks.score_stage", (analysis_id,), {"fingerprint": fingerprints["score"]}),
+        ("llm", "app.tasks.llm_stage", (analysis_id, model_name), {"reused_stages": list(STAGES[:resume_at])}),
+    )
+    previous = None
+    for stage, func, args, kwargs in stage_calls[resume_at:]:
+        retries = STAGE_RETRIES[stage]
+        previous = get_queue(STAGE_QUEUES[stage]).enqueue(
+            func,
+            args=args,
+            kwargs={"cache_key": cache_key, **kwargs},
+            job_id=stage_job_id(analysis_id, stage),
+            depends_on=previous,
+            job_timeout=STAGE_DEADLINES[stage] + DEADLINE_GRACE_SECONDS,
+            result_ttl=result_ttl,
+            retry=Retry(max=retries, interval=RETRY_INTERVALS) if retries else None,
+            meta={"profile": profile} if profile else None
+        )
+    return analysis_id
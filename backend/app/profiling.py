@@ -0,0 +1,198 @@
+"""
+On-demand profiling of individual jobs.
+
+A job is profiled when it was enqueued with a `profile` mode in its meta (the
+`profile` option of POST /api/analyze/<username>) or when the worker runs with
+PROFILE_JOBS set to a mode. Modes:
+
+- "deterministic": cProfile on the job's thread. Exact call counts and times,
+  but work on the repository fetch pool threads is not seen.
+- "sampling": the stacks of all threads are sampled every
+  PROFILE_SAMPLE_INTERVAL seconds, pool threads included, at lower overhead.
+
+Both run tracemalloc and record the peak traced memory with the top allocation
+sites of the largest snapshot taken. Profiles are stored for PROFILE_TTL
+seconds and served by GET /api/jobs/<job_id>/profile. Jobs without a mode pay
+one dict lookup.
+"""
+import os
+import sys
+import json
+import time
+import zlib
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+from app.redis_client import get_redis_connection
+
+MODES = ("deterministic", "sampling")
+
+def parse_mode(value: Any) -> Optional[str]:
+    """`true`/"1" mean deterministic; anything that isn't a mode means off."""
+    if value is True or value == "1":
+        return "deterministic"
+    return value if value in MODES else None
+
+_default_mode = parse_mode(os.getenv("PROFILE_JOBS"))
+
+def requested_mode(job) -> Optional[str]:
+    if job is None:
+        return _default_mode
+    return parse_mode(job.meta.get("profile")) or _default_mode
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+class _Sampler(threading.Thread):
+    """
+    Watches traced memory and snapshots it whenever it reaches a new high, at
+    most every PROFILE_SNAPSHOT_SECONDS. With `sample_stacks` it also counts
+    the collapsed stacks of all other threads (flame graph input).
+    """
+    def __init__(self, sample_stacks: bool):
+        super().__init__(name="job-profiler", daemon=True)
+        self.sample_stacks = sample_stacks
+        self.interval = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005")) if sample_stacks else 0.1
+        self.snapshot_seconds = float(os.getenv("PROFILE_SNAPSHOT_SECONDS", "1"))
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.snapshot: Optional[tracemalloc.Snapshot] = None
+        self.snapshot_size = 0
+        self._last_snapshot = 0.0
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            if self.sample_stacks:
+                self._sample()
+            self._watch_memory()
+
+    def _sample(self) -> None:
+        for ident, frame in sys._current_frames().items():
+            if ident == self.ident:
+                continue
+            labels = []
+            while frame is not None and len(labels) < 64:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(labels))] += 1
+        self.samples += 1
+
+    def _watch_memory(self, force: bool = False) -> None:
+        current, _ = tracemalloc.get_traced_memory()
+        due = time.monotonic() - self._last_snapshot >= self.snapshot_seconds
+        if force or (current > self.snapshot_size * 1.1 and due):
+            self.snapshot, self.snapshot_size = tracemalloc.take_snapshot(), current
+            self._last_snapshot = time.monotonic()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+        if self.snapshot is None:
+            self._watch_memory(force=True)
+
+def _function_stats(profiler: cProfile.Profile, limit: int) -> List[Dict[str, Any]]:
+    stats = pstats.Stats(profiler)
+    rows = []
+    for (filename, line, name), (_, calls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            "function": f"{name} ({os.path.basename(filename)}:{line})",
+            "calls": calls,
+            "own_seconds": round(tottime, 6),
+            "cumulative_seconds": round(cumtime, 6)
+        })
+    rows.sort(key=lambda row: -row["cumulative_seconds"])
+    return rows[:limit]
+
+def _top_allocations(snapshot: Optional[tracemalloc.Snapshot], limit: int) -> List[Dict[str, Any]]:
+    if snapshot is None:
+        return []
+    snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)])
+    return [
+        {"location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+         "size_kb": round(stat.size / 1024, 1), "count": stat.count}
+        for stat in snapshot.statistics("lineno")[:limit]
+    ]
+
+class ProfileStore:
+    """Profiles of jobs, compressed JSON in Redis, expiring after PROFILE_TTL seconds."""
+    KEY_PREFIX = "analysis:profile:"
+
+    def __init__(self, ttl_seconds: Optional[int] = None):
+        self.connection = get_redis_connection()
+        self.ttl_seconds = ttl_seconds or int(os.getenv("PROFILE_TTL", str(24 * 3600)))
+
+    def save(self, job_id: str, profile: Dict[str, Any]) -> None:
+        blob = zlib.compress(json.dumps(profile, default=str).encode("utf-8"))
+        self.connection.set(f"{self.KEY_PREFIX}{job_id}", blob, ex=self.ttl_seconds)
+
+    def load_many(self, job_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """The stored profiles of the given jobs, by stage (jobs without one are left out)."""
+        blobs = self.connection.mget([f"{self.KEY_PREFIX}{job_id}" for job_id in job_ids])
+        profiles = {}
+        for blob in blobs:
+            if blob is not None:
+                profile = json.loads(zlib.decompress(blob).decode("utf-8"))
+                profiles[profile["stage"]] = profile
+        return profiles
+
+@contextmanager
+def profile_job(mode: str, stage: str, job_id: Optional[str] = None):
+    """
+    Runs the block under the profiler for `mode` and tracemalloc, then saves
+    the profile for `job_id` (also when the block raises). The yielded dict
+    holds the profile once the block has finished.
+    """
+    limit = int(os.getenv("PROFILE_TOP", "40"))
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start(int(os.getenv("PROFILE_TRACEMALLOC_FRAMES", "1")))
+    tracemalloc.reset_peak()
+    sampler = _Sampler(sample_stacks=mode == "sampling")
+    profiler = cProfile.Profile() if mode == "deterministic" else None
+    profile: Dict[str, Any] = {}
+    started = time.perf_counter()
+    sampler.start()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield profile
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        seconds = time.perf_counter() - started
+        sampler.stop()
+        final, peak = tracemalloc.get_traced_memory()
+        if started_tracing:
+            tracemalloc.stop()
+
+        profile.update({
+            "job_id": job_id,
+            "stage": stage,
+            "mode": mode,
+            "seconds": round(seconds, 4),
+            "memory": {
+                "peak_kb": round(peak / 1024, 1),
+                "final_kb": round(final / 1024, 1),
+                # Taken when traced memory was at its highest as seen by the sampler
+                "snapshot_kb": round(sampler.snapshot_size / 1024, 1),
+                "top_allocations": _top_allocations(sampler.snapshot, limit)
+            }
+        })
+        if profiler is not None:
+            profile["functions"] = _function_stats(profiler, limit)
+        else:
+            profile["samples"] = sampler.samples
+            profile["sample_interval"] = sampler.interval
+            profile["stacks"] = [{"stack": stack, "samples": count} for stack, count in sampler.stacks.most_common(limit)]
+        if job_id is not None:
+            try:
+                ProfileStore().save(job_id, profile)
+            except Exception as e:
+                print(f"Could not store profile of {job_id}: {e}")
+        print(f"Profiled {stage} job {job_id} ({mode}): {profile['seconds']}s, peak {profile['memory']['peak_kb']} KB")
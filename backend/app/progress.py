@@ -0,0 +1,80 @@
+import json
+import time
+from typing import Any, Dict, Iterator, Optional
+from app.redis_client import get_redis_connection
+
+CHANNEL_PREFIX = "analysis:progress:"
+LAST_EVENT_PREFIX = "analysis:progress:last:"
+
+def progress_channel(job_id: str) -> str:
+    return f"{CHANNEL_PREFIX}{job_id}"
+
+class ProgressPublisher:
+    """
+    Publishes analysis phase transitions for a job over Redis pub/sub.
+    The latest event is also stored so late subscribers can catch up.
+    """
+    def __init__(self, job_id: str, ttl_seconds: int = 3600):
+        self.connection = get_redis_connection()
+        self.job_id = job_id
+        self.ttl_seconds = ttl_seconds
+
+    def publish(self, phase: str, **data: Any) -> None:
+        event = json.dumps({"job_id": self.job_id, "phase": phase, "ts": time.time(), **data})
+        pipe = self.connection.pipeline()
+        pipe.publish(progress_channel(self.job_id), event)
+        pipe.set(f"{LAST_EVENT_PREFIX}{self.job_id}", event, ex=self.ttl_seconds)
+        pipe.execute()
+
+def get_last_event(job_id: str) -> Optional[str]:
+    raw = get_redis_connection().get(f"{LAST_EVENT_PREFIX}{job_id}")
+    return raw.decode("utf-8") if raw else None
+
+def format_sse(event: str, data: str) -> str:
+    lines = "".join(f"data: {line}\n" for line in data.splitlines() or [""])
+    return f"event: {event}\n{lines}\n"
+
+def iter_progress_events(job_id: str, job_store, poll_seconds: float = 1.0,
+                         heartbeat_seconds: float = 15.0, max_seconds: float = 660.0) -> Iterator[str]:
+    """
+    Yields Server-Sent Events for a job: `progress` events as the worker publishes
+    them, then exactly one `result` (or `failed`) event once the job settles.
+
+    The job status is re-checked after every message or `poll_seconds` of silence,
+    since RQ marks the job finished only after the task's last progress event.
+    """
+    pubsub = get_redis_connection().pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(progress_channel(job_id))
+    try:
+        last = get_last_event(job_id)
+        if last:
+            yield format_sse("progress", last)
+
+        started = last_sent = time.monotonic()
+        while time.monotonic() - started < max_seconds:
+            message = pubsub.get_message(timeout=poll_seconds)
+            if message and message.get("type") == "message":
+                yield format_sse("progress", message["data"].decode("utf-8"))
+                last_sent = time.monotonic()
+
+            status = job_store.get_status(job_id)
+            if status == "finished":
+                result_json = job_store.get_result_json(job_id) or b"null"
+                yield format_sse("result", result_json.decode("utf-8"))
+                return
+            if status in ("failed", "canceled", "stopped", "unknown"):
+                error_lines = (job_store.get_error(job_id) or "").strip().splitlines()
+                yield format_sse("failed", json.dumps({
+                    "job_id": job_id,
+                    "status": status,
+                    "error": error_lines[-1] if error_lines else "Analysis failed"
+                }))
+                return
+
+            if time.monotonic() - last_sent >= heartbeat_seconds:
+                yield ": keep-alive\n\n"
+                last_sent = time.monotonic()
+
+        yield format_sse("timeout", json.dumps({"job_id": job_id}))
+    finally:
+        pubsub.close()
@@ -4,7 +4,7 @@ from rq import Queue
 from redis.exceptions import ConnectionError as RedisConnectionError
 
 _connection = None
-_queue = None
+_queues = {}
 
 def get_redis_connection():
     """Lazy initialization of Redis connection"""
@@ -19,9 +19,14 @@ def get_redis_connection():
             raise RedisConnectionError(f"Failed to connect to Redis at {redis_url}: {e}")
     return _connection
 
-def get_queue():
-    """Lazy initialization of RQ Queue"""
-    global _queue
-    if _queue is None:
-        _queue = Queue(connection=get_redis_connection())
-    return _queue
+def get_queue(name: str = "default"):
+    """Lazy initialization of RQ Queues, one per name"""
+    if name not in _queues:
+        _queues[name] = Queue(name, connection=get_redis_connection())
+    return _queues[name]
+
+def reset_connection():
+    """Drops the cached connection and queues, e.g. in a freshly forked worker process."""
+    global _connection
+    _connection = None
+    _queues.clear()
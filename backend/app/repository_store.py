@@ -0,0 +1,73 @@
+import os
+import json
+import zlib
+from typing import List, Dict, Any, Optional, Iterable
+from app.redis_client import get_redis_connection
+from app.models.dtos import Repository, RAW_REPOSITORY_FIELDS, dump_model
+from app.models.file_tree import FileTree
+
+def encode_repository(repo: Repository) -> bytes:
+    data = dump_model(repo, include={"name"} | (RAW_REPOSITORY_FIELDS - {"file_tree"}))
+    data["file_tree"] = repo.file_tree.to_compact()
+    return zlib.compress(json.dumps(data).encode("utf-8"))
+
+def decode_repository(blob: bytes, fields: Optional[Iterable[str]] = None, compact_tree: bool = False) -> Dict[str, Any]:
+    """
+    Decodes a stored repository. File trees are expanded to plain paths unless
+    `compact_tree` is set, in which case the compact FileTree form is returned.
+    """
+    data = json.loads(zlib.decompress(blob).decode("utf-8"))
+    if fields:
+        wanted = set(fields) | {"name"}
+        data = {k: v for k, v in data.items() if k in wanted}
+    if "file_tree" in data and not compact_tree:
+        data["file_tree"] = FileTree.from_compact(data["file_tree"]).to_list()
+    return data
+
+class RepositoryStore:
+    """
+    Stores raw per-repository fetch data (file trees, manifests, READMEs, commits)
+    outside of job results, compressed, one Redis hash per job.
+    """
+    KEY_PREFIX = "analysis:repos:"
+
+    def __init__(self, ttl_seconds: Optional[int] = None):
+        self.connection = get_redis_connection()
+        self.ttl_seconds = ttl_seconds or int(os.getenv("RAW_DATA_TTL", str(24 * 3600)))
+
+    def _keys(self, job_id: str):
+        base = f"{self.KEY_PREFIX}{job_id}"
+        return f"{base}:data", f"{base}:index"
+
+    def save(self, job_id: str, repositories: List[Repository]) -> None:
+        data_key, index_key = self._keys(job_id)
+        pipe = self.connection.pipeline()
+        pipe.delete(data_key, index_key)
+        if repositories:
+            pipe.hset(data_key, mapping={repo.name: encode_repository(repo) for repo in repositories})
+            pipe.rpush(index_key, *[repo.name for repo in repositories])
+            pipe.expire(data_key, self.ttl_seconds)
+            pipe.expire(index_key, self.ttl_seconds)
+        pipe.execute()
+
+    def count(self, job_id: str) -> int:
+        _, index_key = self._keys(job_id)
+        return self.connection.llen(index_key)
+
+    def get_page(self, job_id: str, page: int = 1, per_page: int = 5, fields: Optional[Iterable[str]] = None, compact_tree: bool = False) -> List[Dict[str, Any]]:
+        """
+        Loads one page of raw repository data, in report order.
+
+        Args:
+            page (int): 1-based page number.
+            per_page (int): Repositories per page.
+            fields (Iterable[str]): Raw fields to include (all when omitted).
+            compact_tree (bool): Return file trees in compact FileTree form.
+        """
+        data_key, index_key = self._keys(job_id)
+        start = (page - 1) * per_page
+        names = [n.decode("utf-8") for n in self.connection.lrange(index_key, start, start + per_page - 1)]
+        if not names:
+            return []
+        blobs = self.connection.hmget(data_key, names)
+        return [decode_repository(blob, fields, compact_tree) for blob in blobs if blob is not None]
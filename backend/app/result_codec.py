@@ -0,0 +1,109 @@
+import os
+import json
+import zlib
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Optional accelerators; the stdlib json + zlib codec is always available.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MAGIC = b"GAR1"
+
+def _json_dumps(obj: Any) -> bytes:
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+def _json_loads(data: bytes) -> Any:
+    return json.loads(data.decode("utf-8"))
+
+SERIALIZERS: Dict[str, Tuple[Callable[[Any], bytes], Callable[[bytes], Any]]] = {
+    "json": (_json_dumps, _json_loads),
+}
+if orjson is not None:
+    SERIALIZERS["orjson"] = (orjson.dumps, orjson.loads)
+if msgpack is not None:
+    SERIALIZERS["msgpack"] = (
+        lambda obj: msgpack.packb(obj, use_bin_type=True),
+        lambda data: msgpack.unpackb(data, raw=False)
+    )
+
+COMPRESSORS: Dict[str, Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]] = {
+    "none": (lambda data: data, lambda data: data),
+    "zlib": (lambda data: zlib.compress(data, 6), zlib.decompress),
+}
+if zstandard is not None:
+    COMPRESSORS["zstd"] = (
+        lambda data: zstandard.ZstdCompressor(level=3).compress(data),
+        lambda data: zstandard.ZstdDecompressor().decompress(data)
+    )
+
+class ResultCodec:
+    """
+    Encodes job results as `MAGIC|serializer+compressor|payload` so any stored
+    result can be decoded regardless of which codec is currently configured.
+    """
+    def __init__(self, name: str):
+        serializer, _, compressor = name.partition("+")
+        compressor = compressor or "none"
+        if serializer not in SERIALIZERS:
+            raise ValueError(f"Unknown or unavailable serializer '{serializer}'")
+        if compressor not in COMPRESSORS:
+            raise ValueError(f"Unknown or unavailable compressor '{compressor}'")
+        self.name = f"{serializer}+{compressor}"
+        self._dumps, self._loads = SERIALIZERS[serializer]
+        self._compress, self._decompress = COMPRESSORS[compressor]
+        self._header = MAGIC + self.name.encode("ascii") + b"|"
+
+    def encode(self, obj: Any) -> bytes:
+        return self._header + self._compress(self._dumps(obj))
+
+    def decode(self, data: bytes) -> Any:
+        return self._loads(self._decompress(data[len(self._header):]))
+
+def default_codec_name() -> str:
+    if orjson is not None:
+        return "orjson+zstd" if zstandard is not None else "orjson+zlib"
+    return "json+zlib"
+
+_codecs: Dict[str, ResultCodec] = {}
+
+def get_codec(name: Optional[str] = None) -> ResultCodec:
+    """Returns the named codec (or the one set by RESULT_CODEC), cached per process."""
+    name = name or os.getenv("RESULT_CODEC") or default_codec_name()
+    if name not in _codecs:
+        _codecs[name] = ResultCodec(name)
+    return _codecs[name]
+
+def is_encoded(value: Any) -> bool:
+    return isinstance(value, (bytes, bytearray)) and value[:len(MAGIC)] == MAGIC
+
+def encode_result(obj: Any) -> bytes:
+    return get_codec().encode(obj)
+
+def decode_result(value: Any) -> Any:
+    """
+    Decodes a stored job result. Values that were not produced by a ResultCodec
+    (e.g. plain dicts from older jobs) are returned unchanged.
+    """
+    if not is_encoded(value):
+        return value
+    value = bytes(value)
+    name = value[len(MAGIC):value.index(b"|")].decode("ascii")
+    return get_codec(name).decode(value)
+
+def to_json_bytes(obj: Any) -> bytes:
+    """Serializes a decoded result to compact JSON for HTTP responses."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return _json_dumps(obj)
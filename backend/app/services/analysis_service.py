@@ -1,34 +1,212 @@
-from typing import Dict, Any
+import time
+from typing import Dict, Any, Callable, List, Optional, Tuple
+from app import tracing
 from app.core.interfaces import IGithubProvider, ILLMProvider
-from app.models.dtos import AnalysisReport, UserProfile, Suggestion
-from app.services.insight_engine import MaturityAnalyzer, TechStackAnalyzer, RepoDocumentationAnalyzer, CommitHygieneAnalyzer, ProfileReadmeAnalyzer
-from app.services.collectors import StructureCollector, DependencyCollector
+from app.models.dtos import AnalysisReport, UserProfile, Repository, Suggestion, RAW_REPOSITORY_FIELDS, trusted, dump_model
+from app.services.insight_engine import TechStackAnalyzer, ProfileReadmeAnalyzer
+from app.services.scoring_engine import ScoringEngine, build_scoring_input, apply_scores
+
+ProgressCallback = Callable[..., None]
+
+# Time kept back from a deadline for aggregation and building the report
+FINALIZE_RESERVE_SECONDS = 1.0
+
+def _close_stream(stream) -> None:
+    # Streams from `stream_user_profile` cancel their pending fetches when closed
+    close = getattr(stream, "close", None)
+    if close:
+        close()
 
 class AnalysisService:
     """
     Orchestrator service that coordinates data fetching and analysis via LLM.
     """
-    def __init__(self, github_provider: IGithubProvider, llm_provider: ILLMProvider):
+    def __init__(self, github_provider: IGithubProvider, llm_provider: ILLMProvider, pipelined: bool = True, scoring_engine: Optional[ScoringEngine] = None):
         self.github_provider = github_provider
         self.llm_provider = llm_provider
-        self.maturity_analyzer = MaturityAnalyzer()
+        self.pipelined = pipelined
         self.tech_stack_analyzer = TechStackAnalyzer()
-        self.repo_doc_analyzer = RepoDocumentationAnalyzer()
-        self.commit_hygiene_analyzer = CommitHygieneAnalyzer()
         self.profile_readme_analyzer = ProfileReadmeAnalyzer()
         
-        # Collectors
-        self.structure_collector = StructureCollector()
-        self.dependency_collector = DependencyCollector()
+        # Collectors & per-repo analyzers live in the scoring engine
+        self.scoring_engine = scoring_engine or ScoringEngine()
 
-    def analyze_user(self, username: str) -> AnalysisReport:
-        # 1. Fetch Data
-        user_profile = self.github_provider.get_user_profile(username)
-        
+    def _score_repository(self, repo: Repository) -> None:
+        """
+        Runs collectors and deterministic analyzers on a single repository, in place.
+        """
+        apply_scores(repo, self.scoring_engine.score_one(build_scoring_input(repo)))
+
+    @tracing.traced("service.score_repositories")
+    def score_repositories(self, repositories: List[Repository]) -> None:
+        """
+        Scores a batch of repositories in place, using the process pool for large batches.
+        """
+        results = self.scoring_engine.score_batch([build_scoring_input(r) for r in repositories])
+        for repo, scores in zip(repositories, results):
+            apply_scores(repo, scores)
+
+    @tracing.traced("service.fetch_profile")
+    def fetch_profile(self, username: str, progress: Optional[ProgressCallback] = None) -> UserProfile:
+        """
+        Fetches the profile and its raw repositories without scoring them.
+        Used by the staged pipeline, where scoring runs as a separate job.
+        """
+        report_progress = progress or (lambda phase, **data: None)
+        report_progress("fetching", done=0, total=None)
+        user_profile, repo_stream = self.github_provider.stream_user_profile(username)
+        total = getattr(repo_stream, "total", None)
+
+        repositories = []
+        try:
+            for repo in repo_stream:
+                repositories.append(repo)
+                report_progress("fetching", done=len(repositories), total=total)
+        finally:
+            _close_stream(repo_stream)
+
+        repositories.sort(key=lambda r: r.updated_at, reverse=True)
+        user_profile.repositories = repositories
+        return user_profile
+
+    @tracing.traced("service.fetch_and_score")
+    def _fetch_and_score(self, username: str, progress: Optional[ProgressCallback] = None,
+                         deadline: Optional[float] = None) -> Tuple[UserProfile, Dict[str, Any], Dict[str, Any]]:
+        """
+        Fetches the profile and scores every repository.
+
+        In pipelined mode each repository is scored as soon as its fetch completes,
+        overlapping CPU work with the remaining network I/O. Repositories are sorted
+        by `updated_at` afterwards so aggregation does not depend on completion order.
+        With a `deadline` the stream is cut short and only the repositories fetched
+        by then are scored; the returned coverage says how many that was.
+        """
+        report_progress = progress or (lambda phase, **data: None)
+        started = time.perf_counter()
+        report_progress("fetching", done=0, total=None)
+        fetch_deadline = deadline - FINALIZE_RESERVE_SECONDS if deadline is not None else None
+        skipped = []
+        if self.pipelined or deadline is not None:
+            if fetch_deadline is not None:
+                user_profile, repo_stream = self.github_provider.stream_user_profile(username, deadline=fetch_deadline)
+            else:
+                user_profile, repo_stream = self.github_provider.stream_user_profile(username)
+            total = getattr(repo_stream, "total", None)
+            skipped = getattr(repo_stream, "skipped", [])
+        else:
+            user_profile = self.github_provider.get_user_profile(username)
+            repo_stream = iter(list(user_profile.repositories))
+            total = len(user_profile.repositories)
+            user_profile.repositories = []
+
+        scored = []
+        scoring_seconds = 0.0
+        last_scoring_seconds = 0.0
+        if self.pipelined or deadline is not None:
+            try:
+                for repo in repo_stream:
+                    repo_started = time.perf_counter()
+                    self._score_repository(repo)
+                    last_scoring_seconds = time.perf_counter() - repo_started
+                    scoring_seconds += last_scoring_seconds
+                    scored.append(repo)
+                    report_progress("fetching", done=len(scored), total=total)
+                    if fetch_deadline is not None and time.time() >= fetch_deadline:
+                        break
+            finally:
+                _close_stream(repo_stream)
+        else:
+            scored = list(repo_stream)
+            report_progress("scoring", done=0, total=len(scored))
+            scoring_started = time.perf_counter()
+            self.score_repositories(scored)
+            scoring_seconds = time.perf_counter() - scoring_started
+
+        scored.sort(key=lambda r: r.updated_at, reverse=True)
+        user_profile.repositories = scored
+
+        # Upper bound, not a measurement: scoring before the last repository arrived
+        # could have overlapped with outstanding network I/O.
+        overlapped = scoring_seconds - last_scoring_seconds if self.pipelined else 0.0
+        timings = {
+            "mode": "pipelined" if self.pipelined else "sequential",
+            "fetch_and_score_seconds": round(time.perf_counter() - started, 4),
+            "scoring_seconds": round(scoring_seconds, 4),
+            "max_overlap_seconds": round(overlapped, 4)
+        }
+        requested = total if total is not None else len(scored)
+        coverage = {
+            "partial": len(scored) < requested or bool(skipped),
+            "repos_analyzed": len(scored),
+            "repos_requested": requested,
+            "stages_skipped": list(skipped)
+        }
+        return user_profile, timings, coverage
+
+    def analyze_user(self, username: str, repository_sink: Optional[Callable[[List[Repository]], None]] = None,
+                     progress: Optional[ProgressCallback] = None, deadline: Optional[float] = None,
+                     min_llm_seconds: float = 20.0) -> AnalysisReport:
+        """
+        Runs the full analysis for a user.
+
+        Args:
+            username (str): The GitHub username.
+            repository_sink: Optional callback receiving the scored repositories,
+                including raw fetch data that is left out of the report.
+            progress: Optional callback `progress(phase, **data)` notified on phase
+                transitions ("fetching", "scoring", "llm", "finalizing").
+            deadline (float, optional): Unix timestamp by which a report is needed.
+                Repositories not fetched by then are left out, and the LLM phase is
+                replaced by a score-based summary if less than `min_llm_seconds`
+                remain or it doesn't answer in time. `details["coverage"]` records
+                what the report is based on.
+        """
+        report_progress = progress or (lambda phase, **data: None)
+
+        # 1. Fetch Data & Run Collectors/Analyzers per repository
+        user_profile, pipeline_timings, coverage = self._fetch_and_score(username, progress, deadline)
+        if repository_sink:
+            repository_sink(user_profile.repositories)
+
+        # 2-3. Aggregate insights & prepare the LLM context
+        summary = self.summarize(user_profile, coverage)
+
+        # 4. Generate Analysis via LLM
+        llm_result = None
+        remaining = deadline - time.time() - FINALIZE_RESERVE_SECONDS if deadline is not None else None
+        if remaining is None or remaining >= min_llm_seconds:
+            report_progress("llm", model=getattr(self.llm_provider, "model", None))
+            if remaining is None:
+                llm_result = self.llm_provider.generate_analysis(summary["context"])
+            else:
+                try:
+                    llm_result = self.llm_provider.generate_analysis(summary["context"], timeout=remaining)
+                except (ConnectionError, TimeoutError) as e:
+                    print(f"LLM phase did not finish before the deadline: {e}")
+        if llm_result is None:
+            coverage["stages_skipped"].append("llm")
+            coverage["partial"] = True
+            llm_result = self.estimate_llm_result(summary)
+
+        # 5. Map to AnalysisReport
+        report_progress("finalizing")
+        return self.build_report(summary, llm_result, pipeline_timings)
+
+    @tracing.traced("service.summarize")
+    def summarize(self, user_profile: UserProfile, coverage: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Aggregates scored repositories into report sections and the LLM context.
+
+        Returns a plain, serializable dict so it can be handed between pipeline
+        stages by reference; `build_report` turns it back into a report.
+        Averages are over the repositories given; with a partial `coverage` the
+        profile README is only scored if it was fetched, and the LLM context
+        says which data is missing.
+        """
         from app.models.dtos import ScoreDetail
         from collections import Counter
 
-        # 2. Run Insights (Maturity & Tech Stack)
+        # 2. Aggregate Insights (Maturity & Tech Stack)
         repo_docs_values = []
         all_repo_docs_pros = []
         all_repo_docs_cons = []
@@ -38,40 +216,16 @@ class AnalysisService:
         all_hygiene_cons = []
         
         for repo in user_profile.repositories:
-            # Run Collectors
-            struct_flags = self.structure_collector.analyze(repo.file_tree)
-            repo.has_ci = struct_flags["has_ci"]
-            repo.has_docker = struct_flags["has_docker"]
-            repo.has_tests = struct_flags["has_tests"]
-            repo.has_license = struct_flags["has_license"]
-            
-            repo.dependencies = self.dependency_collector.analyze(repo.dependency_files)
-            
-            # Git History (Commit Hygiene)
-            hygiene_detail, cc_ratio, avg_days = self.commit_hygiene_analyzer.analyze(repo.commit_history)
-            repo.commit_frequency = avg_days
-            repo.conventional_commits_ratio = cc_ratio
-            repo.code_hygiene_score = hygiene_detail
-            repo.recommendations.extend(list(set(hygiene_detail.negatives))) # Add unique hygiene gaps
-            
+            hygiene_detail = repo.code_hygiene_score
             hygiene_values.append(hygiene_detail.score)
             all_hygiene_pros.extend(hygiene_detail.positives)
             all_hygiene_cons.extend(hygiene_detail.negatives)
             
-            # Repo Documentation
-            doc_detail = self.repo_doc_analyzer.analyze(repo)
-            repo.repo_documentation_score = doc_detail
-            
+            doc_detail = repo.repo_documentation_score
             repo_docs_values.append(doc_detail.score)
             all_repo_docs_pros.extend(doc_detail.positives)
             all_repo_docs_cons.extend(doc_detail.negatives)
             
-            # Maturity
-            maturity_detail = self.maturity_analyzer.analyze(repo)
-            repo.maturity_score = maturity_detail
-            repo.maturity_label = maturity_detail.level
-            repo.recommendations.extend(list(set(maturity_detail.negatives))) # Add unique maturity gaps
-            
         tech_stack = self.tech_stack_analyzer.analyze(user_profile.repositories)
         
         # Helper to aggregate feedback smartly
@@ -123,7 +277,8 @@ class AnalysisService:
         avg_doc_val = int(sum(repo_docs_values) / len(repo_docs_values)) if repo_docs_values else 0
         agg_doc_pros, agg_doc_cons = aggregate_feedback(all_repo_docs_pros, all_repo_docs_cons, total_repos)
         
-        avg_doc_detail = ScoreDetail(
+        avg_doc_detail = trusted(
+            ScoreDetail,
             score=avg_doc_val,
             level="Average",
             positives=agg_doc_pros,
@@ -134,56 +289,127 @@ class AnalysisService:
         avg_hyg_val = int(sum(hygiene_values) / len(hygiene_values)) if hygiene_values else 0
         agg_hyg_pros, agg_hyg_cons = aggregate_feedback(all_hygiene_pros, all_hygiene_cons, total_repos)
         
-        avg_hyg_detail = ScoreDetail(
+        avg_hyg_detail = trusted(
+            ScoreDetail,
             score=avg_hyg_val,
             level="Average",
             positives=agg_hyg_pros,
             negatives=agg_hyg_cons
         )
             
-        # Analyze Personal README
-        personal_readme_detail = self.profile_readme_analyzer.analyze(user_profile.readme_content or "")
+        # Analyze Personal README (a README missed by the deadline isn't scored as absent)
+        readme_skipped = bool(coverage) and "profile_readme" in coverage["stages_skipped"]
+        if readme_skipped:
+            personal_readme_detail = trusted(ScoreDetail, score=0, level="Not analyzed", positives=[], negatives=[])
+        else:
+            personal_readme_detail = self.profile_readme_analyzer.analyze(user_profile.readme_content or "")
 
         # 3. Prepare Context for LLM
         context = self._prepare_context(user_profile, tech_stack, avg_doc_val, personal_readme_detail.score, avg_hyg_val)
+        if coverage and coverage["partial"]:
+            context += (
+                f"\n\nNOTE: PARTIAL DATA. Only {coverage['repos_analyzed']} of {coverage['repos_requested']} "
+                "repositories were analyzed" + ("; the profile README was not fetched" if readme_skipped else "") +
+                ". Do not treat missing data as a weakness."
+            )
 
-        # 4. Generate Analysis via LLM
-        llm_result = self.llm_provider.generate_analysis(context)
+        summary = {
+            "username": user_profile.username,
+            "followers": user_profile.followers,
+            "public_repos": user_profile.public_repos,
+            "tech_stack": tech_stack,
+            "avg_repo_docs_score": dump_model(avg_doc_detail),
+            "avg_code_hygiene_score": dump_model(avg_hyg_detail),
+            "personal_readme_score": dump_model(personal_readme_detail),
+            "repositories": [dump_model(repo, exclude=RAW_REPOSITORY_FIELDS) for repo in user_profile.repositories],
+            "context": context
+        }
+        if coverage is not None:
+            summary["coverage"] = coverage
+        return summary
+
+    def estimate_llm_result(self, summary: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Score-based stand-in for the LLM response, used when there is no time left
+        for the LLM. Built only from the deterministic scores in `summary`.
+        """
+        docs = summary["avg_repo_docs_score"]
+        hygiene = summary["avg_code_hygiene_score"]
+        readme = summary["personal_readme_score"]
+        repo_quality = round((docs["score"] + hygiene["score"]) / 2)
+        parts = [docs["score"], hygiene["score"]]
+        if readme["level"] != "Not analyzed":
+            parts.append(readme["score"])
+
+        coverage = summary.get("coverage") or {}
+        analyzed = coverage.get("repos_analyzed", len(summary["repositories"]))
+        requested = coverage.get("repos_requested", analyzed)
+        suggestions = [
+            {"category": category, "severity": "medium", "message": message}
+            for category, detail in (("Documentation", docs), ("Code Hygiene", hygiene))
+            for message in detail["negatives"][:3]
+        ]
+        return {
+            "generated_by": "scores",
+            "profile_score": readme["score"],
+            "readme_score": docs["score"],
+            "repo_quality_score": repo_quality,
+            "overall_score": round(sum(parts) / len(parts)),
+            "summary": (
+                f"Quick assessment of {analyzed} of {requested} repositories, based on documentation "
+                f"and code hygiene signals only. The AI review was skipped."
+            ),
+            "career_roadmap": [],
+            "suggestions": suggestions
+        }
+
+    @tracing.traced("service.build_report")
+    def build_report(self, summary: Dict[str, Any], llm_result: Dict[str, Any], pipeline_timings: Optional[Dict[str, Any]] = None) -> AnalysisReport:
+        """
+        Combines a `summarize` result with the LLM response into the final report.
+        """
+        from app.models.dtos import ScoreDetail
 
-        # 5. Map to AnalysisReport
-        
         # Parse or wrap LLM scores into ScoreDetails (LLM returns ints usually)
         # We assume LLM returns simple ints for profile_score, repo_quality, overall.
         # We can wrap them in basic ScoreDetails for now.
         
+        estimated = llm_result.get("generated_by") == "scores"
+        level = "Estimated" if estimated else "AI Generated"
+
         profile_score_val = int(llm_result.get("profile_score", 0))
-        profile_score_detail = ScoreDetail(score=profile_score_val, level="AI Generated", positives=["Based on comprehensive analysis"], negatives=[])
+        profile_score_detail = trusted(ScoreDetail, score=profile_score_val, level=level, positives=[] if estimated else ["Based on comprehensive analysis"], negatives=[])
         
         repo_quality_val = int(llm_result.get("repo_quality_score", 0))
-        repo_quality_detail = ScoreDetail(score=repo_quality_val, level="AI Generated", positives=[], negatives=[])
+        repo_quality_detail = trusted(ScoreDetail, score=repo_quality_val, level=level, positives=[], negatives=[])
 
         overall_val = int(llm_result.get("overall_score", 0))
-        overall_detail = ScoreDetail(score=overall_val, level="AI Generated", positives=[], negatives=[])
+        overall_detail = trusted(ScoreDetail, score=overall_val, level=level, positives=[], negatives=[])
 
         details = {
-            "repo_count": len(user_profile.repositories),
-            "followers": user_profile.followers,
-            "public_repos": user_profile.public_repos,
-            "core_stack": tech_stack["core_stack"],
-            "experimentation_stack": tech_stack["experimentation"],
+            "repo_count": len(summary["repositories"]),
+            "followers": summary["followers"],
+            "public_repos": summary["public_repos"],
+            "core_stack": summary["tech_stack"]["core_stack"],
+            "experimentation_stack": summary["tech_stack"]["experimentation"],
             "career_roadmap": llm_result.get("career_roadmap", []),
-            "repositories": [repo.dict() for repo in user_profile.repositories]
+            "repositories": summary["repositories"],
+            "pipeline": pipeline_timings
         }
+        if "coverage" in summary:
+            details["coverage"] = summary["coverage"]
 
-        return AnalysisReport(
-            username=user_profile.username,
+        # Components are already validated; only LLM suggestions come from outside
+        return trusted(
+            AnalysisReport,
+            username=summary["username"],
             profile_score=profile_score_detail,
-            avg_repo_docs_score=avg_doc_detail,
-            personal_readme_score=personal_readme_detail,
-            avg_code_hygiene_score=avg_hyg_detail,
+            avg_repo_docs_score=trusted(ScoreDetail, **summary["avg_repo_docs_score"]),
+            personal_readme_score=trusted(ScoreDetail, **summary["personal_readme_score"]),
+            avg_code_hygiene_score=trusted(ScoreDetail, **summary["avg_code_hygiene_score"]),
             repo_quality_score=repo_quality_detail,
             overall_score=overall_detail,
-            summary=llm_result.get("summary", "Analysis complete."),
+            summary=str(llm_result.get("summary", "Analysis complete.")),
             suggestions=[Suggestion(**s) for s in llm_result.get("suggestions", [])],
             details=details,
             raw_llm_response=llm_result
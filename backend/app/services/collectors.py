@@ -1,13 +1,15 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable
 import json
 import re
 from datetime import datetime
+from app import tracing
 
 class StructureCollector:
     """
     Analyzes the file structure of a repository to detect key characteristics.
     """
-    def analyze(self, file_paths: List[str]) -> Dict[str, bool]:
+    @tracing.traced("collector.structure")
+    def analyze(self, file_paths: Iterable[str]) -> Dict[str, bool]:
         flags = {
             "has_ci": False,
             "has_docker": False,
@@ -15,10 +17,10 @@ class StructureCollector:
             "has_license": False
         }
         
-        # Convert all paths to lowercase for case-insensitive matching
-        normalized_files = [f.lower() for f in file_paths]
-        
-        for f in normalized_files:
+        # Lowercase paths one at a time for case-insensitive matching;
+        # file_paths may be a FileTree that expands paths lazily.
+        for path in file_paths:
+            f = path.lower()
             # Check for CI
             if ".github/workflows" in f or ".gitlab-ci.yml" in f or "circleci/" in f or ".circleci/" in f or ".travis.yml" in f:
                 flags["has_ci"] = True
@@ -44,6 +46,7 @@ class DependencyCollector:
     """
     Extracts dependency information from package manifest files.
     """
+    @tracing.traced("collector.dependencies")
     def analyze(self, dependency_files: Dict[str, str]) -> List[str]:
         dependencies = set()
         
@@ -161,6 +164,7 @@ class GitHistoryCollector:
     Analyzes commit history to extract development patterns.
     Deprecated: Use CommitHygieneAnalyzer in insight_engine.py
     """
+    @tracing.traced("collector.git_history")
     def analyze(self, history: List[Dict[str, Any]]) -> Dict[str, Any]:
         if not history:
             return {
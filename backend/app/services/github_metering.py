@@ -0,0 +1,213 @@
+import os
+import time
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from github.Requester import HTTPSRequestsConnectionClass
+from app import tracing, metrics
+
+GithubRequestListener = Callable[[Dict[str, Any]], None]
+_listeners: List[GithubRequestListener] = []
+
+def add_listener(listener: GithubRequestListener) -> None:
+    """Registers a callback that receives a dict describing every GitHub API response."""
+    if listener not in _listeners:
+        _listeners.append(listener)
+
+def _header_int(headers, name: str):
+    value = headers.get(name)
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+class MeteredHTTPSConnection(HTTPSRequestsConnectionClass):
+    """
+    PyGithub's HTTPS connection, reporting each response to the listeners.
+    PyGithub issues every request (including lazy attribute completion) through
+    this class, so nothing escapes the count.
+    """
+    def getresponse(self):
+        started = time.perf_counter()
+        response = super().getresponse()
+        headers = response.headers
+        size = _header_int(headers, "content-length")
+        if size is None and not self.stream:
+            size = len(response.response.content)
+        request = {
+            "verb": self.verb,
+            "path": self.url.split("?", 1)[0],
+            "status": response.status,
+            "bytes": size or 0,
+            "seconds": time.perf_counter() - started,
+            "rate_remaining": _header_int(headers, "x-ratelimit-remaining"),
+            "rate_used": _header_int(headers, "x-ratelimit-used"),
+            "rate_reset": _header_int(headers, "x-ratelimit-reset"),
+            "rate_resource": headers.get("x-ratelimit-resource"),
+        }
+        for listener in _listeners:
+            try:
+                listener(request)
+            except Exception as e:
+                print(f"GitHub request listener failed: {e}")
+        return response
+
+def install(client) -> bool:
+    """
+    Routes a PyGithub client's requests through MeteredHTTPSConnection. Uses
+    PyGithub's per-client connection class, so connection reuse is unaffected.
+    Returns False (and leaves the client alone) if this PyGithub version differs.
+    """
+    requester = getattr(client, "requester", None)
+    if getattr(requester, "_Requester__connectionClass", None) is not HTTPSRequestsConnectionClass:
+        print("GitHub request metering unavailable for this PyGithub version")
+        return False
+    requester._Requester__connectionClass = MeteredHTTPSConnection
+    return True
+
+def _record_metrics(request: Dict[str, Any]) -> None:
+    metrics.inc("github_requests_total", status=f"{request['status'] // 100}xx")
+    metrics.inc("github_response_bytes_total", request["bytes"])
+    if request["rate_remaining"] is not None and request["rate_resource"] in (None, "core"):
+        metrics.set_gauge("github_rate_limit_remaining", request["rate_remaining"])
+        if request["rate_reset"] is not None:
+            metrics.set_gauge("github_rate_limit_reset_timestamp", request["rate_reset"])
+
+add_listener(_record_metrics)
+
+# --- Per-job cost accounting ---
+
+_current_ledger: contextvars.ContextVar = contextvars.ContextVar("github_ledger", default=None)
+_current_repo: contextvars.ContextVar = contextvars.ContextVar("github_repo", default=None)
+
+def endpoint_pattern(path: str) -> str:
+    """Groups request paths by endpoint, e.g. /repos/a/b/git/trees/<sha> -> /repos/:owner/:repo/git/trees."""
+    parts = [p for p in path.split("/") if p]
+    if len(parts) >= 3 and parts[0] == "repos":
+        rest = parts[3:5] if parts[3:4] == ["git"] else parts[3:4]
+        return "/".join(["/repos/:owner/:repo"] + rest)
+    if len(parts) >= 2 and parts[0] in ("users", "orgs"):
+        return "/".join([f"/{parts[0]}/:{parts[0][:-1]}"] + parts[2:3])
+    return "/" + "/".join(parts[:1])
+
+class CallLedger:
+    """
+    The GitHub API usage of one job: calls, bytes and rate-limit points in total,
+    per repository (requests outside a repository count as "profile") and per
+    endpoint, plus repository cache hits. With a `budget` (calls), optional
+    fetches are skipped once it is spent; see `allows`.
+    """
+    def __init__(self, budget: Optional[int] = None):
+        self.budget = budget
+        self.calls = 0
+        self.bytes = 0
+        self.points = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.rate_remaining: Optional[int] = None
+        self.repos: Dict[str, Dict[str, int]] = {}
+        self.endpoints: Dict[str, int] = {}
+        self.skipped: List[str] = []
+        self._lock = threading.Lock()
+
+    def _repo(self, repo: Optional[str]) -> Dict[str, int]:
+        return self.repos.setdefault(repo or "profile", {"calls": 0, "bytes": 0, "cache_hit": 0})
+
+    def record(self, request: Dict[str, Any], repo: Optional[str] = None) -> None:
+        # Conditional requests answered with 304 don't count against the rate limit
+        core = request["rate_resource"] in (None, "core")
+        with self._lock:
+            self.calls += 1
+            self.bytes += request["bytes"]
+            self.points += 1 if core and request["status"] != 304 else 0
+            if core and request["rate_remaining"] is not None:
+                self.rate_remaining = request["rate_remaining"] if self.rate_remaining is None \
+                    else min(self.rate_remaining, request["rate_remaining"])
+            entry = self._repo(repo)
+            entry["calls"] += 1
+            entry["bytes"] += request["bytes"]
+            pattern = endpoint_pattern(request["path"])
+            self.endpoints[pattern] = self.endpoints.get(pattern, 0) + 1
+
+    def record_cache(self, repo: str, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.cache_hits += 1
+                self._repo(repo)["cache_hit"] = 1
+            else:
+                self.cache_misses += 1
+
+    def allows(self, part: str, repo: Optional[str] = None) -> bool:
+        """
+        Whether an optional fetch (`part`, e.g. "commits") still fits the budget.
+        Skipped parts are recorded; the calls a repository can't do without
+        (tree, README, dependency files) are never refused.
+        """
+        if self.budget is None or self.calls < self.budget:
+            return True
+        with self._lock:
+            self.skipped.append(f"{repo}:{part}" if repo else part)
+        return False
+
+    def skipped_in(self, repo: str) -> bool:
+        return any(entry.startswith(f"{repo}:") for entry in list(self.skipped))
+
+    @property
+    def degraded(self) -> bool:
+        return bool(self.skipped)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "bytes": self.bytes,
+                "rate_limit_points": self.points,
+                "rate_limit_remaining": self.rate_remaining,
+                "cache_hits": self.cache_hits,
+                "cache_misses": self.cache_misses,
+                "budget": self.budget,
+                "skipped": list(self.skipped),
+                "repositories": {name: dict(entry) for name, entry in sorted(self.repos.items())},
+                "endpoints": dict(sorted(self.endpoints.items(), key=lambda item: -item[1]))
+            }
+
+def default_budget() -> Optional[int]:
+    budget = int(os.getenv("GITHUB_CALL_BUDGET", "0"))
+    return budget if budget > 0 else None
+
+@contextmanager
+def track(budget: Optional[int] = None) -> Iterator[CallLedger]:
+    """Attributes the GitHub requests made in this context (and `bind`-ed threads) to a new ledger."""
+    ledger = CallLedger(budget)
+    token = _current_ledger.set(ledger)
+    try:
+        yield ledger
+    finally:
+        _current_ledger.reset(token)
+
+def current_ledger() -> Optional[CallLedger]:
+    return _current_ledger.get()
+
+@contextmanager
+def attribute(repo: str):
+    """Attributes the requests made in this context to a repository."""
+    token = _current_repo.set(repo)
+    try:
+        yield
+    finally:
+        _current_repo.reset(token)
+
+def bind(func: Callable) -> Callable:
+    """Like `tracing.bind`, but also carries the current ledger into pool threads."""
+    if _current_ledger.get() is None:
+        return tracing.bind(func)
+    return functools.partial(contextvars.copy_context().run, func)
+
+def _record_cost(request: Dict[str, Any]) -> None:
+    ledger = _current_ledger.get()
+    if ledger is not None:
+        ledger.record(request, _current_repo.get())
+
+add_listener(_record_cost)
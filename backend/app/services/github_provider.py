@@ -1,10 +1,15 @@
 import os
+import time
 import base64
 import concurrent.futures
-from typing import Optional, List, Dict, Any
+from contextlib import contextmanager
+from typing import Optional, List, Dict, Any, Iterator, Tuple
 from github import Github, GithubException, UnknownObjectException
-from app.core.interfaces import IGithubProvider
-from app.models.dtos import UserProfile, Repository
+from app.core.interfaces import IGithubProvider, RepositoryStream
+from app.models.dtos import UserProfile, Repository, trusted
+from app.models.file_tree import FileTree
+from app import tracing, metrics
+from app.services import github_metering
 
 class GithubProvider(IGithubProvider):
     """
@@ -12,14 +17,18 @@ class GithubProvider(IGithubProvider):
     Refactored to be a pure, high-performance data fetcher.
     """
     
-    def __init__(self, token: Optional[str] = None):
+    def __init__(self, token: Optional[str] = None, repo_cache=None):
         self.client = Github(token)
+        github_metering.install(self.client) # Counts every request, lazy attribute loads included
         self.max_workers = 10  # Optimize for I/O bound tasks
+        # Optional shared cache of fetched repositories (see RepositoryCache)
+        self.repo_cache = repo_cache
 
     def _fetch_content(self, repo, filepath: str) -> Optional[str]:
         """Helper to fetch and decode file content."""
         try:
-            content_file = repo.get_contents(filepath)
+            with tracing.span("github.get_contents", path=filepath):
+                content_file = repo.get_contents(filepath)
             if isinstance(content_file, list):
                 return None
             return base64.b64decode(content_file.content).decode('utf-8')
@@ -33,17 +42,19 @@ class GithubProvider(IGithubProvider):
         """
         # 1. Fetch File Tree (Recursive)
         # Use get_git_tree to get the full tree. This allows deep mining for StructureCollector.
-        file_tree = []
+        # Stored as an interned FileTree to avoid repeating directory prefixes.
+        file_tree = FileTree()
+        ledger = github_metering.current_ledger()
         try:
-            # Get the SHA of the default branch
-            branch = repo.get_branch(repo.default_branch)
-            tree = repo.get_git_tree(branch.commit.sha, recursive=True)
-            file_tree = [element.path for element in tree.tree]
+            # The trees endpoint resolves branch names, so no get_branch round-trip is needed
+            with tracing.span("github.get_tree"):
+                tree = repo.get_git_tree(repo.default_branch, recursive=True)
+            file_tree = FileTree.from_paths(element.path for element in tree.tree)
         except Exception:
             # Fallback to root contents if tree fetch fails (e.g., empty repo or too large)
             try:
                 contents = repo.get_contents("")
-                file_tree = [c.name for c in contents]
+                file_tree = FileTree.from_paths(c.name for c in contents)
             except Exception:
                 pass
 
@@ -54,9 +65,10 @@ class GithubProvider(IGithubProvider):
             "pom.xml", "pyproject.toml", "composer.json"
         ]
         dependency_files = {}
+        root_files = set(file_tree.root_names())
         for fname in target_files:
             # Check if the file exists in the fetched tree
-            if fname in file_tree:
+            if fname in root_files:
                 content = self._fetch_content(repo, fname)
                 if content:
                     dependency_files[fname] = content
@@ -65,15 +77,20 @@ class GithubProvider(IGithubProvider):
         readme_content = None
         try:
             # get_readme() handles finding README.md, readme.txt, etc.
-            readme = repo.get_readme()
+            with tracing.span("github.get_readme"):
+                readme = repo.get_readme()
             readme_content = base64.b64decode(readme.content).decode('utf-8')
         except Exception:
             pass
 
         # 4. Fetch Commit History (Last 15)
+        # Commits and topics are the first to go when the job's call budget is spent
         commit_history = []
         try:
-            commits = repo.get_commits()[:15]
+            if ledger is not None and not ledger.allows("commits", repo.name):
+                raise LookupError("GitHub call budget spent")
+            with tracing.span("github.get_commits"):
+                commits = list(repo.get_commits()[:15])
             for commit in commits:
                 commit_history.append({
                     "sha": commit.sha,
@@ -87,11 +104,14 @@ class GithubProvider(IGithubProvider):
         # 5. Fetch Topics
         topics = []
         try:
-            topics = repo.get_topics()
+            if ledger is None or ledger.allows("topics", repo.name):
+                with tracing.span("github.get_topics"):
+                    topics = repo.get_topics()
         except Exception:
             pass
 
-        return Repository(
+        return trusted(
+            Repository,
             name=repo.name,
             description=repo.description,
             language=repo.language,
@@ -111,59 +131,170 @@ class GithubProvider(IGithubProvider):
             commit_history=commit_history
         )
 
-    def get_user_profile(self, username: str) -> UserProfile:
+    def _fetch_repository(self, repo) -> Repository:
+        """
+        `_process_single_repo` behind the shared repository cache. Entries are keyed
+        by the last push, so unchanged repositories are never fetched twice; listing
+        fields that change without a push (stars, description) come from `repo`.
+        """
+        with tracing.span("github.repository", repo=repo.name) as span, github_metering.attribute(repo.name):
+            if self.repo_cache is None:
+                return self._process_single_repo(repo)
+            version = (repo.pushed_at or repo.updated_at).isoformat()
+            try:
+                cached = self.repo_cache.get(repo.full_name, version)
+            except Exception as e:
+                print(f"Repository cache unavailable: {e}")
+                return self._process_single_repo(repo)
+            span.set(cache_hit=cached is not None)
+            metrics.inc("cache_requests_total", cache="repository", result="hit" if cached is not None else "miss")
+            ledger = github_metering.current_ledger()
+            if ledger is not None:
+                ledger.record_cache(repo.name, cached is not None)
+            if cached is not None:
+                cached.description = repo.description
+                cached.stargazers_count = repo.stargazers_count
+                cached.forks_count = repo.forks_count
+                cached.updated_at = repo.updated_at.isoformat()
+                return cached
+
+            data = self._process_single_repo(repo)
+            if ledger is not None and ledger.skipped_in(repo.name):
+                return data # Fetched under a spent budget: don't cache the incomplete entry
+            try:
+                self.repo_cache.put(repo.full_name, version, data)
+            except Exception as e:
+                print(f"Could not cache repository {repo.full_name}: {e}")
+            return data
+
+    def get_org_members(self, org: str, limit: int = 500) -> List[str]:
+        """Logins of an organization's public members (at most `limit`)."""
+        with self._translate_errors(org, kind="organization"):
+            members = self.client.get_organization(org).get_members()
+            return [member.login for member in members[:limit]]
+
+    def rate_limit(self) -> Tuple[int, float]:
+        """Remaining core API calls and the Unix time they reset (doesn't count against the limit)."""
+        core = self.client.get_rate_limit().core
+        return core.remaining, core.reset.timestamp()
+
+    @contextmanager
+    def _translate_errors(self, username: str, kind: str = "user"):
+        """Maps PyGithub exceptions to the errors declared by IGithubProvider."""
         try:
-            user = self.client.get_user(username)
-            
-            # Fetch top 15 repositories
-            # Sort by updated to get most relevant/active
-            # Convert to list first (slicing)
-            target_repos = list(user.get_repos(type='owner', sort='updated', direction='desc')[:15])
-            
-            # Parallel Fetching
-            repositories_data = []
-            with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                future_to_repo = {executor.submit(self._process_single_repo, repo): repo for repo in target_repos}
-                for future in concurrent.futures.as_completed(future_to_repo):
+            yield
+        except UnknownObjectException:
+            raise ValueError(f"GitHub {kind} '{username}' not found.")
+        except GithubException as e:
+            raise ConnectionError(f"GitHub API error: {e.status} - {e.data.get('message', 'Unknown error')}")
+        except Exception as e:
+            raise ConnectionError(f"An unexpected error occurred: {str(e)}")
+
+    def _get_target_repos(self, user) -> list:
+        # Fetch top 15 repositories
+        # Sort by updated to get most relevant/active
+        # Convert to list first (slicing)
+        with tracing.span("github.list_repos"):
+            return list(user.get_repos(type='owner', sort='updated', direction='desc')[:15])
+
+    def _fetch_profile_readme(self, user, username: str) -> Optional[str]:
+        try:
+            with tracing.span("github.profile_readme"):
+                profile_repo = user.get_repo(username)
+                readme = profile_repo.get_readme()
+            return base64.b64decode(readme.content).decode('utf-8')
+        except UnknownObjectException:
+            return None
+        except Exception:
+            return None
+
+    def _build_user_profile(self, user, profile_readme: Optional[str], repositories: List[Repository]) -> UserProfile:
+        return trusted(
+            UserProfile,
+            username=user.login,
+            name=user.name,
+            bio=user.bio,
+            location=user.location,
+            public_repos=user.public_repos,
+            followers=user.followers,
+            following=user.following,
+            avatar_url=user.avatar_url,
+            html_url=user.html_url,
+            readme_content=profile_readme,
+            repositories=repositories
+        )
+
+    def _iter_repositories(self, target_repos: list, profile: Optional[UserProfile] = None, user=None,
+                           deadline: Optional[float] = None, skipped: Optional[List[str]] = None) -> Iterator[Repository]:
+        """
+        Fetches repositories in parallel and yields each one as soon as it completes.
+        If `profile` is given, its profile README is fetched on the same pool and
+        assigned before the iterator is exhausted.
+        At `deadline` (Unix timestamp) the iterator stops; a README that isn't in
+        yet is recorded in `skipped`.
+        """
+        remaining = lambda: None if deadline is None else max(deadline - time.time(), 0)
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers)
+        readme_future = None
+        try:
+            if profile is not None:
+                readme_future = executor.submit(github_metering.bind(self._fetch_profile_readme), user, profile.username)
+
+            # bind() carries the job's trace and call ledger into the pool threads
+            future_to_repo = {executor.submit(github_metering.bind(self._fetch_repository), repo): repo for repo in target_repos}
+            try:
+                for future in concurrent.futures.as_completed(future_to_repo, timeout=remaining()):
                     try:
                         data = future.result()
-                        if data:
-                            repositories_data.append(data)
                     except Exception as exc:
                         repo = future_to_repo[future]
                         print(f"Repo {repo.name} generated an exception: {exc}")
+                        continue
+                    if data:
+                        yield data
+            except concurrent.futures.TimeoutError:
+                pending = sum(1 for f in future_to_repo if not f.done())
+                print(f"Deadline reached with {pending} of {len(target_repos)} repositories still fetching")
+
+            if readme_future is not None:
+                try:
+                    readme_future.result(timeout=remaining())
+                except concurrent.futures.TimeoutError:
+                    pass
+        finally:
+            # Also runs when the consumer stops early (cancellation, deadline): a README
+            # that arrived in time is kept, one still in flight is reported as skipped
+            if readme_future is not None:
+                if readme_future.done() and not readme_future.cancelled():
+                    profile.readme_content = readme_future.result()
+                elif skipped is not None:
+                    skipped.append("profile_readme")
+            # Drop the fetches that haven't started
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stream_user_profile(self, username: str, deadline: Optional[float] = None) -> Tuple[UserProfile, RepositoryStream]:
+        with self._translate_errors(username):
+            with tracing.span("github.get_user"):
+                user = self.client.get_user(username)
+            target_repos = self._get_target_repos(user)
+            profile = self._build_user_profile(user, profile_readme=None, repositories=[])
+        skipped = []
+        stream = self._iter_repositories(target_repos, profile=profile, user=user, deadline=deadline, skipped=skipped)
+        return profile, RepositoryStream(stream, len(target_repos), skipped)
+
+    def get_user_profile(self, username: str) -> UserProfile:
+        with self._translate_errors(username):
+            with tracing.span("github.get_user"):
+                user = self.client.get_user(username)
+            target_repos = self._get_target_repos(user)
+
+            # Parallel Fetching
+            repositories_data = list(self._iter_repositories(target_repos))
 
             # Sort back by updated_at (parallel execution might scramble order)
             repositories_data.sort(key=lambda x: x.updated_at, reverse=True)
 
             # Fetch Profile README
-            profile_readme = None
-            try:
-                profile_repo = user.get_repo(username)
-                readme = profile_repo.get_readme()
-                profile_readme = base64.b64decode(readme.content).decode('utf-8')
-            except UnknownObjectException:
-                pass
-            except Exception:
-                pass
+            profile_readme = self._fetch_profile_readme(user, username)
 
-            return UserProfile(
-                username=user.login,
-                name=user.name,
-                bio=user.bio,
-                location=user.location,
-                public_repos=user.public_repos,
-                followers=user.followers,
-                following=user.following,
-                avatar_url=user.avatar_url,
-                html_url=user.html_url,
-                readme_content=profile_readme,
-                repositories=repositories_data
-            )
-
-        except UnknownObjectException:
-            raise ValueError(f"GitHub user '{username}' not found.")
-        except GithubException as e:
-            raise ConnectionError(f"GitHub API error: {e.status} - {e.data.get('message', 'Unknown error')}")
-        except Exception as e:
-            raise ConnectionError(f"An unexpected error occurred: {str(e)}")
+            return self._build_user_profile(user, profile_readme, repositories_data)
@@ -1,137 +1,95 @@
+import os
 import re
-from typing import List, Dict, Set, Tuple, Any
+from typing import List, Dict, Set, Tuple, Any, Optional
 from datetime import datetime, timezone
 from app.models.dtos import Repository, ScoreDetail
+from app import tracing
+from app.services.scoring_rules import CompiledRuleSet, load_rule_sets, rows_to_table
+
+# Compiled once per process; set SCORING_RULES_PATH to override weights/thresholds.
+DEFAULT_RULE_SETS = load_rule_sets(os.getenv("SCORING_RULES_PATH"))
 
 class ProfileReadmeAnalyzer:
     """
     Scores the user's personal profile README.
     """
-    def analyze(self, content: str) -> ScoreDetail:
-        score = 0
-        positives = []
-        negatives = []
-        
-        if not content:
-            return ScoreDetail(score=0, level="Missing", negatives=["No README found"])
-            
+    def __init__(self, rules: Optional[CompiledRuleSet] = None):
+        self.rules = rules or DEFAULT_RULE_SETS["profile_readme"]
+
+    def extract_features(self, content: str) -> Dict[str, Any]:
+        content = content or ""
         lower_content = content.lower()
-        
-        # 1. Personal Branding Sections (+20 each)
-        
-        # "About Me" / "Introduction"
-        if "about me" in lower_content or "introduction" in lower_content or "hi, i'm" in lower_content:
-            score += 20
-            positives.append("Includes 'About Me' / Introduction")
-        else:
-            negatives.append("Missing 'About Me' section")
-            
-        # "Tech Stack" / "Skills"
-        if "tech stack" in lower_content or "skills" in lower_content or "technologies" in lower_content or "tools" in lower_content:
-            score += 20
-            positives.append("Lists Tech Stack / Skills")
-        else:
-            negatives.append("Missing Tech Stack / Skills section")
-            
-        # "Contact" / "Socials"
-        if "contact" in lower_content or "social" in lower_content or "connect with me" in lower_content:
-            score += 20
-            positives.append("Includes Contact / Social links")
-        else:
-            negatives.append("Missing Contact / Socials section")
-            
-        # "Stats" / "Badges" (GitHub Stats images)
-        if "github-readme-stats" in lower_content or "github-profile-trophy" in lower_content or "github-trophy" in lower_content or "streak-stats" in lower_content or "metrics" in lower_content:
-            score += 20
-            positives.append("Uses GitHub Stats / Badges")
-        else:
-            negatives.append("No GitHub Stats or Badges found")
-            
-        # 2. Length Bonus (+20)
-        if len(content) > 500:
-            score += 20
-            positives.append("Detailed content (> 500 chars)")
-        else:
-            negatives.append("Content is brief (< 500 chars)")
-            
-        final_score = min(score, 100)
-        level = "Strong" if final_score >= 80 else "Adequate" if final_score >= 40 else "Weak"
-        
-        return ScoreDetail(score=final_score, level=level, positives=positives, negatives=negatives)
+        return {
+            "has_content": bool(content),
+            # "About Me" / "Introduction"
+            "has_about": "about me" in lower_content or "introduction" in lower_content or "hi, i'm" in lower_content,
+            # "Tech Stack" / "Skills"
+            "has_stack": "tech stack" in lower_content or "skills" in lower_content or "technologies" in lower_content or "tools" in lower_content,
+            # "Contact" / "Socials"
+            "has_contact": "contact" in lower_content or "social" in lower_content or "connect with me" in lower_content,
+            # "Stats" / "Badges" (GitHub Stats images)
+            "has_stats": "github-readme-stats" in lower_content or "github-profile-trophy" in lower_content or "github-trophy" in lower_content or "streak-stats" in lower_content or "metrics" in lower_content,
+            "length": len(content)
+        }
+
+    @tracing.traced("analyzer.profile_readme")
+    def analyze(self, content: str) -> ScoreDetail:
+        return self.rules.evaluate_row(self.extract_features(content))
+
+    @tracing.traced("analyzer.profile_readme")
+    def analyze_batch(self, contents: List[str]) -> List[ScoreDetail]:
+        return self.rules.evaluate(rows_to_table([self.extract_features(c) for c in contents]))
 
 class RepoDocumentationAnalyzer:
     """
     Scores the quality of a repository's documentation with multi-language support.
     """
-    def analyze(self, repo: Repository) -> ScoreDetail:
-        score = 0
-        positives = []
-        negatives = []
-        
+    # Header Checks (Multi-language: English, Portuguese, Spanish)
+    HEADER_GROUPS = {
+        "has_installation": ["installation", "instalação", "instalación", "setup", "configuração"],
+        "has_usage": ["usage", "uso", "utilização", "how to run", "como rodar", "como usar"],
+        "has_getting_started": ["getting started", "começando", "primeiros passos", "empezando"],
+        "has_api_docs": ["api", "documentation", "documentação", "documentación", "docs"],
+        "has_contributing": ["contributing", "contribuição", "contribuyendo", "contribute"]
+    }
+
+    def __init__(self, rules: Optional[CompiledRuleSet] = None):
+        self.rules = rules or DEFAULT_RULE_SETS["repo_documentation"]
+
+    def extract_features(self, repo: Repository) -> Dict[str, Any]:
         readme = repo.readme_content or ""
-        
-        if not readme:
-            return ScoreDetail(score=0, level="Missing", negatives=["No README found"])
-        
-        # Length Check
-        if len(readme) > 500:
-            score += 10
-            positives.append("Detailed README content")
-        else:
-            negatives.append("Short README content")
-            
-        # Header Checks (Multi-language: English, Portuguese, Spanish)
         lower_readme = readme.lower()
-        
-        header_groups = {
-            "Installation": ["installation", "instalação", "instalación", "setup", "configuração"],
-            "Usage": ["usage", "uso", "utilização", "how to run", "como rodar", "como usar"],
-            "Getting Started": ["getting started", "começando", "primeiros passos", "empezando"],
-            "API/Docs": ["api", "documentation", "documentação", "documentación", "docs"],
-            "Contributing": ["contributing", "contribuição", "contribuyendo", "contribute"]
+        features = {
+            "has_readme": bool(readme),
+            "length": len(readme),
+            "has_code_blocks": "```" in readme
         }
-        
-        found_sections = []
-        missing_sections = []
-        
-        for section_name, keywords in header_groups.items():
-            if any(k in lower_readme for k in keywords):
-                score += 10
-                found_sections.append(section_name)
-            else:
-                missing_sections.append(section_name)
-                
-        if found_sections:
-            positives.append(f"Contains sections: {', '.join(found_sections)}")
-        if missing_sections:
-            negatives.append(f"Missing sections: {', '.join(missing_sections)}")
-        
-        # Code Blocks Check
-        if "```" in readme:
-            score += 20
-            positives.append("Includes code blocks/examples")
-        else:
-            negatives.append("No code blocks/examples found")
-        
-        final_score = min(score, 100)
-        level = "Excellent" if final_score >= 80 else "Good" if final_score >= 50 else "Basic"
-        
-        return ScoreDetail(score=final_score, level=level, positives=positives, negatives=negatives)
+        for feature, keywords in self.HEADER_GROUPS.items():
+            features[feature] = any(k in lower_readme for k in keywords)
+        return features
+
+    @tracing.traced("analyzer.repo_docs")
+    def analyze(self, repo: Repository) -> ScoreDetail:
+        return self.rules.evaluate_row(self.extract_features(repo))
+
+    @tracing.traced("analyzer.repo_docs")
+    def analyze_batch(self, repos: List[Repository]) -> List[ScoreDetail]:
+        return self.rules.evaluate(rows_to_table([self.extract_features(r) for r in repos]))
 
 class CommitHygieneAnalyzer:
     """
     Analyzes commit history for consistency and professional standards.
     """
-    def analyze(self, history: List[Dict[str, Any]]) -> Tuple[ScoreDetail, float, float]:
-        positives = []
-        negatives = []
-        
+    CC_PATTERN = re.compile(r'^(feat|fix|docs|style|refactor|perf|test|build|ci|chore|revert)(\(.+\))?: .+')
+
+    def __init__(self, rules: Optional[CompiledRuleSet] = None):
+        self.rules = rules or DEFAULT_RULE_SETS["commit_hygiene"]
+
+    def extract_features(self, history: List[Dict[str, Any]]) -> Dict[str, Any]:
         if not history:
-            return ScoreDetail(score=0, level="Inactive", negatives=["No commit history"]), 0.0, 0.0
+            return {"has_history": False, "cc_ratio": 0.0, "avg_days": 0.0, "avg_msg_len": 0.0}
 
-        # 1. Calculate Metrics
-        cc_pattern = r'^(feat|fix|docs|style|refactor|perf|test|build|ci|chore|revert)(\(.+\))?: .+'
-        cc_count = sum(1 for c in history if re.match(cc_pattern, c.get("message", "").strip()))
+        cc_count = sum(1 for c in history if self.CC_PATTERN.match(c.get("message", "").strip()))
         cc_ratio = cc_count / len(history)
         
         dates = []
@@ -150,164 +108,76 @@ class CommitHygieneAnalyzer:
             avg_days = sum(deltas) / len(deltas) if deltas else 0.0
         
         total_len = sum(len(c.get("message", "")) for c in history)
-        avg_msg_len = total_len / len(history) if history else 0
+        avg_msg_len = total_len / len(history)
 
-        # 2. Scoring Logic
-        score = 0
-        
-        # Frequency (40pts)
-        if avg_days < 7:
-            score += 40
-            positives.append("Excellent commit frequency (Active)")
-        elif avg_days < 30:
-            score += 20
-            positives.append("Moderate commit frequency")
-        else:
-            negatives.append("Low commit frequency (> 30 days between commits)")
-            
-        # Message Length (30pts)
-        if avg_msg_len > 15:
-            score += 30
-            positives.append("Descriptive commit messages")
-        else:
-            negatives.append("Commit messages are too short/vague")
-            
-        # Convention (30pts)
-        score += int(cc_ratio * 30)
-        if cc_ratio > 0.5:
-            positives.append("Strong adherence to Conventional Commits")
-        elif cc_ratio > 0.2:
-            positives.append("Partial usage of Conventional Commits")
-        else:
-            negatives.append("Lack of Conventional Commits (feat:, fix:)")
-        
-        # 3. Classification
-        level = "Standard"
-        if score >= 80:
-            level = "Professional"
-        elif score >= 60:
-            level = "Hygiene"
-        elif score >= 40:
-            level = "Active"
-        elif avg_days > 60:
-            level = "Inactive"
-        else:
-            level = "Standard"
+        return {"has_history": True, "cc_ratio": cc_ratio, "avg_days": avg_days, "avg_msg_len": avg_msg_len}
+
+    @tracing.traced("analyzer.commit_hygiene")
+    def analyze(self, history: List[Dict[str, Any]]) -> Tuple[ScoreDetail, float, float]:
+        features = self.extract_features(history)
+        return self.rules.evaluate_row(features), features["cc_ratio"], features["avg_days"]
 
-        return ScoreDetail(score=score, level=level, positives=positives, negatives=negatives), cc_ratio, avg_days
+    @tracing.traced("analyzer.commit_hygiene")
+    def analyze_batch(self, histories: List[List[Dict[str, Any]]]) -> List[Tuple[ScoreDetail, float, float]]:
+        rows = [self.extract_features(h) for h in histories]
+        details = self.rules.evaluate(rows_to_table(rows))
+        return [(d, f["cc_ratio"], f["avg_days"]) for d, f in zip(details, rows)]
 
 class MaturityAnalyzer:
     """
     Calculates project maturity based on technical signals.
     """
-    def analyze(self, repo: Repository) -> ScoreDetail:
-        score = 0
-        positives = []
-        negatives = [] # These will act as recommendations
+    ACADEMIC_KEYWORDS = ["study", "bootcamp", "course", "challenge", "exercise", "estudo", "curso", "desafio"]
 
-        # Technical signals
-        if repo.has_ci:
-            score += 20
-            positives.append("CI/CD configured (GitHub Actions, etc.)")
-        else:
-            negatives.append("Add CI/CD pipelines (e.g., GitHub Actions)")
-            
-        if repo.has_tests:
-            score += 20
-            positives.append("Testing framework detected")
-        else:
-            negatives.append("Implement automated tests")
-            
-        if repo.has_docker:
-            score += 10
-            positives.append("Containerization (Docker) detected")
-        else:
-            negatives.append("Add Dockerfile for containerization")
-            
-        if repo.has_license:
-            score += 10
-            positives.append("License file present")
-        else:
-            negatives.append("Add a License file")
-            
-        # DevOps Synergy Bonus
-        if repo.has_ci and repo.has_tests:
-            score += 15
-            positives.append("DevOps Synergy (CI + Tests)")
-            
-        # Description heuristic
-        if repo.description:
-            score += 5
-            if len(repo.description) > 30:
-                score += 5
-                positives.append("Detailed repository description")
-            if len(repo.description) > 100:
-                score += 10
-        else:
-            negatives.append("Add a detailed repository description")
-                
-        # Conventional Commits
-        if repo.conventional_commits_ratio > 0.5:
-            score += 10
-            positives.append("Consistent commit conventions")
-        elif repo.conventional_commits_ratio > 0.2:
-            score += 5
-            
-        # Ghost Project Penalty
+    def __init__(self, rules: Optional[CompiledRuleSet] = None):
+        self.rules = rules or DEFAULT_RULE_SETS["maturity"]
+
+    def extract_features(self, repo: Repository, now: Optional[datetime] = None) -> Dict[str, Any]:
+        # Ghost Project: inactive > 1 year
         is_ghost = False
         try:
             last_update = datetime.fromisoformat(repo.updated_at.replace("Z", "+00:00"))
             if last_update.tzinfo is None:
                 last_update = last_update.replace(tzinfo=timezone.utc)
-            now = datetime.now(timezone.utc)
-            if (now - last_update).days > 365:
-                score -= 30
-                is_ghost = True
-                negatives.append("Revive or archive this project (inactive > 1 year)")
+            is_ghost = ((now or datetime.now(timezone.utc)) - last_update).days > 365
         except (ValueError, TypeError):
             pass
-        
-        score = max(0, min(score, 100))
-        
-        # Smart Classification
-        level = "Hobby"
-        
-        # 1. Academic Check
-        academic_keywords = ["study", "bootcamp", "course", "challenge", "exercise", "estudo", "curso", "desafio"]
-        # Combine description, name, and topics (if available)
+
+        # Academic Check: combine description, name, and topics (if available)
         text_source = (repo.description or "") + " " + repo.name + " " + " ".join(repo.topics or [])
-        is_academic = any(kw in text_source.lower() for kw in academic_keywords)
-        
-        # 2. Utility Check (small, useful scripts)
-        # Assuming file_tree is populated. < 3 files (e.g. script.py + README)
-        # If file_tree is just list of paths, we count them.
-        is_utility = False
-        if repo.file_tree and len(repo.file_tree) < 3 and repo.readme_content: 
-             is_utility = True
+        is_academic = any(kw in text_source.lower() for kw in self.ACADEMIC_KEYWORDS)
+
+        # Utility Check (small, useful scripts): < 3 files (e.g. script.py + README)
+        is_utility = bool(repo.file_tree and len(repo.file_tree) < 3 and repo.readme_content)
+
+        return {
+            "has_ci": repo.has_ci,
+            "has_tests": repo.has_tests,
+            "has_docker": repo.has_docker,
+            "has_license": repo.has_license,
+            "has_description": bool(repo.description),
+            "description_length": len(repo.description or ""),
+            "has_readme": bool(repo.readme_content),
+            "cc_ratio": repo.conventional_commits_ratio,
+            "is_ghost": is_ghost,
+            "is_academic": is_academic,
+            "is_utility": is_utility
+        }
+
+    @tracing.traced("analyzer.maturity")
+    def analyze(self, repo: Repository) -> ScoreDetail:
+        return self.rules.evaluate_row(self.extract_features(repo))
 
-        if is_ghost:
-            level = "Archived/Ghost"
-        elif is_academic:
-            level = "Academic"
-        elif is_utility:
-            level = "Utility"
-        elif score >= 75:
-            level = "Production-Grade"
-            # Downgrade to Prototype if missing crucial documentation
-            if not repo.description or not repo.readme_content:
-                level = "Prototype"
-                negatives.append("Downgraded to Prototype due to missing description/README")
-        elif score >= 45:
-            level = "Prototype"
-        else:
-            level = "Hobby"
-            
-        return ScoreDetail(score=score, level=level, positives=positives, negatives=negatives)
+    @tracing.traced("analyzer.maturity")
+    def analyze_batch(self, repos: List[Repository]) -> List[ScoreDetail]:
+        now = datetime.now(timezone.utc)
+        return self.rules.evaluate(rows_to_table([self.extract_features(r, now) for r in repos]))
 
 class TechStackAnalyzer:
     """
     Identifies core vs experimental technologies based on usage and project maturity.
     """
+    @tracing.traced("analyzer.tech_stack")
     def analyze(self, repos: List[Repository]) -> Dict[str, List[str]]:
         production_repos = [r for r in repos if r.maturity_label == "Production-Grade"]
         hobby_repos = [r for r in repos if r.maturity_label == "Hobby"]
@@ -1,16 +1,42 @@
+import os
 import requests
 import json
 import time
 from requests.adapters import HTTPAdapter
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 from app.core.interfaces import ILLMProvider
+from app import tracing, metrics
+
+def allowed_models() -> List[str]:
+    """Models clients may request (LLM_MODELS, comma-separated; default llama3)."""
+    return [m.strip() for m in os.getenv("LLM_MODELS", "llama3").split(",") if m.strip()]
 
 class OllamaProvider(ILLMProvider):
-    def __init__(self, base_url: str = "http://localhost:11434", model: str = "llama3"):
+    def __init__(self, base_url: str = "http://localhost:11434", model: str = "llama3", strict: bool = False):
         self.base_url = base_url
         self.model = model
+        # In strict mode an unreachable Ollama raises instead of returning a zeroed result,
+        # so callers that can retry (e.g. the LLM pipeline stage) don't keep a degraded report.
+        self.strict = strict
+        # Keep-alive connections to Ollama are reused across calls (and jobs, when the provider is cached)
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+
+    def _record_metrics(self, result: Dict[str, Any], seconds: float, prompt_chars: int) -> None:
+        """Request latency, prompt size and token throughput (Ollama reports counts and eval time in ns)."""
+        metrics.inc("llm_requests_total", model=self.model, outcome="success")
+        metrics.observe("llm_request_duration_seconds", seconds, model=self.model)
+        metrics.observe("llm_prompt_chars", prompt_chars, model=self.model)
+        prompt_tokens, response_tokens = result.get("prompt_eval_count"), result.get("eval_count")
+        if prompt_tokens:
+            metrics.inc("llm_tokens_total", prompt_tokens, model=self.model, kind="prompt")
+        if response_tokens:
+            metrics.inc("llm_tokens_total", response_tokens, model=self.model, kind="response")
+            if result.get("eval_duration"):
+                metrics.observe("llm_tokens_per_second", response_tokens / (result["eval_duration"] / 1e9), model=self.model)
 
-    def generate_analysis(self, context_data: str) -> Dict[str, Any]:
+    def generate_analysis(self, context_data: str, timeout: Optional[float] = None) -> Dict[str, Any]:
         # Define the strict schema in the system prompt to guide the model
         system_content = (
             "You are a Senior Technical Recruiter and Engineering Staff Manager at a top-tier tech company. "
@@ -63,26 +89,42 @@ class OllamaProvider(ILLMProvider):
         }
 
         max_retries = 3
+        # `timeout` bounds all attempts together (e.g. the remaining stage deadline)
+        deadline = time.monotonic() + timeout if timeout is not None else None
         for attempt in range(max_retries):
             try:
                 print(f"Sending request to Ollama Chat API ({self.model})... (Attempt {attempt + 1}/{max_retries})")
                 # Increased timeout to 120 seconds for large contexts/cold starts
-                response = requests.post(f"{self.base_url}/api/chat", json=payload, timeout=120)
-                response.raise_for_status()
-                
-                result = response.json()
-                raw_response = result['message']['content']
+                request_timeout = 120 if deadline is None else min(120, deadline - time.monotonic())
+                if request_timeout <= 0:
+                    raise requests.exceptions.ReadTimeout("LLM time budget exhausted")
+                with tracing.span("llm.request", model=self.model, attempt=attempt + 1,
+                                  prompt_chars=len(system_content) + len(user_content)) as span:
+                    request_started = time.perf_counter()
+                    response = self.session.post(f"{self.base_url}/api/chat", json=payload, timeout=request_timeout)
+                    response.raise_for_status()
+
+                    result = response.json()
+                    raw_response = result['message']['content']
+                    span.set(prompt_tokens=result.get("prompt_eval_count"), response_tokens=result.get("eval_count"),
+                             response_chars=len(raw_response))
+                self._record_metrics(result, time.perf_counter() - request_started, len(system_content) + len(user_content))
                 print(f"Raw LLM Response: {raw_response}")
                 
                 return json.loads(raw_response)
                 
             except (requests.exceptions.ConnectionError, requests.exceptions.ReadTimeout) as e:
                 print(f"Attempt {attempt + 1} failed: {str(e)}")
-                if attempt < max_retries - 1:
+                metrics.inc("llm_requests_total", model=self.model, outcome="error")
+                out_of_time = deadline is not None and deadline - time.monotonic() <= 5
+                if attempt < max_retries - 1 and not out_of_time:
                     print("Retrying in 5s...")
-                    time.sleep(5)
+                    with tracing.span("llm.retry_wait"):
+                        time.sleep(5)
                 else:
                     print("Ollama connection failed after multiple attempts. Ensure Ollama is running and model is pulled.")
+                    if self.strict:
+                        raise ConnectionError(f"Ollama unavailable after {attempt + 1} attempts: {e}")
                     return {
                         "profile_score": 0,
                         "readme_score": 0,
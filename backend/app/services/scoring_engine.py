@@ -0,0 +1,188 @@
+import os
+import multiprocessing
+import concurrent.futures
+from typing import List, Dict, Any, Optional
+from app.models.dtos import Repository, RepoScores, trusted
+from app.services.insight_engine import MaturityAnalyzer, RepoDocumentationAnalyzer, CommitHygieneAnalyzer
+from app.services.collectors import StructureCollector, DependencyCollector
+from app import tracing
+
+def build_scoring_input(repo: Repository) -> Dict[str, Any]:
+    """
+    Extracts the compact subset of a Repository needed for scoring.
+    This is what gets pickled to worker processes, so keep it minimal.
+    """
+    return {
+        "name": repo.name,
+        "description": repo.description,
+        "topics": repo.topics,
+        "updated_at": repo.updated_at,
+        "file_tree": repo.file_tree,
+        "dependency_files": repo.dependency_files,
+        "readme_content": repo.readme_content,
+        "commit_history": [
+            {"message": c.get("message", ""), "date": c.get("date")} for c in repo.commit_history
+        ]
+    }
+
+def apply_scores(repo: Repository, scores: RepoScores) -> None:
+    """Copies scoring results onto the Repository DTO, in place."""
+    repo.has_ci = scores.has_ci
+    repo.has_docker = scores.has_docker
+    repo.has_tests = scores.has_tests
+    repo.has_license = scores.has_license
+    repo.dependencies = scores.dependencies
+    repo.commit_frequency = scores.commit_frequency
+    repo.conventional_commits_ratio = scores.conventional_commits_ratio
+    repo.code_hygiene_score = scores.code_hygiene_score
+    repo.repo_documentation_score = scores.repo_documentation_score
+    repo.maturity_score = scores.maturity_score
+    repo.maturity_label = scores.maturity_score.level
+    repo.recommendations.extend(list(set(scores.code_hygiene_score.negatives))) # Add unique hygiene gaps
+    repo.recommendations.extend(list(set(scores.maturity_score.negatives))) # Add unique maturity gaps
+
+class RepositoryScorer:
+    """
+    Runs collectors and deterministic analyzers over a compact scoring input.
+    """
+    def __init__(self):
+        self.structure_collector = StructureCollector()
+        self.dependency_collector = DependencyCollector()
+        self.commit_hygiene_analyzer = CommitHygieneAnalyzer()
+        self.repo_doc_analyzer = RepoDocumentationAnalyzer()
+        self.maturity_analyzer = MaturityAnalyzer()
+
+    def score(self, data: Dict[str, Any]) -> RepoScores:
+        return self.score_many([data])[0]
+
+    def score_many(self, inputs: List[Dict[str, Any]]) -> List[RepoScores]:
+        """
+        Scores a batch of compact inputs; rule-based analyzers evaluate the whole batch column-wise.
+        """
+        # Run Collectors
+        flags = [self.structure_collector.analyze(data["file_tree"]) for data in inputs]
+        dependencies = [self.dependency_collector.analyze(data["dependency_files"]) for data in inputs]
+
+        # Git History (Commit Hygiene)
+        hygiene = self.commit_hygiene_analyzer.analyze_batch([data["commit_history"] for data in inputs])
+
+        # Analyzers operate on Repository DTOs; rebuild only the fields they read.
+        repos = [
+            trusted(
+                Repository,
+                name=data["name"],
+                description=data["description"],
+                topics=data["topics"],
+                updated_at=data["updated_at"],
+                html_url="",
+                file_tree=data["file_tree"],
+                readme_content=data["readme_content"],
+                conventional_commits_ratio=cc_ratio,
+                **repo_flags
+            )
+            for data, repo_flags, (_, cc_ratio, _) in zip(inputs, flags, hygiene)
+        ]
+
+        # Repo Documentation & Maturity
+        docs = self.repo_doc_analyzer.analyze_batch(repos)
+        maturity = self.maturity_analyzer.analyze_batch(repos)
+
+        return [
+            trusted(
+                RepoScores,
+                dependencies=repo_deps,
+                conventional_commits_ratio=cc_ratio,
+                commit_frequency=avg_days,
+                code_hygiene_score=hygiene_detail,
+                repo_documentation_score=doc_detail,
+                maturity_score=maturity_detail,
+                **repo_flags
+            )
+            for repo_flags, repo_deps, (hygiene_detail, cc_ratio, avg_days), doc_detail, maturity_detail
+            in zip(flags, dependencies, hygiene, docs, maturity)
+        ]
+
+# Per-process scorer, created by the pool initializer so workers start warm.
+_worker_scorer: Optional[RepositoryScorer] = None
+
+def _init_worker() -> None:
+    global _worker_scorer
+    _worker_scorer = RepositoryScorer()
+
+def _score_chunk(chunk: List[Dict[str, Any]]) -> List[RepoScores]:
+    global _worker_scorer
+    if _worker_scorer is None:
+        _init_worker()
+    return _worker_scorer.score_many(chunk)
+
+_shared_pool: Optional[concurrent.futures.ProcessPoolExecutor] = None
+
+def get_shared_pool(max_workers: Optional[int] = None) -> concurrent.futures.ProcessPoolExecutor:
+    """
+    Lazy initialization of the process pool shared by every ScoringEngine in this process.
+    Workers are spawned (not forked) so the pool is safe to create from threaded code,
+    and stay alive across jobs.
+    """
+    global _shared_pool
+    if _shared_pool is None:
+        workers = max_workers or int(os.getenv("SCORING_POOL_WORKERS", "0")) or os.cpu_count() or 1
+        _shared_pool = concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker
+        )
+    return _shared_pool
+
+def _ready() -> bool:
+    return _worker_scorer is not None
+
+def warm_shared_pool(max_workers: Optional[int] = None) -> None:
+    """
+    Spawns the shared pool's processes now (called at worker start), so the first
+    large batch doesn't pay for starting interpreters and importing the analyzers.
+    """
+    pool = get_shared_pool(max_workers)
+    # One task per process makes the executor start all of them; each runs the initializer
+    concurrent.futures.wait([pool.submit(_ready) for _ in range(pool._max_workers)])
+
+def shutdown_shared_pool() -> None:
+    global _shared_pool
+    if _shared_pool is not None:
+        _shared_pool.shutdown(wait=True)
+        _shared_pool = None
+
+class ScoringEngine:
+    """
+    Scores repositories either in-process or on a shared process pool.
+
+    Small batches are scored in-process, where pickling overhead would outweigh
+    any parallel speedup. Larger batches are split into chunks and fanned out to
+    the pool; only RepoScores travel back. The pool serves `score_batch` (the
+    staged score stage and sequential analyses); `score_one`, used while
+    repositories stream in, always scores in-process.
+    """
+    def __init__(self, min_batch_size: Optional[int] = None, chunk_size: Optional[int] = None, max_workers: Optional[int] = None):
+        self.min_batch_size = min_batch_size or int(os.getenv("SCORING_MIN_BATCH", "64"))
+        self.chunk_size = chunk_size or int(os.getenv("SCORING_CHUNK_SIZE", "16"))
+        self.max_workers = max_workers
+        self.scorer = RepositoryScorer()
+
+    def score_one(self, data: Dict[str, Any]) -> RepoScores:
+        return self.scorer.score(data)
+
+    def score_batch(self, inputs: List[Dict[str, Any]]) -> List[RepoScores]:
+        """
+        Scores a batch of compact inputs, preserving input order.
+        """
+        if len(inputs) < self.min_batch_size:
+            with tracing.span("scoring.batch", repos=len(inputs), pooled=False):
+                return self.scorer.score_many(inputs)
+
+        chunks = [inputs[i:i + self.chunk_size] for i in range(0, len(inputs), self.chunk_size)]
+        pool = get_shared_pool(self.max_workers)
+        results: List[RepoScores] = []
+        # Spans inside pool processes aren't recorded; the batch span covers them
+        with tracing.span("scoring.batch", repos=len(inputs), pooled=True, chunks=len(chunks)):
+            for chunk_result in pool.map(_score_chunk, chunks):
+                results.extend(chunk_result)
+        return results
@@ -0,0 +1,338 @@
+import json
+import hashlib
+import operator
+from typing import List, Dict, Any, Callable, Optional
+from app.models.dtos import ScoreDetail, trusted
+
+# A feature table is column-oriented: every feature name maps to one list holding
+# that feature's value for every row (repository / README) being scored.
+FeatureTable = Dict[str, List[Any]]
+Mask = List[bool]
+
+_OPERATORS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+def _compile_condition(spec: Any) -> Callable[[FeatureTable, int], Mask]:
+    """
+    Compiles a condition spec into a function producing a boolean column.
+
+    Supported specs:
+        "feature"                      -> truthiness of the feature
+        ["feature", ">", 30]           -> comparison (None never matches)
+        {"not": spec}
+        {"all": [spec, ...]}
+        {"any": [spec, ...]}
+    """
+    if isinstance(spec, str):
+        return lambda table, n: [bool(v) for v in table[spec]]
+
+    if isinstance(spec, list):
+        feature, op_name, value = spec
+        op = _OPERATORS[op_name]
+        return lambda table, n: [v is not None and op(v, value) for v in table[feature]]
+
+    if isinstance(spec, dict):
+        if "not" in spec:
+            inner = _compile_condition(spec["not"])
+            return lambda table, n: [not v for v in inner(table, n)]
+        if "all" in spec:
+            parts = [_compile_condition(p) for p in spec["all"]]
+            def _all(table, n):
+                mask = [True] * n
+                for part in parts:
+                    mask = [a and b for a, b in zip(mask, part(table, n))]
+                return mask
+            return _all
+        if "any" in spec:
+            parts = [_compile_condition(p) for p in spec["any"]]
+            def _any(table, n):
+                mask = [False] * n
+                for part in parts:
+                    mask = [a or b for a, b in zip(mask, part(table, n))]
+                return mask
+            return _any
+
+    raise ValueError(f"Invalid rule condition: {spec!r}")
+
+def _always(table: FeatureTable, n: int) -> Mask:
+    return [True] * n
+
+class CompiledRuleSet:
+    """
+    A rule set compiled into column-wise evaluators.
+
+    Spec format (JSON-compatible):
+        {
+          "name": "maturity", "version": 1,
+          "guards": [{"when": cond, "score": 0, "level": "Missing", "negatives": [...]}],
+          "rules": [
+            {"when": cond, "points": 20, "positive": "...", "negative": "..."},
+            {"points_from": "cc_ratio", "scale": 30},
+            {"sections": [{"when": cond, "label": "Usage", "points": 10}],
+             "positive": "Contains sections: {}", "negative": "Missing sections: {}"}
+          ],
+          "clamp": [0, 100],
+          "levels": [{"when": cond, "level": "Strong", "negative": "..."}, {"level": "Weak"}]
+        }
+
+    `positive` is emitted when a rule matches and `negative` when it does not;
+    `warning` is a negative emitted when the rule matches (e.g. penalties).
+    Guards short-circuit a row with a fixed result. Level conditions may refer to
+    the computed `score` column; the first matching level wins.
+    """
+    def __init__(self, spec: Dict[str, Any]):
+        self.spec = spec
+        self.name = spec.get("name", "unnamed")
+        self.version = spec.get("version", 1)
+        self.guards = [(_compile_condition(g["when"]), g) for g in spec.get("guards", [])]
+        self.rules = [self._compile_rule(r) for r in spec.get("rules", [])]
+        self.clamp = spec.get("clamp")
+        self.levels = [
+            (_compile_condition(l["when"]) if "when" in l else _always, l)
+            for l in spec.get("levels", [])
+        ]
+
+    def _compile_rule(self, rule: Dict[str, Any]) -> Dict[str, Any]:
+        compiled = dict(rule)
+        compiled["when"] = _compile_condition(rule["when"]) if "when" in rule else _always
+        if "sections" in rule:
+            compiled["sections"] = [
+                (_compile_condition(s["when"]), s["label"], s.get("points", 0)) for s in rule["sections"]
+            ]
+        return compiled
+
+    def evaluate(self, table: FeatureTable) -> List[ScoreDetail]:
+        """
+        Scores every row of a feature table at once.
+
+        Args:
+            table (FeatureTable): Column-oriented features, all columns of equal length.
+
+        Returns:
+            List[ScoreDetail]: One result per row, in row order.
+        """
+        n = len(next(iter(table.values()))) if table else 0
+        scores = [0] * n
+        positives: List[List[str]] = [[] for _ in range(n)]
+        negatives: List[List[str]] = [[] for _ in range(n)]
+
+        # 1. Guards
+        guarded: List[Optional[Dict[str, Any]]] = [None] * n
+        for cond, guard in self.guards:
+            for i, hit in enumerate(cond(table, n)):
+                if hit and guarded[i] is None:
+                    guarded[i] = guard
+
+        # 2. Point Rules
+        for rule in self.rules:
+            mask = rule["when"](table, n)
+
+            if "points_from" in rule:
+                column = table[rule["points_from"]]
+                scale = rule.get("scale", 1)
+                for i in range(n):
+                    if mask[i] and column[i] is not None:
+                        scores[i] += int(column[i] * scale)
+
+            if "sections" in rule:
+                found: List[List[str]] = [[] for _ in range(n)]
+                missing: List[List[str]] = [[] for _ in range(n)]
+                for cond, label, points in rule["sections"]:
+                    for i, hit in enumerate(cond(table, n)):
+                        if hit:
+                            scores[i] += points
+                            found[i].append(label)
+                        else:
+                            missing[i].append(label)
+                for i in range(n):
+                    if found[i] and "positive" in rule:
+                        positives[i].append(rule["positive"].format(", ".join(found[i])))
+                    if missing[i] and "negative" in rule:
+                        negatives[i].append(rule["negative"].format(", ".join(missing[i])))
+                continue
+
+            points = rule.get("points", 0)
+            positive = rule.get("positive")
+            negative = rule.get("negative")
+            warning = rule.get("warning")
+            for i in range(n):
+                if mask[i]:
+                    scores[i] += points
+                    if positive:
+                        positives[i].append(positive)
+                    if warning:
+                        negatives[i].append(warning)
+                elif negative:
+                    negatives[i].append(negative)
+
+        # 3. Clamp
+        if self.clamp:
+            low, high = self.clamp
+            scores = [max(low, min(s, high)) for s in scores]
+
+        # 4. Levels
+        level_table = dict(table)
+        level_table["score"] = scores
+        levels: List[Optional[str]] = [None] * n
+        for cond, level in self.levels:
+            for i, hit in enumerate(cond(level_table, n)):
+                if hit and levels[i] is None:
+                    levels[i] = level["level"]
+                    if "negative" in level:
+                        negatives[i].append(level["negative"])
+
+        results = []
+        for i in range(n):
+            guard = guarded[i]
+            if guard is not None:
+                results.append(trusted(
+                    ScoreDetail,
+                    score=guard.get("score", 0),
+                    level=guard["level"],
+                    positives=list(guard.get("positives", [])),
+                    negatives=list(guard.get("negatives", []))
+                ))
+            else:
+                results.append(trusted(ScoreDetail, score=scores[i], level=levels[i] or "", positives=positives[i], negatives=negatives[i]))
+        return results
+
+    def evaluate_row(self, features: Dict[str, Any]) -> ScoreDetail:
+        return self.evaluate({k: [v] for k, v in features.items()})[0]
+
+def rows_to_table(rows: List[Dict[str, Any]]) -> FeatureTable:
+    """Pivots a list of per-row feature dicts into a column-oriented table."""
+    if not rows:
+        return {}
+    return {key: [row[key] for row in rows] for key in rows[0]}
+
+PROFILE_README_RULES: Dict[str, Any] = {
+    "name": "profile_readme",
+    "version": 1,
+    "guards": [{"when": {"not": "has_content"}, "score": 0, "level": "Missing", "negatives": ["No README found"]}],
+    "rules": [
+        {"when": "has_about", "points": 20, "positive": "Includes 'About Me' / Introduction", "negative": "Missing 'About Me' section"},
+        {"when": "has_stack", "points": 20, "positive": "Lists Tech Stack / Skills", "negative": "Missing Tech Stack / Skills section"},
+        {"when": "has_contact", "points": 20, "positive": "Includes Contact / Social links", "negative": "Missing Contact / Socials section"},
+        {"when": "has_stats", "points": 20, "positive": "Uses GitHub Stats / Badges", "negative": "No GitHub Stats or Badges found"},
+        {"when": ["length", ">", 500], "points": 20, "positive": "Detailed content (> 500 chars)", "negative": "Content is brief (< 500 chars)"}
+    ],
+    "clamp": [0, 100],
+    "levels": [
+        {"when": ["score", ">=", 80], "level": "Strong"},
+        {"when": ["score", ">=", 40], "level": "Adequate"},
+        {"level": "Weak"}
+    ]
+}
+
+REPO_DOCUMENTATION_RULES: Dict[str, Any] = {
+    "name": "repo_documentation",
+    "version": 1,
+    "guards": [{"when": {"not": "has_readme"}, "score": 0, "level": "Missing", "negatives": ["No README found"]}],
+    "rules": [
+        {"when": ["length", ">", 500], "points": 10, "positive": "Detailed README content", "negative": "Short README content"},
+        {
+            "sections": [
+                {"when": "has_installation", "label": "Installation", "points": 10},
+                {"when": "has_usage", "label": "Usage", "points": 10},
+                {"when": "has_getting_started", "label": "Getting Started", "points": 10},
+                {"when": "has_api_docs", "label": "API/Docs", "points": 10},
+                {"when": "has_contributing", "label": "Contributing", "points": 10}
+            ],
+            "positive": "Contains sections: {}",
+            "negative": "Missing sections: {}"
+        },
+        {"when": "has_code_blocks", "points": 20, "positive": "Includes code blocks/examples", "negative": "No code blocks/examples found"}
+    ],
+    "clamp": [0, 100],
+    "levels": [
+        {"when": ["score", ">=", 80], "level": "Excellent"},
+        {"when": ["score", ">=", 50], "level": "Good"},
+        {"level": "Basic"}
+    ]
+}
+
+COMMIT_HYGIENE_RULES: Dict[str, Any] = {
+    "name": "commit_hygiene",
+    "version": 1,
+    "guards": [{"when": {"not": "has_history"}, "score": 0, "level": "Inactive", "negatives": ["No commit history"]}],
+    "rules": [
+        # Frequency (40pts)
+        {"when": ["avg_days", "<", 7], "points": 40, "positive": "Excellent commit frequency (Active)"},
+        {"when": {"all": [["avg_days", ">=", 7], ["avg_days", "<", 30]]}, "points": 20, "positive": "Moderate commit frequency"},
+        {"when": ["avg_days", "<", 30], "negative": "Low commit frequency (> 30 days between commits)"},
+        # Message Length (30pts)
+        {"when": ["avg_msg_len", ">", 15], "points": 30, "positive": "Descriptive commit messages", "negative": "Commit messages are too short/vague"},
+        # Convention (30pts)
+        {"points_from": "cc_ratio", "scale": 30},
+        {"when": ["cc_ratio", ">", 0.5], "positive": "Strong adherence to Conventional Commits"},
+        {"when": {"all": [["cc_ratio", ">", 0.2], ["cc_ratio", "<=", 0.5]]}, "positive": "Partial usage of Conventional Commits"},
+        {"when": ["cc_ratio", ">", 0.2], "negative": "Lack of Conventional Commits (feat:, fix:)"}
+    ],
+    "levels": [
+        {"when": ["score", ">=", 80], "level": "Professional"},
+        {"when": ["score", ">=", 60], "level": "Hygiene"},
+        {"when": ["score", ">=", 40], "level": "Active"},
+        {"when": ["avg_days", ">", 60], "level": "Inactive"},
+        {"level": "Standard"}
+    ]
+}
+
+MATURITY_RULES: Dict[str, Any] = {
+    "name": "maturity",
+    "version": 1,
+    "rules": [
+        # Technical signals
+        {"when": "has_ci", "points": 20, "positive": "CI/CD configured (GitHub Actions, etc.)", "negative": "Add CI/CD pipelines (e.g., GitHub Actions)"},
+        {"when": "has_tests", "points": 20, "positive": "Testing framework detected", "negative": "Implement automated tests"},
+        {"when": "has_docker", "points": 10, "positive": "Containerization (Docker) detected", "negative": "Add Dockerfile for containerization"},
+        {"when": "has_license", "points": 10, "positive": "License file present", "negative": "Add a License file"},
+        # DevOps Synergy Bonus
+        {"when": {"all": ["has_ci", "has_tests"]}, "points": 15, "positive": "DevOps Synergy (CI + Tests)"},
+        # Description heuristic
+        {"when": "has_description", "points": 5, "negative": "Add a detailed repository description"},
+        {"when": ["description_length", ">", 30], "points": 5, "positive": "Detailed repository description"},
+        {"when": ["description_length", ">", 100], "points": 10},
+        # Conventional Commits
+        {"when": ["cc_ratio", ">", 0.5], "points": 10, "positive": "Consistent commit conventions"},
+        {"when": {"all": [["cc_ratio", ">", 0.2], ["cc_ratio", "<=", 0.5]]}, "points": 5},
+        # Ghost Project Penalty
+        {"when": "is_ghost", "points": -30, "warning": "Revive or archive this project (inactive > 1 year)"}
+    ],
+    "clamp": [0, 100],
+    "levels": [
+        {"when": "is_ghost", "level": "Archived/Ghost"},
+        {"when": "is_academic", "level": "Academic"},
+        {"when": "is_utility", "level": "Utility"},
+        {"when": {"all": [["score", ">=", 75], "has_description", "has_readme"]}, "level": "Production-Grade"},
+        # Downgrade to Prototype if missing crucial documentation
+        {"when": ["score", ">=", 75], "level": "Prototype", "negative": "Downgraded to Prototype due to missing description/README"},
+        {"when": ["score", ">=", 45], "level": "Prototype"},
+        {"level": "Hobby"}
+    ]
+}
+
+DEFAULT_RULE_SPECS: Dict[str, Dict[str, Any]] = {
+    spec["name"]: spec for spec in (PROFILE_README_RULES, REPO_DOCUMENTATION_RULES, COMMIT_HYGIENE_RULES, MATURITY_RULES)
+}
+
+def load_rule_sets(path: Optional[str] = None) -> Dict[str, CompiledRuleSet]:
+    """
+    Compiles the default rule sets, overridden by any specs found in a JSON file
+    mapping rule set name to spec.
+    """
+    specs = dict(DEFAULT_RULE_SPECS)
+    if path:
+        with open(path) as f:
+            specs.update(json.load(f))
+    return {name: CompiledRuleSet(spec) for name, spec in specs.items()}
+
+def rules_fingerprint(rule_sets: Dict[str, CompiledRuleSet]) -> str:
+    """Stable hash of the rule specs in effect; changes whenever scoring would."""
+    specs = {name: rule_set.spec for name, rule_set in rule_sets.items()}
+    return hashlib.sha1(json.dumps(specs, sort_keys=True).encode("utf-8")).hexdigest()
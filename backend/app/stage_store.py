@@ -0,0 +1,105 @@
+import os
+import hashlib
+from typing import Any, Dict, Optional
+from app.redis_client import get_redis_connection
+from app.result_codec import encode_result, decode_result
+from app.models.dtos import UserProfile, Repository, dump_model
+
+def profile_to_payload(profile: UserProfile) -> Dict[str, Any]:
+    """Serializable form of a fetched profile; file trees are kept in compact form."""
+    data = dump_model(profile, exclude={"repositories"})
+    data["repositories"] = [repository_to_payload(repo) for repo in profile.repositories]
+    return data
+
+def repository_to_payload(repo: Repository) -> Dict[str, Any]:
+    data = dump_model(repo, exclude={"file_tree"})
+    data["file_tree"] = repo.file_tree.to_compact()
+    return data
+
+def profile_from_payload(data: Dict[str, Any]) -> UserProfile:
+    repositories = [Repository(**repo) for repo in data.get("repositories", [])]
+    return UserProfile(**{**data, "repositories": repositories})
+
+class StageStore:
+    """
+    Intermediate outputs of the staged analysis pipeline.
+
+    Each stage writes its output under `analysis:stage:<analysis_id>:<stage>` and
+    the next stage reads it from there, so jobs pass references rather than
+    payloads and a retried stage reuses its predecessor's output.
+
+    Outputs are also checkpointed under `analysis:checkpoint:<stage>:<fingerprint>`,
+    where the fingerprint covers the stage's inputs. A later analysis with the same
+    inputs (e.g. the same user with another model) links the checkpoint instead of
+    re-running the stage.
+    """
+    KEY_PREFIX = "analysis:stage:"
+    CHECKPOINT_PREFIX = "analysis:checkpoint:"
+
+    def __init__(self, ttl_seconds: Optional[int] = None, checkpoint_ttl_seconds: Optional[int] = None):
+        self.connection = get_redis_connection()
+        self.ttl_seconds = ttl_seconds or int(os.getenv("RAW_DATA_TTL", str(24 * 3600)))
+        # Bounds how stale reused GitHub data can be
+        self.checkpoint_ttl_seconds = checkpoint_ttl_seconds or int(os.getenv("CHECKPOINT_TTL", "3600"))
+
+    def key(self, analysis_id: str, stage: str) -> str:
+        return f"{self.KEY_PREFIX}{analysis_id}:{stage}"
+
+    def checkpoint_key(self, stage: str, fingerprint: str) -> str:
+        return f"{self.CHECKPOINT_PREFIX}{stage}:{fingerprint}"
+
+    def save(self, analysis_id: str, stage: str, payload: Any, fingerprint: Optional[str] = None) -> str:
+        key = self.key(analysis_id, stage)
+        encoded = encode_result(payload)
+        pipe = self.connection.pipeline()
+        pipe.set(key, encoded, ex=self.ttl_seconds)
+        if fingerprint:
+            pipe.set(self.checkpoint_key(stage, fingerprint), encoded, ex=self.checkpoint_ttl_seconds)
+        pipe.execute()
+        return key
+
+    def link(self, analysis_id: str, stage: str, fingerprint: str) -> bool:
+        """
+        Copies a checkpointed output to the analysis (server-side), so it survives
+        the checkpoint's expiry. Returns False if there is no checkpoint.
+        """
+        key = self.key(analysis_id, stage)
+        if not self.connection.copy(self.checkpoint_key(stage, fingerprint), key, replace=True):
+            return False
+        self.connection.expire(key, self.ttl_seconds)
+        return True
+
+    def load(self, analysis_id: str, stage: str) -> Any:
+        raw = self.connection.get(self.key(analysis_id, stage))
+        if raw is None:
+            raise LookupError(f"Output of stage '{stage}' for analysis {analysis_id} is missing or expired")
+        return decode_result(raw)
+
+    def delete(self, analysis_id: str, *stages: str) -> None:
+        if stages:
+            self.connection.delete(*[self.key(analysis_id, stage) for stage in stages])
+
+class RepositoryCache:
+    """
+    Raw fetch data of single repositories, shared by all analyses.
+
+    Entries are keyed by the repository and its last push, so any analysis (or
+    batch member) that lists an unchanged repository reuses the fetched tree,
+    manifests, README and commits instead of spending GitHub API calls on them.
+    """
+    KEY_PREFIX = "analysis:repo:"
+
+    def __init__(self, ttl_seconds: Optional[int] = None):
+        self.connection = get_redis_connection()
+        self.ttl_seconds = ttl_seconds or int(os.getenv("REPO_CACHE_TTL", str(24 * 3600)))
+
+    def key(self, full_name: str, version: str) -> str:
+        digest = hashlib.sha1(f"{full_name.lower()}@{version}".encode("utf-8")).hexdigest()
+        return f"{self.KEY_PREFIX}{digest}"
+
+    def get(self, full_name: str, version: str) -> Optional[Repository]:
+        raw = self.connection.get(self.key(full_name, version))
+        return Repository(**decode_result(raw)) if raw else None
+
+    def put(self, full_name: str, version: str, repo: Repository) -> None:
+        self.connection.set(self.key(full_name, version), encode_result(repository_to_payload(repo)), ex=self.ttl_seconds)
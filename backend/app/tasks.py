@@ -1,25 +1,331 @@
 import os
+import time
+import functools
+from typing import Any, Dict, Iterable, Optional, Tuple
+from rq import get_current_job
+from rq.job import cancel_job
+from rq.scheduler import RQScheduler
+from app.redis_client import get_redis_connection
+from app.repository_store import RepositoryStore
+from app.stage_store import StageStore, RepositoryCache, profile_to_payload, profile_from_payload
+from app.pipeline import downstream_job_ids, upstream_job_ids, STAGE_DEADLINES
+from app.cancellation import AnalysisCancelled, StageGuard
+from app.batch import BatchCoordinator, notify_batches
+from app.history_store import get_history_writer
+from app.percentile_index import PercentileIndex
+from app.admission import record_stage_duration
+from app.result_codec import encode_result
+from app.analysis_cache import AnalysisCoalescer
+from app.progress import ProgressPublisher
+from app import tracing, metrics, profiling
+from app.models.dtos import dump_model
 from app.services.analysis_service import AnalysisService
 from app.services.github_provider import GithubProvider
-from app.services.llm_provider import OllamaProvider
+from app.services import github_metering
+from app.services.llm_provider import OllamaProvider, allowed_models
+from app.services.scoring_engine import warm_shared_pool
 
-def run_analysis_task(username: str, model_name: str = "llama3"):
+# Providers are cached per process: a long-lived worker reuses its API clients
+# (and their pooled HTTP connections) across jobs instead of rebuilding them.
+_providers: Dict[Tuple, Any] = {}
+
+def get_github_provider() -> GithubProvider:
+    token = os.getenv("GITHUB_TOKEN")
+    key = ("github", token)
+    if key not in _providers:
+        repo_cache = RepositoryCache() if os.getenv("REPO_CACHE", "1") != "0" else None
+        _providers[key] = GithubProvider(token=token, repo_cache=repo_cache)
+    return _providers[key]
+
+def get_llm_provider(model_name: str = "llama3", strict: bool = False) -> OllamaProvider:
+    # Only configured models are cached, so odd model names (e.g. in jobs enqueued
+    # before LLM_MODELS changed) can't grow the cache and its HTTP sessions
+    if model_name not in allowed_models():
+        return OllamaProvider(model=model_name, strict=strict)
+    key = ("ollama", model_name, strict)
+    if key not in _providers:
+        _providers[key] = OllamaProvider(model=model_name, strict=strict)
+    return _providers[key]
+
+def github_budget() -> Tuple[int, float]:
+    """Remaining GitHub API calls and their reset time, as seen by this process's client."""
+    return get_github_provider().rate_limit()
+
+def _notify_batches(job_id: str, report: Optional[Dict[str, Any]] = None, error: Optional[Exception] = None) -> None:
+    # Batch bookkeeping must never fail the analysis itself
+    try:
+        notify_batches(job_id, report=report, error=str(error) if error else None,
+                       coordinator=BatchCoordinator(github_budget=github_budget))
+    except Exception as e:
+        print(f"Could not update batches of {job_id}: {e}")
+
+def _attach_percentiles(report_data: Dict[str, Any]) -> None:
+    # Partial (deadline or call budget) reports are ranked but not added, so they can't skew the index
+    try:
+        details = report_data["details"]
+        degraded = (details.get("coverage") or {}).get("partial") or (details.get("github_cost") or {}).get("skipped")
+        details["percentiles"] = PercentileIndex().record_and_lookup(report_data, include=not degraded)
+    except Exception as e:
+        print(f"Could not rank {report_data.get('username')}: {e}")
+
+def _record_history(analysis_id: str, model_name: str, report: Dict[str, Any]) -> None:
+    # Queued for the background writer; history is best-effort like batch bookkeeping
+    try:
+        writer = get_history_writer()
+        if writer is not None:
+            writer.submit(analysis_id, model_name, report)
+    except Exception as e:
+        print(f"Could not record history for {analysis_id}: {e}")
+
+def _instrumented_job(stage: str):
     """
-    Background task to run the analysis.
+    Runs the job under a trace whose per-span breakdown is saved to the job's
+    meta (TRACING=1), under the profiler if the job asks for it (see
+    app/profiling.py), and flushes this process's metrics when it ends.
     """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            job = get_current_job()
+            profile_mode = profiling.requested_mode(job)
+            try:
+                with tracing.start_trace(stage, job.id if job else None):
+                    if profile_mode is None:
+                        return func(*args, **kwargs)
+                    with profiling.profile_job(profile_mode, stage, job.id if job else None):
+                        return func(*args, **kwargs)
+            finally:
+                metrics.flush()
+        return wrapper
+    return decorator
+
+def _stage_succeeded(stage: str, seconds: float) -> None:
+    record_stage_duration(stage, seconds)
+    metrics.inc("analysis_jobs_total", stage=stage, outcome="success")
+    metrics.observe("analysis_stage_duration_seconds", seconds, stage=stage)
+
+def warm_up(models: Iterable[str] = ("llama3",), queues: Iterable[str] = ()) -> None:
+    """
+    Builds this process's providers ahead of the first job. Workers on the
+    `score` queue also start the scoring process pool (SCORING_POOL_PRELOAD=0 skips it).
+    """
+    get_github_provider()
+    for model_name in models:
+        get_llm_provider(model_name)
+    if "score" in queues and os.getenv("SCORING_POOL_PRELOAD", "1") != "0":
+        warm_shared_pool()
+
+@_instrumented_job("analysis")
+def run_analysis_task(username: str, model_name: str = "llama3", cache_key: Optional[str] = None,
+                      deadline: Optional[float] = None):
+    """
+    Background task to run the whole analysis in a single job.
+    `cache_key` identifies the request for single-flight deduplication and caching.
+    The API enqueues the staged pipeline below unless ANALYSIS_STAGED=0, and
+    always uses this task for requests with a `deadline` (Unix timestamp).
+    """
+    job = get_current_job()
+    started = time.perf_counter()
+    # The single job is bounded by the sum of the stage deadlines
+    guard = StageGuard(job.id if job else None, "analysis", sum(STAGE_DEADLINES.values()))
     try:
-        # Dependency Injection
-        token = os.getenv("GITHUB_TOKEN")
-        github_provider = GithubProvider(token=token)
-        llm_provider = OllamaProvider(model=model_name)
-        service = AnalysisService(github_provider, llm_provider)
+        # Dependency Injection (providers are reused across jobs in this process)
+        github_provider = get_github_provider()
+        # Under a deadline an unreachable LLM raises so the service can substitute a score-based summary
+        llm_provider = get_llm_provider(model_name, strict=deadline is not None)
+        pipelined = os.getenv("ANALYSIS_PIPELINED", "1") != "0"
+        service = AnalysisService(github_provider, llm_provider, pipelined=pipelined)
         
         # Run analysis
-        report = service.analyze_user(username)
+        # Raw per-repo data is stored separately so the job result stays small
+        sink = None
+        progress = None
+        if job is not None:
+            repository_store = RepositoryStore()
+            sink = lambda repos: repository_store.save(job.id, repos)
+            progress = ProgressPublisher(job.id).publish
+        # Checked between repository fetches and before the LLM call
+        with github_metering.track(github_metering.default_budget()) as ledger:
+            report = service.analyze_user(username, repository_sink=sink, progress=guard.wrap(progress), deadline=deadline,
+                                          min_llm_seconds=float(os.getenv("ANALYSIS_MIN_LLM_SECONDS", "20")))
+        report.details["github_cost"] = ledger.to_dict()
+        if job is not None:
+            report.details["raw_repositories_url"] = f"/api/jobs/{job.id}/repositories"
+        if tracing.include_in_report():
+            report.details["trace"] = {"analysis": tracing.current_trace().breakdown()}
         
-        # Return dict for pickling
-        return report.dict()
+        # Return compact encoded bytes; RQ pickles them as-is
+        report_data = dump_model(report)
+        _attach_percentiles(report_data)
+        result = encode_result(report_data)
+        if cache_key and job is not None:
+            AnalysisCoalescer().mark_finished(cache_key, job.id)
+        if progress:
+            progress("completed")
+        if job is not None:
+            _stage_succeeded("analysis", time.perf_counter() - started)
+            _notify_batches(job.id, report=report_data)
+            _record_history(job.id, model_name, report_data)
+        return result
     except Exception as e:
         # RQ will catch this and mark job as failed, but we can log it
         print(f"Task failed for user {username}: {e}")
+        metrics.inc("analysis_jobs_total", stage="analysis", outcome="canceled" if isinstance(e, AnalysisCancelled) else "failure")
+        if cache_key:
+            AnalysisCoalescer().mark_failed(cache_key)
+        if job is not None:
+            _notify_batches(job.id, error=e)
+        raise e
+
+
+# --- Staged pipeline (see app/pipeline.py) ---
+
+def _retry_can_run(job) -> bool:
+    """Retries wait out an interval in the scheduled registry, so they only run while a scheduler serves the queue."""
+    if job is None or not job.retries_left:
+        return False
+    return bool(job.connection.exists(RQScheduler.get_locking_key(job.origin)))
+
+def _build_service(model_name: str = "llama3", strict_llm: bool = False) -> AnalysisService:
+    return AnalysisService(get_github_provider(), get_llm_provider(model_name, strict=strict_llm))
+
+def _stage_failed(analysis_id: str, stage: str, cache_key: Optional[str], error: Exception) -> None:
+    """
+    Handles a stage failure. While RQ still has retries left the downstream jobs
+    keep waiting; once they are exhausted, downstream stages are cancelled so
+    they don't sit in the deferred registry forever.
+    """
+    print(f"Stage '{stage}' failed for analysis {analysis_id}: {error}")
+    job = get_current_job()
+    if job is not None and isinstance(error, AnalysisCancelled):
+        job.retries_left = 0 # Never retry a cancelled analysis
+    outcome = "canceled" if isinstance(error, AnalysisCancelled) else "retry" if job is not None and job.retries_left else "failure"
+    metrics.inc("analysis_jobs_total", stage=stage, outcome=outcome)
+    if outcome == "retry":
+        return
+    for job_id in downstream_job_ids(analysis_id, stage):
+        try:
+            cancel_job(job_id, connection=get_redis_connection())
+        except Exception as e:
+            print(f"Could not cancel {job_id}: {e}")
+    if cache_key:
+        AnalysisCoalescer().mark_failed(cache_key)
+    _notify_batches(analysis_id, error=error)
+
+@_instrumented_job("fetch")
+def fetch_stage(analysis_id: str, username: str, fingerprint: Optional[str] = None, cache_key: Optional[str] = None) -> str:
+    """
+    Stage 1 (queue `github`): fetches the profile and raw repositories.
+    Returns the key of the stored output.
+    """
+    try:
+        guard = StageGuard(analysis_id, "fetch", STAGE_DEADLINES["fetch"])
+        guard.check()
+        progress = guard.wrap(ProgressPublisher(analysis_id).publish)
+        started = time.perf_counter()
+        with github_metering.track(github_metering.default_budget()) as ledger:
+            user_profile = _build_service().fetch_profile(username, progress=progress)
+        payload = profile_to_payload(user_profile)
+        payload["fetch_seconds"] = round(time.perf_counter() - started, 4)
+        payload["github_cost"] = ledger.to_dict()
+        # A fetch cut short by the call budget is not offered to later analyses as a checkpoint
+        ref = StageStore().save(analysis_id, "fetch", payload, None if ledger.degraded else fingerprint)
+        _stage_succeeded("fetch", time.perf_counter() - started)
+        return ref
+    except Exception as e:
+        _stage_failed(analysis_id, "fetch", cache_key, e)
+        raise e
+
+@_instrumented_job("score")
+def score_stage(analysis_id: str, fingerprint: Optional[str] = None, cache_key: Optional[str] = None) -> str:
+    """
+    Stage 2 (queue `score`): scores the fetched repositories, stores their raw
+    data for the repositories endpoint and prepares the LLM input.
+    """
+    try:
+        stage_started = time.perf_counter()
+        guard = StageGuard(analysis_id, "score", STAGE_DEADLINES["score"])
+        guard.check()
+        stage_store = StageStore()
+        fetched = stage_store.load(analysis_id, "fetch")
+        fetch_seconds = fetched.pop("fetch_seconds", None)
+        github_cost = fetched.pop("github_cost", None)
+        user_profile = profile_from_payload(fetched)
+        ProgressPublisher(analysis_id).publish("scoring", done=0, total=len(user_profile.repositories))
+
+        started = time.perf_counter()
+        service = _build_service()
+        service.score_repositories(user_profile.repositories)
+        scoring_seconds = time.perf_counter() - started
+        guard.check()
+
+        RepositoryStore().save(analysis_id, user_profile.repositories)
+        summary = service.summarize(user_profile)
+        # Analyses resuming from this checkpoint serve raw data from this analysis
+        summary["raw_repositories_id"] = analysis_id
+        summary["github_cost"] = github_cost
+        summary["pipeline"] = {
+            "mode": "staged",
+            "fetch_seconds": fetch_seconds,
+            "scoring_seconds": round(scoring_seconds, 4)
+        }
+        ref = stage_store.save(analysis_id, "score", summary, fingerprint)
+        _stage_succeeded("score", time.perf_counter() - stage_started)
+        return ref
+    except Exception as e:
+        _stage_failed(analysis_id, "score", cache_key, e)
+        raise e
+
+@_instrumented_job("llm")
+def llm_stage(analysis_id: str, model_name: str = "llama3", reused_stages: Optional[list] = None,
+              cache_key: Optional[str] = None):
+    """
+    Stage 3 (queue `llm`): generates the LLM analysis and returns the encoded report.
+    While an RQ retry remains and a scheduler is there to run it, an unreachable
+    LLM fails the job so the retry runs from the score checkpoint; otherwise it
+    falls back to a degraded report.
+    """
+    try:
+        stage_started = time.perf_counter()
+        guard = StageGuard(analysis_id, "llm", STAGE_DEADLINES["llm"])
+        summary = StageStore().load(analysis_id, "score")
+        job = get_current_job()
+        service = _build_service(model_name, strict_llm=_retry_can_run(job))
+        progress = guard.wrap(ProgressPublisher(analysis_id).publish)
+
+        progress("llm", model=model_name) # Checks for cancellation before the LLM call
+        started = time.perf_counter()
+        llm_result = service.llm_provider.generate_analysis(summary["context"], timeout=guard.remaining())
+        pipeline_timings = dict(
+            summary.pop("pipeline", {}),
+            llm_seconds=round(time.perf_counter() - started, 4),
+            reused_stages=reused_stages or []
+        )
+        raw_repositories_id = summary.pop("raw_repositories_id", analysis_id)
+        github_cost = summary.pop("github_cost", None)
+
+        progress("finalizing")
+        report = service.build_report(summary, llm_result, pipeline_timings)
+        report.details["raw_repositories_url"] = f"/api/jobs/{raw_repositories_id}/repositories"
+        if github_cost is not None:
+            # A reused fetch checkpoint cost this analysis nothing; the counts are the original fetch's
+            report.details["github_cost"] = dict(github_cost, reused="fetch" in (reused_stages or []))
+        if tracing.include_in_report():
+            # Upstream stages saved theirs to their job meta; reused (checkpointed) stages have none
+            traces = tracing.collect_job_traces(upstream_job_ids(analysis_id), get_redis_connection())
+            traces["llm"] = tracing.current_trace().breakdown()
+            report.details["trace"] = traces
+        _stage_succeeded("llm", time.perf_counter() - stage_started)
+
+        report_data = dump_model(report)
+        _attach_percentiles(report_data)
+        result = encode_result(report_data)
+        if cache_key:
+            AnalysisCoalescer().mark_finished(cache_key, analysis_id)
+        progress("completed")
+        _notify_batches(analysis_id, report=report_data)
+        _record_history(analysis_id, model_name, report_data)
+        return result
+    except Exception as e:
+        _stage_failed(analysis_id, "llm", cache_key, e)
         raise e
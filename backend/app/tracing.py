@@ -0,0 +1,220 @@
+"""
+Lightweight span tracing for the analysis pipeline.
+
+    with tracing.start_trace("fetch", analysis_id) as trace:
+        with tracing.span("github.get_user", username=username):
+            ...
+
+    @tracing.traced("collector.structure")
+    def analyze(...): ...
+
+Tracing is off unless TRACING=1. When it is off, `span()` returns a shared
+no-op context manager and `traced` functions cost one flag check per call.
+Spans are only recorded inside a trace (one per job). Finished traces go to
+the exporter chosen by TRACING_EXPORTER: "memory" (the default, the last
+TRACING_MEMORY_SPANS spans of this process) or "jsonl" (appended to
+TRACING_EXPORT_PATH).
+"""
+import os
+import json
+import time
+import uuid
+import functools
+import threading
+import contextvars
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+_enabled = os.getenv("TRACING", "0") == "1"
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("trace", default=None)
+_current_span: contextvars.ContextVar = contextvars.ContextVar("span", default=None)
+
+def is_enabled() -> bool:
+    return _enabled
+
+def set_enabled(enabled: bool) -> None:
+    global _enabled
+    _enabled = enabled
+
+def include_in_report() -> bool:
+    return _enabled and os.getenv("TRACING_IN_REPORT", "0") == "1"
+
+class InMemoryExporter:
+    """Keeps the most recent spans of this process (for tests and debugging)."""
+    def __init__(self, max_spans: Optional[int] = None):
+        self.spans: deque = deque(maxlen=max_spans or int(os.getenv("TRACING_MEMORY_SPANS", "10000")))
+
+    def export(self, spans: List[Dict[str, Any]]) -> None:
+        self.spans.extend(spans)
+
+class JsonLinesExporter:
+    """Appends one JSON line per span to a file."""
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("TRACING_EXPORT_PATH", "traces.jsonl")
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Dict[str, Any]]) -> None:
+        lines = "".join(json.dumps(span, default=str) + "\n" for span in spans)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+_exporter = None
+
+def get_exporter():
+    global _exporter
+    if _exporter is None:
+        _exporter = JsonLinesExporter() if os.getenv("TRACING_EXPORTER", "memory") == "jsonl" else InMemoryExporter()
+    return _exporter
+
+def set_exporter(exporter) -> None:
+    global _exporter
+    _exporter = exporter
+
+class Trace:
+    """The spans recorded for one job. Spans may finish on several threads."""
+    def __init__(self, name: str, job_id: Optional[str] = None):
+        self.name = name
+        self.job_id = job_id
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.spans: List[Dict[str, Any]] = []
+        self.started = time.perf_counter()
+
+    def add(self, span: Dict[str, Any]) -> None:
+        self.spans.append(span) # list.append is atomic under the GIL
+
+    def breakdown(self) -> Dict[str, Any]:
+        """Total time, call count and slowest call per span name, slowest names first."""
+        by_name: Dict[str, Dict[str, Any]] = {}
+        for span in list(self.spans):
+            entry = by_name.setdefault(span["name"], {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "errors": 0})
+            entry["count"] += 1
+            entry["total_ms"] += span["duration_ms"]
+            entry["max_ms"] = max(entry["max_ms"], span["duration_ms"])
+            entry["errors"] += 1 if span.get("error") else 0
+        for entry in by_name.values():
+            entry["total_ms"] = round(entry["total_ms"], 2)
+        return {
+            "trace_id": self.trace_id,
+            "stage": self.name,
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 2),
+            # Parallel spans (e.g. repository fetches) overlap, so totals can exceed the stage time
+            "spans": dict(sorted(by_name.items(), key=lambda item: -item[1]["total_ms"]))
+        }
+
+class _Span:
+    __slots__ = ("trace", "name", "attrs", "span_id", "parent_id", "start", "token")
+
+    def __init__(self, trace: Trace, name: str, attrs: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs) -> None:
+        """Adds attributes known only once the span is running (e.g. response size)."""
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = _current_span.get()
+        self.token = _current_span.set(self.span_id)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        _current_span.reset(self.token)
+        self.trace.add({
+            "trace_id": self.trace.trace_id, "span_id": self.span_id, "parent_id": self.parent_id,
+            "job_id": self.trace.job_id, "name": self.name,
+            "start": time.time() - duration, "duration_ms": round(duration * 1000, 3),
+            "thread": threading.current_thread().name,
+            "attrs": self.attrs, "error": f"{exc_type.__name__}: {exc}" if exc_type else None
+        })
+        return False
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **attrs) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NOOP = _NoopSpan()
+
+def span(name: str, **attrs):
+    """A timed span within the current trace; a shared no-op outside a trace or when disabled."""
+    if not _enabled:
+        return _NOOP
+    trace = _current_trace.get()
+    if trace is None:
+        return _NOOP
+    return _Span(trace, name, attrs)
+
+def traced(name: Optional[str] = None) -> Callable:
+    """Decorator form of `span`, named after the function by default."""
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get() if _enabled else None
+
+def bind(func: Callable) -> Callable:
+    """
+    Carries the current trace into another thread (pool threads don't inherit
+    context variables): submit `bind(fn)` instead of `fn`.
+    """
+    if not _enabled or _current_trace.get() is None:
+        return func
+    return functools.partial(contextvars.copy_context().run, func)
+
+class start_trace:
+    """
+    Records the spans of one job. On exit the spans are exported and, when
+    running under RQ, the per-span breakdown is saved to the job's meta as
+    `trace`.
+    """
+    def __init__(self, name: str, job_id: Optional[str] = None):
+        self.trace = Trace(name, job_id) if _enabled else None
+
+    def __enter__(self) -> Optional[Trace]:
+        if self.trace is not None:
+            self.token = _current_trace.set(self.trace)
+        return self.trace
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.trace is None:
+            return False
+        _current_trace.reset(self.token)
+        try:
+            get_exporter().export(self.trace.spans)
+            from rq import get_current_job
+            job = get_current_job()
+            if job is not None:
+                job.meta["trace"] = self.trace.breakdown()
+                job.save_meta()
+        except Exception as e:
+            print(f"Could not export trace {self.trace.trace_id}: {e}")
+        return False
+
+def collect_job_traces(job_ids: List[str], connection) -> Dict[str, Any]:
+    """The saved breakdowns of the given jobs, by stage (jobs without one are left out)."""
+    from rq.job import Job
+    traces = {}
+    for job in Job.fetch_many(job_ids, connection=connection):
+        if job is not None and job.meta.get("trace"):
+            traces[job.meta["trace"]["stage"]] = job.meta["trace"]
+    return traces
@@ -0,0 +1,113 @@
+import math
+import os
+import time
+from multiprocessing import get_context
+from typing import Iterable, List, Optional
+from rq import SimpleWorker, Queue
+from rq.registry import StartedJobRegistry
+from rq.worker_pool import WorkerPool
+from app import redis_client
+
+def preload() -> None:
+    """
+    Imports the task modules (PyGithub, pydantic models, compiled scoring rules)
+    once in the supervisor, so forked workers start with them already loaded.
+    """
+    import app.tasks  # noqa: F401
+
+def run_pool_worker(worker_name: str, queue_names: List[str], max_jobs: Optional[int] = None,
+                    warm_models: Iterable[str] = (), burst: bool = False, logging_level: str = "INFO") -> None:
+    """
+    Entry point of one pool process: a SimpleWorker, so jobs run in this process
+    and reuse its warm providers. A crash only takes down this process, which
+    the supervisor replaces.
+    """
+    # Never share the supervisor's Redis socket across fork
+    redis_client.reset_connection()
+    from app.tasks import warm_up
+    warm_up(warm_models, queues=queue_names)
+
+    connection = redis_client.get_redis_connection()
+    worker = SimpleWorker([Queue(name, connection=connection) for name in queue_names], name=worker_name, connection=connection)
+    # With max_jobs the process exits after that many jobs and is respawned fresh
+    worker.work(burst=burst, with_scheduler=True, max_jobs=max_jobs, logging_level=logging_level)
+
+class AnalysisWorkerPool(WorkerPool):
+    """
+    Supervises N forked worker processes and respawns any that die.
+
+    With `max_workers` set, the pool autoscales between `num_workers` and
+    `max_workers` from queue depth: one process per `jobs_per_worker` queued or
+    running jobs. Scale-down waits `scale_down_delay` seconds after the last
+    scale-up and stops workers with a warm shutdown (they finish their job first).
+    """
+    def __init__(self, queues: Iterable[str], connection, num_workers: int = 1, max_workers: Optional[int] = None,
+                 jobs_per_worker: int = 2, max_jobs: Optional[int] = None, warm_models: Iterable[str] = (),
+                 scale_down_delay: float = 30.0):
+        super().__init__(queues, connection=connection, num_workers=num_workers, worker_class=SimpleWorker)
+        self.min_workers = num_workers
+        self.max_workers = max(max_workers, num_workers) if max_workers else None
+        self.jobs_per_worker = max(jobs_per_worker, 1)
+        self.max_jobs = max_jobs
+        self.warm_models = list(warm_models)
+        self.scale_down_delay = scale_down_delay
+        self._last_scale_up = 0.0
+        self._stopping = set()
+
+    def get_worker_process(self, name: str, burst: bool, _sleep: float = 0, logging_level: str = "INFO"):
+        return get_context("fork").Process(
+            target=run_pool_worker,
+            args=(name, self._queue_names),
+            kwargs={
+                "max_jobs": self.max_jobs,
+                "warm_models": self.warm_models,
+                "burst": burst,
+                "logging_level": logging_level
+            },
+            name=f"Worker {name} (WorkerPool {self.name})"
+        )
+
+    def pending_jobs(self) -> int:
+        """Queued plus running jobs across the pool's queues."""
+        pipe = self.connection.pipeline(transaction=False)
+        for queue in self.queues:
+            pipe.llen(queue.key)
+            pipe.zcard(StartedJobRegistry(queue.name, connection=self.connection).key)
+        return sum(pipe.execute())
+
+    def desired_workers(self) -> int:
+        if not self.max_workers:
+            return self.min_workers
+        wanted = math.ceil(self.pending_jobs() / self.jobs_per_worker)
+        return min(max(wanted, self.min_workers), self.max_workers)
+
+    def _autoscale(self) -> None:
+        desired = self.desired_workers()
+        running = len(self.worker_dict) - len(self._stopping)
+        if desired > self.num_workers:
+            self.log.info("Scaling up to %d workers", desired)
+            self._last_scale_up = time.monotonic()
+        elif desired < running and time.monotonic() - self._last_scale_up >= self.scale_down_delay:
+            self.log.info("Scaling down to %d workers", desired)
+            candidates = [data for name, data in self.worker_dict.items() if name not in self._stopping]
+            for data in candidates[:running - desired]:
+                self._stopping.add(data.name)
+                self.stop_worker(data)
+        else:
+            return
+        self.num_workers = desired
+
+    def check_workers(self, respawn: bool = True) -> None:
+        self.reap_workers()
+        if not respawn or self.status == self.Status.STOPPED:
+            return
+        if self.max_workers:
+            self._autoscale()
+        # Workers being stopped still count as alive until they exit
+        running = len(self.worker_dict) - len(self._stopping)
+        for _ in range(self.num_workers - running):
+            self.start_worker(burst=self._burst, _sleep=self._sleep)
+
+    def handle_dead_worker(self, worker_data) -> None:
+        super().handle_dead_worker(worker_data)
+        self._stopping.discard(worker_data.name)
@@ -0,0 +1,165 @@
+"""
+Offline batch analysis: runs AnalysisService over a file of usernames without
+Redis, RQ or Flask, appending one JSON line per user as soon as it finishes.
+
+The output file doubles as the checkpoint: rerunning with the same output skips
+users that already have a successful line (and, with --retry-failed left off,
+users that failed too), so an interrupted nightly run resumes where it stopped.
+
+Usage (from backend/):
+    python batch_cli.py usernames.txt -o results.jsonl [-c 4] [--skip-llm] [--deadline 30]
+    cat usernames.txt | python batch_cli.py - -o results.jsonl
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import concurrent.futures
+from typing import Any, Dict, Iterable, Iterator, Optional, Set, TextIO
+from dotenv import load_dotenv
+from app.models.dtos import dump_model
+from app.services.analysis_service import AnalysisService
+from app.services.github_provider import GithubProvider
+from app.services import github_metering
+from app.services.llm_provider import OllamaProvider
+
+def read_usernames(lines: Iterable[str]) -> Iterator[str]:
+    """One username per line; blank lines and `#` comments are skipped."""
+    for line in lines:
+        username = line.split("#", 1)[0].strip()
+        if username:
+            yield username
+
+def completed_usernames(path: str, retry_failed: bool = True) -> Set[str]:
+    """Users already recorded in an existing output file (lowercased)."""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue # Line cut short by an interrupted run
+            if record.get("status") == "ok" or not retry_failed:
+                done.add(record["username"].lower())
+    return done
+
+def analyze_one(service: AnalysisService, username: str, skip_llm: bool = False,
+                deadline_seconds: Optional[float] = None) -> Dict[str, Any]:
+    started = time.perf_counter()
+    try:
+        with github_metering.track(github_metering.default_budget()) as ledger:
+            if skip_llm:
+                # Deterministic re-scoring only: fetch, score, aggregate, no LLM call
+                profile = service.fetch_profile(username)
+                service.score_repositories(profile.repositories)
+                summary = service.summarize(profile)
+                report = service.build_report(summary, service.estimate_llm_result(summary))
+            else:
+                deadline = time.time() + deadline_seconds if deadline_seconds else None
+                report = service.analyze_user(username, deadline=deadline)
+        report.details["github_cost"] = ledger.to_dict()
+        record = {"username": username, "status": "ok", "report": dump_model(report)}
+    except Exception as e:
+        record = {"username": username, "status": "error", "error": str(e)}
+    record["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+    record["finished_at"] = time.time()
+    return record
+
+def run_batch(usernames: Iterable[str], output: TextIO, service: AnalysisService, concurrency: int = 2,
+              skip_llm: bool = False, deadline_seconds: Optional[float] = None,
+              skip: Optional[Set[str]] = None, log: TextIO = sys.stderr) -> Dict[str, int]:
+    """
+    Analyzes `usernames` with at most `concurrency` users in flight, writing each
+    record to `output` as it completes (completion order). Input is consumed
+    lazily, so the username list can be arbitrarily long.
+
+    Returns:
+        Dict[str, int]: Counts of "ok", "error" and "skipped" users.
+    """
+    skip = set(skip or ())
+    counts = {"ok": 0, "error": 0, "skipped": 0}
+    remaining = iter(usernames)
+    pending = set()
+
+    def submit_next(executor) -> bool:
+        for username in remaining:
+            if username.lower() in skip:
+                counts["skipped"] += 1
+                continue
+            skip.add(username.lower()) # Duplicates in the input run once
+            pending.add(executor.submit(analyze_one, service, username, skip_llm, deadline_seconds))
+            return True
+        return False
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        try:
+            while len(pending) < concurrency and submit_next(executor):
+                pass
+            while pending:
+                finished, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in finished:
+                    pending.discard(future)
+                    record = future.result()
+                    output.write(json.dumps(record) + "\n")
+                    output.flush()
+                    counts[record["status"]] += 1
+                    detail = record.get("error") or f"{record['elapsed_seconds']}s"
+                    print(f"[{counts['ok'] + counts['error']}] {record['username']}: {record['status']} ({detail})", file=log)
+                    submit_next(executor)
+        except KeyboardInterrupt:
+            # Let running users finish and be written; queued ones are picked up on resume
+            print(f"Interrupted; waiting for {len(pending)} running analyses...", file=log)
+            for future in concurrent.futures.as_completed(pending):
+                record = future.result()
+                output.write(json.dumps(record) + "\n")
+                counts[record["status"]] += 1
+            output.flush()
+            raise
+    return counts
+
+def _ends_with_newline(path: str) -> bool:
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return True
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Analyze many GitHub users offline and write JSON lines.")
+    parser.add_argument("input", help="File with one username per line, or - for stdin")
+    parser.add_argument("-o", "--output", required=True, help="JSONL output file (appended; also the resume checkpoint)")
+    parser.add_argument("-c", "--concurrency", type=int, default=2, help="Users analyzed at once (default 2)")
+    parser.add_argument("-m", "--model", default="llama3", help="Ollama model (default llama3)")
+    parser.add_argument("--skip-llm", action="store_true", help="Only re-score repositories; no LLM call")
+    parser.add_argument("--deadline", type=float, help="Per-user time limit in seconds (partial reports)")
+    parser.add_argument("--no-resume", action="store_true", help="Analyze users already in the output again")
+    parser.add_argument("--retry-failed", action="store_true", help="On resume, retry users that failed")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    service = AnalysisService(GithubProvider(token=os.getenv("GITHUB_TOKEN")), OllamaProvider(model=args.model))
+    skip = set() if args.no_resume else completed_usernames(args.output, retry_failed=args.retry_failed)
+    if skip:
+        print(f"Resuming: {len(skip)} users already in {args.output}", file=sys.stderr)
+
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    try:
+        with open(args.output, "a", encoding="utf-8") as output:
+            if not _ends_with_newline(args.output):
+                output.write("\n") # Terminate a line cut short by an interrupted run
+            counts = run_batch(read_usernames(source), output, service, concurrency=max(args.concurrency, 1),
+                               skip_llm=args.skip_llm, deadline_seconds=args.deadline, skip=skip)
+    except KeyboardInterrupt:
+        return 130
+    finally:
+        if source is not sys.stdin:
+            source.close()
+
+    print(f"Done: {counts['ok']} ok, {counts['error']} failed, {counts['skipped']} skipped", file=sys.stderr)
+    return 1 if counts["error"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
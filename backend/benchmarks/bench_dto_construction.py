@@ -0,0 +1,60 @@
+"""
+Compares validated vs. trusted DTO construction and serialization cost.
+Run once per installed pydantic version to compare versions.
+
+Usage (from backend/): python -m benchmarks.bench_dto_construction [rounds]
+"""
+import sys
+import time
+import pydantic
+from app.models.dtos import Repository, ScoreDetail, trusted, dump_model, PYDANTIC_V2
+from app.models.file_tree import FileTree
+
+def repo_fields(i: int) -> dict:
+    return {
+        "name": f"repo-{i}", "description": "An example repository", "language": "Python",
+        "stargazers_count": i, "forks_count": 1, "updated_at": "2026-01-01T00:00:00+00:00",
+        "html_url": f"https://github.com/dev/repo-{i}", "topics": ["api", "cli"],
+        # Built by the provider before the DTO, as trusted() expects
+        "file_tree": FileTree.from_paths(f"src/module_{n}.py" for n in range(200)),
+        "dependency_files": {"requirements.txt": "flask\nrequests\n"},
+        "readme_content": "# Usage\n" * 50,
+        "commit_history": [{"sha": str(n), "message": "feat: change", "date": "2026-01-01T00:00:00", "author": "dev"} for n in range(15)]
+    }
+
+def construct(model_cls, **kwargs):
+    # Raw validation-free construction, regardless of what trusted() picks
+    if PYDANTIC_V2:
+        return model_cls.model_construct(**kwargs)
+    return model_cls.construct(**kwargs)
+
+def timed(fn, rounds: int) -> float:
+    start = time.perf_counter()
+    for i in range(rounds):
+        fn(i)
+    return (time.perf_counter() - start) / rounds * 1e6
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    fields = [repo_fields(i) for i in range(rounds)]
+    validated = [Repository(**f) for f in fields]
+
+    rows = [
+        ("Repository(**fields)", timed(lambda i: Repository(**fields[i]), rounds)),
+        ("trusted(Repository)", timed(lambda i: trusted(Repository, **fields[i]), rounds)),
+        ("Repository.construct", timed(lambda i: construct(Repository, **fields[i]), rounds)),
+        ("ScoreDetail(...)", timed(lambda i: ScoreDetail(score=i % 100, level="Good", positives=["a"], negatives=["b"]), rounds)),
+        ("trusted(ScoreDetail)", timed(lambda i: trusted(ScoreDetail, score=i % 100, level="Good", positives=["a"], negatives=["b"]), rounds)),
+        ("dump_model(repo)", timed(lambda i: dump_model(validated[i]), rounds)),
+    ]
+    if PYDANTIC_V2:
+        # Deprecated v1-style alias, as used before this change
+        rows.append(("repo.dict() (v2 compat)", timed(lambda i: validated[i].dict(), rounds)))
+
+    print(f"pydantic {pydantic.VERSION}")
+    print(f"{'operation':<26}{'us/op':>10}")
+    for name, us in rows:
+        print(f"{name:<26}{us:>10.2f}")
+
+if __name__ == "__main__":
+    main()
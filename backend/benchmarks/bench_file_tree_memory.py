@@ -0,0 +1,58 @@
+"""
+Peak RSS and retained heap of holding large synthetic file trees as List[str] vs. FileTree,
+including one pickling round (as when results travel through Redis).
+Each variant runs in a fresh subprocess so peaks don't mix.
+
+Usage (from backend/): python -m benchmarks.bench_file_tree_memory [entries] [repos]
+"""
+import sys
+import gc
+import pickle
+import resource
+import tracemalloc
+import subprocess
+
+def synthetic_paths(entries: int):
+    # Deep monorepo layout: packages/<pkg>/src/<module>/<file>
+    for i in range(entries):
+        yield f"packages/package_{i % 200}/src/components/module_{i % 37}/file_{i}.ts"
+
+def build(variant: str, entries: int, repos: int) -> list:
+    from app.models.file_tree import FileTree
+    if variant == "list":
+        return [list(synthetic_paths(entries)) for _ in range(repos)]
+    return [FileTree.from_paths(synthetic_paths(entries)) for _ in range(repos)]
+
+def run_variant(variant: str, entries: int, repos: int, mode: str) -> None:
+    if mode == "retained":
+        # Separate run: tracemalloc itself inflates RSS
+        tracemalloc.start()
+        trees = build(variant, entries, repos)
+        gc.collect()
+        print(f"{tracemalloc.get_traced_memory()[0] / 1024 / 1024:.1f}")
+        return
+    trees = build(variant, entries, repos)
+    blob = pickle.dumps(trees)
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"{peak_kb / 1024:.1f} {len(blob) / 1024 / 1024:.1f}")
+
+def main():
+    entries = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    repos = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    if len(sys.argv) > 4:
+        run_variant(sys.argv[3], entries, repos, sys.argv[4])
+        return
+
+    def child(variant: str, mode: str) -> list:
+        cmd = [sys.executable, "-m", "benchmarks.bench_file_tree_memory", str(entries), str(repos), variant, mode]
+        return subprocess.run(cmd, check=True, capture_output=True, text=True).stdout.split()
+
+    print(f"{repos} repos x {entries} entries")
+    print(f"{'variant':<10}{'peak RSS MB':>12}{'retained MB':>14}{'pickle MB':>12}")
+    for variant in ("list", "filetree"):
+        peak, pickled = child(variant, "peak")
+        retained, = child(variant, "retained")
+        print(f"{variant:<10}{peak:>12}{retained:>14}{pickled:>12}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Compares stored size and encode/decode time of job results:
+the old pickled report dict vs. each available ResultCodec.
+
+Usage (from backend/): python -m benchmarks.bench_result_codec [repo_count]
+"""
+import sys
+import time
+import pickle
+from app.result_codec import ResultCodec, SERIALIZERS, COMPRESSORS
+
+def synthetic_report(repo_count: int) -> dict:
+    def score(i: int = 0) -> dict:
+        # Distinct objects per field, as in real results (pickle memoizes shared ones)
+        return {"score": 40 + i % 50, "level": "Prototype", "positives": [f"Testing framework detected {i}"],
+                "negatives": [f"Add a License file {i}", "Implement automated tests"]}
+
+    repos = [
+        {
+            "name": f"repo-{i}", "description": "Service for processing events " * 3, "language": "Python",
+            "stargazers_count": i, "forks_count": i // 2, "updated_at": "2026-01-01T00:00:00+00:00",
+            "html_url": f"https://github.com/dev/repo-{i}", "has_ci": True, "has_docker": False,
+            "has_tests": True, "has_license": False, "dependencies": ["flask", "requests", "pydantic"],
+            "topics": ["api"], "maturity_score": score(i), "repo_documentation_score": score(i + 1),
+            "code_hygiene_score": score(i + 2), "maturity_label": "Prototype", "conventional_commits_ratio": 0.4,
+            "commit_frequency": 3.2, "average_message_length": 0.0, "recommendations": ["Add a License file"]
+        }
+        for i in range(repo_count)
+    ]
+    return {
+        "username": "dev", "profile_score": score(), "personal_readme_score": score(), "avg_repo_docs_score": score(),
+        "avg_code_hygiene_score": score(), "repo_quality_score": score(), "overall_score": score(),
+        "summary": "Lorem ipsum dolor sit amet. " * 60,
+        "suggestions": [{"category": "Testing", "severity": "high", "message": "Add integration tests"}] * 5,
+        "details": {"repo_count": repo_count, "repositories": repos, "career_roadmap": []},
+        "raw_llm_response": {"summary": "Lorem ipsum dolor sit amet. " * 60}
+    }
+
+def measure(encode, decode, obj, rounds: int = 50):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        blob = encode(obj)
+    encode_ms = (time.perf_counter() - start) / rounds * 1000
+    start = time.perf_counter()
+    for _ in range(rounds):
+        decode(blob)
+    decode_ms = (time.perf_counter() - start) / rounds * 1000
+    return len(blob), encode_ms, decode_ms
+
+def main():
+    repo_count = int(sys.argv[1]) if len(sys.argv) > 1 else 15
+    report = synthetic_report(repo_count)
+
+    # Baseline: RQ pickles the returned dict
+    rows = [("pickle(dict)",) + measure(pickle.dumps, pickle.loads, report)]
+    for serializer in SERIALIZERS:
+        for compressor in COMPRESSORS:
+            codec = ResultCodec(f"{serializer}+{compressor}")
+            # RQ still pickles the returned bytes, so measure the stored form
+            rows.append((codec.name,) + measure(
+                lambda obj: pickle.dumps(codec.encode(obj)),
+                lambda blob: codec.decode(pickle.loads(blob)),
+                report
+            ))
+
+    print(f"{'codec':<16}{'bytes':>10}{'encode ms':>12}{'decode ms':>12}")
+    for name, size, enc, dec in rows:
+        print(f"{name:<16}{size:>10}{enc:>12.3f}{dec:>12.3f}")
+
+if __name__ == "__main__":
+    main()
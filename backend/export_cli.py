@@ -0,0 +1,45 @@
+"""
+Exports the analysis history (see app/history_store.py) to columnar files for
+offline analytics: Parquet when pyarrow is installed, otherwise raw column
+files that numpy reads directly.
+
+Each run appends a new part with the analyses stored since the previous run,
+so it can be scheduled (e.g. nightly) against the same output directory.
+
+Usage (from backend/):
+    python export_cli.py exports/ [--format parquet|columnar] [--chunk-size 500] [--full]
+"""
+import os
+import sys
+import argparse
+from typing import Optional
+from dotenv import load_dotenv
+from app.history_store import SQLiteHistoryStore
+from app.columnar_export import WRITERS, default_format, export_history
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Export stored analyses to columnar files.")
+    parser.add_argument("output", help="Export directory (created if missing)")
+    parser.add_argument("--db", help="History database (default: HISTORY_DB_PATH or analysis_history.db)")
+    parser.add_argument("--format", choices=sorted(WRITERS), help=f"Output format (default {default_format()})")
+    parser.add_argument("--chunk-size", type=int, default=500, help="Analyses per chunk (bounds memory; default 500)")
+    parser.add_argument("--full", action="store_true", help="Discard the previous export and start over")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    store = SQLiteHistoryStore(args.db or os.getenv("HISTORY_DB_PATH", "analysis_history.db"))
+    try:
+        counts = export_history(store, args.output, fmt=args.format, chunk_size=max(args.chunk_size, 1),
+                                full=args.full, log=lambda message: print(message, file=sys.stderr))
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    if not counts["analyses"]:
+        print("Nothing new to export", file=sys.stderr)
+    else:
+        print(f"Done: {counts['analyses']} analyses, {counts['repositories']} repositories, "
+              f"{counts['dependencies']} dependencies", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
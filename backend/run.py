@@ -1,8 +1,9 @@
-from flask import Flask
+from flask import Flask, Response
 from flask_cors import CORS
 from dotenv import load_dotenv
 from app.api.routes import api_bp
 from app.redis_client import get_redis_connection
+from app import metrics
 from redis.exceptions import ConnectionError as RedisConnectionError
 import os
 
@@ -22,6 +23,11 @@ def create_app():
         # Optional: Check Redis health here too
         return {"status": "ok", "message": "GitHub Profile Analyzer API is running"}
 
+    @app.route('/metrics')
+    def prometheus_metrics():
+        # Totals of all API and worker processes, aggregated in Redis
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
     return app
 
 if __name__ == '__main__':
@@ -0,0 +1,126 @@
+import os
+import threading
+import unittest
+from unittest import mock
+from app import redis_client
+from app.admission import AdmissionController, AdmissionRejected
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+class StubJobStore:
+    def __init__(self):
+        self.statuses = {}
+
+    def get_status(self, job_id):
+        return self.statuses.get(job_id)
+
+@unittest.skipUnless(fakeredis, "fakeredis is not installed")
+class TestAdmissionController(unittest.TestCase):
+    def setUp(self):
+        redis_client.reset_connection()
+        redis_client._connection = fakeredis.FakeStrictRedis()
+        self.env = mock.patch.dict(os.environ, {"ADMISSION_CLIENT_MAX_INFLIGHT": "2"})
+        self.env.start()
+        self.job_store = StubJobStore()
+        self.admission = AdmissionController(self.job_store)
+
+    def tearDown(self):
+        self.env.stop()
+        redis_client.reset_connection()
+
+    def test_client_over_quota_is_rejected_with_retry_after(self):
+        for job_id in ("a", "b"):
+            self.admission.check("client", reservation=job_id)
+            self.admission.register("client", job_id, reservation=job_id)
+            self.job_store.statuses[job_id] = "queued"
+
+        with self.assertRaises(AdmissionRejected) as rejected:
+            self.admission.check("client", reservation="c")
+        self.assertEqual(rejected.exception.reason, "client_quota")
+        self.assertGreaterEqual(rejected.exception.retry_after, 1)
+        self.assertEqual(sorted(self.admission.client_inflight("client")), ["a", "b"])
+
+        # A finished job frees its slot
+        self.job_store.statuses["a"] = "finished"
+        self.admission.check("client", reservation="c")
+
+    def test_concurrent_requests_cannot_overrun_quota(self):
+        barrier = threading.Barrier(8)
+        admitted, rejected = [], []
+
+        def request(index):
+            barrier.wait()
+            try:
+                self.admission.check("client", reservation=str(index))
+                admitted.append(index)
+            except AdmissionRejected:
+                rejected.append(index)
+
+        threads = [threading.Thread(target=request, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(admitted), 2)
+        self.assertEqual(len(rejected), 6)
+
+    def test_released_reservation_frees_slot(self):
+        self.admission.check("client", reservation="a")
+        self.admission.check("client", reservation="b")
+        self.admission.release("client", "a")
+        self.admission.check("client", reservation="c")
+        self.assertEqual(len(self.admission.client_inflight("client")), 2)
+
+    def test_overloaded_rejection_has_retry_after(self):
+        self.admission.max_wait_seconds = 10
+        with self.assertRaises(AdmissionRejected) as rejected:
+            self.admission.check("client", reservation="a")
+        self.assertEqual(rejected.exception.reason, "overloaded")
+        self.assertGreaterEqual(rejected.exception.retry_after, 1)
+        # Rejected requests don't hold a slot
+        self.assertEqual(self.admission.client_inflight("client"), [])
+
+@unittest.skipUnless(fakeredis, "fakeredis is not installed")
+class TestAnalyzeAdmission(unittest.TestCase):
+    def setUp(self):
+        redis_client.reset_connection()
+        redis_client._connection = fakeredis.FakeStrictRedis()
+        from run import create_app
+        from app.api import routes
+        self.job_store = StubJobStore()
+        with mock.patch.dict(os.environ, {"ADMISSION_CLIENT_MAX_INFLIGHT": "1"}):
+            admission = AdmissionController(self.job_store)
+        self.patches = [
+            mock.patch.object(routes, "admission", admission),
+            mock.patch.object(routes, "coalescer", routes.AnalysisCoalescer(self.job_store)),
+            mock.patch.object(routes, "enqueue_analysis", lambda username, *a, **kw: f"job-{username}")
+        ]
+        for patch in self.patches:
+            patch.start()
+        self.client = create_app().test_client()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        redis_client.reset_connection()
+
+    def test_rejected_analysis_returns_429_with_retry_after(self):
+        first = self.client.post("/api/analyze/alice", json={})
+        self.assertEqual(first.status_code, 202)
+        self.job_store.statuses["job-alice"] = "queued"
+
+        second = self.client.post("/api/analyze/bob", json={})
+        self.assertEqual(second.status_code, 429)
+        self.assertEqual(second.get_json()["reason"], "client_quota")
+        self.assertEqual(second.headers["Retry-After"], str(second.get_json()["retry_after"]))
+
+    def test_unknown_model_is_rejected(self):
+        response = self.client.post("/api/analyze/alice", json={"model": 'llama3"}\nx'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.post("/api/analyze/batch", json={"usernames": ["a"], "model": "gpt"}).status_code, 400)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,177 @@
+import time
+import unittest
+import threading
+from unittest import mock
+from app import redis_client
+from app.analysis_cache import AnalysisCoalescer, analysis_key
+from app.admission import client_id_for
+from app.cancellation import is_cancel_requested, unsubscribe
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+class StubJobStore:
+    """Job statuses set by the test instead of read from RQ."""
+    def __init__(self):
+        self.statuses = {}
+
+    def get_status(self, job_id):
+        return self.statuses.get(job_id, "unknown")
+
+class TestAnalysisKey(unittest.TestCase):
+    def test_same_request_same_key(self):
+        self.assertEqual(analysis_key("Octocat", "llama3", {"a": 1, "b": 2}), analysis_key("octocat", "llama3", {"b": 2, "a": 1}))
+        self.assertEqual(analysis_key("octocat", "llama3"), analysis_key("octocat", "llama3", {}))
+
+    def test_model_and_options_change_key(self):
+        base = analysis_key("octocat", "llama3")
+        self.assertNotEqual(base, analysis_key("octocat", "mistral"))
+        self.assertNotEqual(base, analysis_key("octocat", "llama3", {"deadline": 10}))
+
+@unittest.skipUnless(fakeredis, "fakeredis is not installed")
+class TestCoalescerSubmit(unittest.TestCase):
+    def setUp(self):
+        redis_client._connection = fakeredis.FakeStrictRedis()
+        self.jobs = StubJobStore()
+        self.coalescer = AnalysisCoalescer(self.jobs)
+        self.enqueued = []
+
+    def tearDown(self):
+        redis_client.reset_connection()
+
+    def enqueue(self):
+        job_id = f"job-{len(self.enqueued) + 1}"
+        self.enqueued.append(job_id)
+        self.jobs.statuses[job_id] = "queued"
+        return job_id
+
+    def test_new_then_inflight(self):
+        self.assertEqual(self.coalescer.submit("k", self.enqueue), ("job-1", "new"))
+        self.jobs.statuses["job-1"] = "started"
+        self.assertEqual(self.coalescer.submit("k", self.enqueue), ("job-1", "inflight"))
+        self.assertEqual(self.enqueued, ["job-1"])
+
+    def test_cache_hit_and_force_refresh(self):
+        self.coalescer.submit("k", self.enqueue)
+        self.coalescer.mark_finished("k", "job-1")
+        self.jobs.statuses["job-1"] = "finished"
+        self.assertEqual(self.coalescer.submit("k", self.enqueue), ("job-1", "cache"))
+        self.assertEqual(self.coalescer.submit("k", self.enqueue, force_refresh=True), ("job-2", "new"))
+
+    def test_finishing_job_is_shared(self):
+        # mark_finished runs inside the job, before RQ stores the result and marks it finished
+        self.coalescer.submit("k", self.enqueue)
+        self.jobs.statuses["job-1"] = "started"
+        self.coalescer.mark_finished("k", "job-1")
+        self.assertEqual(self.coalescer.submit("k", self.enqueue), ("job-1", "inflight"))
+        self.assertEqual(self.coalescer.submit("k", self.enqueue, force_refresh=True), ("job-1", "inflight"))
+        self.assertEqual(self.enqueued, ["job-1"])
+
+    def test_stale_pointers_are_replaced(self):
+        self.coalescer.submit("k", self.enqueue)
+        self.jobs.statuses["job-1"] = "failed"
+        self.assertEqual(self.coalescer.submit("k", self.enqueue), ("job-2", "new"))
+        self.coalescer.mark_finished("k", "job-2")
+        del self.jobs.statuses["job-2"] # Result expired
+        self.assertEqual(self.coalescer.submit("k", self.enqueue), ("job-3", "new"))
+        self.assertIsNone(self.coalescer.cached("k"))
+
+    def test_waits_for_lock_holder_instead_of_enqueueing_twice(self):
+        lock = redis_client._connection.lock(self.coalescer._lock_key("k"), timeout=10)
+        lock.acquire()
+        results = []
+        waiter = threading.Thread(target=lambda: results.append(self.coalescer.submit("k", self.enqueue)))
+        waiter.start()
+        time.sleep(0.2)
+        # The lock holder enqueues meanwhile
+        self.jobs.statuses["other"] = "queued"
+        redis_client._connection.set(self.coalescer._inflight_key("k"), "other")
+        lock.release()
+        waiter.join(5)
+        self.assertEqual(results, [("other", "inflight")])
+        self.assertEqual(self.enqueued, [])
+
+    def test_job_cancelled_only_when_last_submitter_leaves(self):
+        self.assertEqual(self.coalescer.submit("k", self.enqueue, subscriber="alice"), ("job-1", "new"))
+        self.assertEqual(self.coalescer.submit("k", self.enqueue, subscriber="bob"), ("job-1", "inflight"))
+
+        self.assertEqual(unsubscribe("job-1", "alice", ["job-1"]), (1, []))
+        self.assertFalse(is_cancel_requested("job-1"))
+        self.assertEqual(unsubscribe("job-1", "bob", ["job-1"])[0], 0)
+        self.assertTrue(is_cancel_requested("job-1"))
+
+    def test_batch_subscription_keeps_member_alive(self):
+        self.coalescer.submit("k", self.enqueue, subscriber="batch:b1")
+        self.coalescer.submit("k", self.enqueue, subscriber="alice")
+        self.assertEqual(unsubscribe("job-1", "alice", ["job-1"])[0], 1)
+        self.assertFalse(is_cancel_requested("job-1"))
+
+    def test_unknown_subscriber_cannot_cancel(self):
+        self.coalescer.submit("k", self.enqueue, subscriber="alice")
+        self.assertEqual(unsubscribe("job-1", "mallory", ["job-1"]), (-1, []))
+        self.assertFalse(is_cancel_requested("job-1"))
+
+    def test_cancelled_job_is_not_shared(self):
+        self.coalescer.submit("k", self.enqueue, subscriber="alice")
+        self.jobs.statuses["job-1"] = "started" # Stops at its next checkpoint
+        unsubscribe("job-1", "alice", ["job-1"])
+        self.assertEqual(self.coalescer.submit("k", self.enqueue, subscriber="bob"), ("job-2", "new"))
+
+@unittest.skipUnless(fakeredis, "fakeredis is not installed")
+class TestCancelRoute(unittest.TestCase):
+    def setUp(self):
+        redis_client.reset_connection()
+        redis_client._connection = fakeredis.FakeStrictRedis()
+        from run import create_app
+        from app.api import routes
+        from app.admission import AdmissionController
+        self.jobs = StubJobStore()
+        self.patches = [
+            mock.patch.object(routes, "job_store", self.jobs),
+            mock.patch.object(routes, "admission", AdmissionController(self.jobs)),
+            mock.patch.object(routes, "coalescer", AnalysisCoalescer(self.jobs)),
+            mock.patch.object(routes, "enqueue_analysis", self.enqueue)
+        ]
+        for patch in self.patches:
+            patch.start()
+        self.client = create_app().test_client()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        redis_client.reset_connection()
+
+    def enqueue(self, username, *args, **kwargs):
+        self.jobs.statuses["job-1"] = "queued"
+        return "job-1"
+
+    def test_two_submitters_share_job_until_both_leave(self):
+        first = self.client.post("/api/analyze/dev", json={}).get_json()
+        second = self.client.post("/api/analyze/dev", json={}).get_json()
+        self.assertEqual((first["source"], second["source"]), ("new", "inflight"))
+        self.assertNotEqual(first["subscription"], second["subscription"])
+
+        left = self.client.delete(f"/api/jobs/job-1?subscription={first['subscription']}")
+        self.assertEqual(left.status_code, 200)
+        self.assertEqual(left.get_json()["subscribers"], 1)
+        self.assertFalse(is_cancel_requested("job-1"))
+
+        # Without a subscription a shared job is left alone
+        self.assertEqual(self.client.delete("/api/jobs/job-1").status_code, 200)
+        self.assertFalse(is_cancel_requested("job-1"))
+
+        last = self.client.delete(f"/api/jobs/job-1?subscription={second['subscription']}")
+        self.assertEqual(last.status_code, 202)
+        self.assertTrue(last.get_json()["canceled"])
+        self.assertTrue(is_cancel_requested("job-1"))
+
+class TestClientId(unittest.TestCase):
+    def test_api_key_takes_precedence(self):
+        self.assertEqual(client_id_for("k1", "10.0.0.1"), client_id_for("k1", "10.0.0.2"))
+        self.assertNotEqual(client_id_for(None, "10.0.0.1"), client_id_for(None, "10.0.0.2"))
+        self.assertNotIn("10.0.0.1", client_id_for(None, "10.0.0.1"))
+
+if __name__ == "__main__":
+    unittest.main()
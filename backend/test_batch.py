@@ -0,0 +1,214 @@
+import os
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+from app import redis_client
+from app.analysis_cache import AnalysisCoalescer, analysis_key
+from app.admission import AdmissionController
+from app.batch import BatchCoordinator, member_summary, aggregate_members, notify_batches
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+def make_report(score, repos):
+    return {
+        "overall_score": {"score": score},
+        "avg_repo_docs_score": {"score": 50},
+        "avg_code_hygiene_score": {"score": 60},
+        "details": {"core_stack": ["Python"], "repositories": repos}
+    }
+
+def make_repo(name, language="Python", maturity="Production-Grade"):
+    return {
+        "name": name, "html_url": f"https://github.com/acme/{name}", "language": language,
+        "dependencies": ["flask"], "maturity_label": maturity, "updated_at": "2024-01-01T00:00:00",
+        "readme_content": "not kept"
+    }
+
+class TestBatchAggregate(unittest.TestCase):
+    def test_member_summary_is_compact(self):
+        summary = member_summary("dev", "job-1", make_report(70, [make_repo("api")]))
+        self.assertEqual(summary["overall_score"], 70)
+        self.assertEqual(summary["status_url"], "/api/status/job-1")
+        self.assertNotIn("readme_content", summary["repositories"][0])
+
+    def test_shared_repositories_count_once(self):
+        shared = make_repo("platform")
+        members = [
+            member_summary("a", "j1", make_report(80, [shared, make_repo("a-tool", "Go", "Hobby")])),
+            member_summary("b", "j2", make_report(60, [shared])),
+            {"username": "c", "job_id": "j3", "status": "failed", "error": "not found"},
+            {"username": "d", "status": "pending"}
+        ]
+        aggregate = aggregate_members(members)
+        self.assertEqual(aggregate["members_analyzed"], 2)
+        self.assertEqual(aggregate["members_failed"], 1)
+        self.assertEqual(aggregate["repositories"], 2)
+        self.assertEqual(aggregate["avg_overall_score"], 70)
+        self.assertEqual(aggregate["top_languages"][0], {"language": "Python", "repositories": 1})
+        self.assertIn("Go", aggregate["tech_stack"]["experimentation"])
+
+    def test_empty_batch(self):
+        self.assertEqual(aggregate_members([])["avg_overall_score"], 0)
+
+class StubJobStore:
+    """Job statuses, reports and errors set by the test instead of read from RQ."""
+    def __init__(self):
+        self.statuses, self.reports, self.errors = {}, {}, {}
+
+    def get_status(self, job_id):
+        return self.statuses.get(job_id, "unknown")
+
+    def get_snapshot(self, job_id, include_result=False):
+        return SimpleNamespace(status=self.get_status(job_id))
+
+    def get_result(self, job_id, snapshot=None):
+        return self.reports.get(job_id)
+
+    def get_error(self, job_id, snapshot=None):
+        return self.errors.get(job_id)
+
+@unittest.skipUnless(fakeredis, "fakeredis is not installed")
+class TestBatchCoordinator(unittest.TestCase):
+    def setUp(self):
+        redis_client.reset_connection()
+        redis_client._connection = fakeredis.FakeStrictRedis()
+        self.jobs = StubJobStore()
+        self.remaining_calls = None
+        self.patches = [
+            mock.patch.dict(os.environ, {"BATCH_MAX_INFLIGHT": "2", "BATCH_CALLS_PER_ANALYSIS": "100"}),
+            mock.patch("app.batch.enqueue_analysis", self.enqueue)
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        redis_client.reset_connection()
+
+    def enqueue(self, username, *args, **kwargs):
+        job_id = f"job-{username}"
+        self.jobs.statuses[job_id] = "queued"
+        return job_id
+
+    def budget(self):
+        return self.remaining_calls, time.time() + 3600
+
+    def coordinator(self):
+        return BatchCoordinator(self.jobs, AnalysisCoalescer(self.jobs),
+                                github_budget=self.budget if self.remaining_calls is not None else None)
+
+    def started(self):
+        return sorted(j for j in self.jobs.statuses if j.startswith("job-"))
+
+    def settle(self, coordinator, username, error=None):
+        job_id = f"job-{username}"
+        report = None if error else make_report(80, [make_repo(f"{username}-api")])
+        self.jobs.statuses[job_id] = "failed" if error else "finished"
+        notify_batches(job_id, report=report, error=error, coordinator=coordinator)
+
+    def test_members_start_as_others_settle(self):
+        coordinator = self.coordinator()
+        batch_id = coordinator.create(["a", "b", "c", "d"])
+        self.assertEqual(self.started(), ["job-a", "job-b"])
+
+        self.settle(coordinator, "a")
+        self.assertEqual(self.started(), ["job-a", "job-b", "job-c"])
+        self.settle(coordinator, "b", error="Traceback\nValueError: user not found")
+        self.assertEqual(self.started(), ["job-a", "job-b", "job-c", "job-d"])
+
+        state = coordinator.state(batch_id)
+        self.assertEqual(state["status"], "running")
+        self.assertEqual(state["counts"], {"pending": 0, "running": 2, "finished": 1, "failed": 1})
+        self.assertEqual(state["members"][1]["error"], "ValueError: user not found")
+
+        self.settle(coordinator, "c")
+        self.settle(coordinator, "d")
+        state = coordinator.state(batch_id)
+        self.assertEqual(state["status"], "finished")
+        self.assertEqual(state["aggregate"]["members_analyzed"], 3)
+        self.assertEqual(state["aggregate"]["members_failed"], 1)
+
+    def test_notify_during_another_advance_is_not_lost(self):
+        reader = self.coordinator()
+        batch_id = reader.create(["a", "b", "c"])
+        original, notified = reader._advance_locked, []
+
+        def advance_then_notify(batch_id):
+            original(batch_id)
+            if not notified:
+                # The worker reports a finished member while this status read holds the lock
+                notified.append(True)
+                self.settle(self.coordinator(), "a")
+                self.assertEqual(self.started(), ["job-a", "job-b"])
+
+        with mock.patch.object(reader, "_advance_locked", advance_then_notify):
+            reader.advance(batch_id)
+        self.assertEqual(self.started(), ["job-a", "job-b", "job-c"])
+
+    def test_members_take_client_quota_slots(self):
+        with mock.patch.dict(os.environ, {"ADMISSION_CLIENT_MAX_INFLIGHT": "2"}):
+            admission = AdmissionController(self.jobs)
+        coordinator = BatchCoordinator(self.jobs, AnalysisCoalescer(self.jobs), admission=admission)
+        coordinator.max_inflight = 10
+        admission.register("client", "job-solo") # An analysis the client started on its own
+        self.jobs.statuses["job-solo"] = "started"
+
+        batch_id = coordinator.create(["a", "b", "c"], client_id="client")
+        self.assertEqual(self.started(), ["job-a", "job-solo"])
+        self.assertEqual(sorted(admission.client_inflight("client")), ["job-a", "job-solo"])
+
+        self.settle(coordinator, "a")
+        self.assertEqual(sorted(admission.client_inflight("client")), ["job-b", "job-solo"])
+        self.jobs.statuses["job-solo"] = "finished"
+        coordinator.advance(batch_id)
+        self.assertEqual(sorted(admission.client_inflight("client")), ["job-b", "job-c"])
+
+        self.settle(coordinator, "b")
+        self.settle(coordinator, "c")
+        self.assertEqual(admission.client_inflight("client"), [])
+        self.assertEqual(coordinator.state(batch_id)["status"], "finished")
+
+    def test_budget_limits_members_and_slots_are_released(self):
+        self.remaining_calls = 250 # Covers two analyses
+        coordinator = self.coordinator()
+        coordinator.max_inflight = 10
+        batch_id = coordinator.create(["a", "b", "c", "d"])
+        self.assertEqual(self.started(), ["job-a", "job-b"])
+
+        self.settle(coordinator, "a", error="boom")
+        self.assertEqual(self.started(), ["job-a", "job-b", "job-c"])
+        self.settle(coordinator, "b")
+        self.settle(coordinator, "c")
+        self.assertEqual(self.started(), ["job-a", "job-b", "job-c", "job-d"])
+        self.settle(coordinator, "d")
+        self.assertEqual(coordinator.state(batch_id)["status"], "finished")
+
+    def test_low_budget_keeps_one_member_moving(self):
+        self.remaining_calls = 50
+        coordinator = self.coordinator()
+        coordinator.create(["a", "b"])
+        self.assertEqual(self.started(), ["job-a"])
+
+    def test_exhausted_budget_starts_nothing(self):
+        self.remaining_calls = 0
+        coordinator = self.coordinator()
+        batch_id = coordinator.create(["a", "b"])
+        self.assertEqual(self.started(), [])
+        self.assertEqual(coordinator.state(batch_id)["counts"]["pending"], 2)
+
+    def test_cached_members_do_not_take_a_slot(self):
+        coordinator = self.coordinator()
+        coordinator.coalescer.mark_finished(analysis_key("a", "llama3", {}), "cached-a")
+        self.jobs.statuses["cached-a"] = "finished"
+        self.jobs.reports["cached-a"] = make_report(90, [])
+        batch_id = coordinator.create(["a", "b", "c"])
+        self.assertEqual(self.started(), ["job-b", "job-c"])
+        self.assertEqual(coordinator.state(batch_id)["members"][0]["job_id"], "cached-a")
+
+if __name__ == "__main__":
+    unittest.main()
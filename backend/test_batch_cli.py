@@ -0,0 +1,51 @@
+import io
+import os
+import json
+import tempfile
+import unittest
+from app.services.analysis_service import AnalysisService
+from batch_cli import read_usernames, completed_usernames, run_batch
+from test_pipeline import ShuffledProvider, StaticLLM
+
+class FailingProvider(ShuffledProvider):
+    def stream_user_profile(self, username: str, deadline=None):
+        if username == "ghost":
+            raise ValueError("GitHub user 'ghost' not found.")
+        return super().stream_user_profile(username, deadline)
+
+class TestBatchCli(unittest.TestCase):
+    def setUp(self):
+        self.service = AnalysisService(FailingProvider(), StaticLLM())
+
+    def test_read_usernames_skips_comments(self):
+        self.assertEqual(list(read_usernames(["alice\n", "\n", "# team\n", "bob  # lead\n"])), ["alice", "bob"])
+
+    def test_writes_one_line_per_user(self):
+        output = io.StringIO()
+        counts = run_batch(["alice", "ghost", "Alice", "bob"], output, self.service, concurrency=2, log=io.StringIO())
+        records = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual(counts, {"ok": 2, "error": 1, "skipped": 1}) # "Alice" duplicates "alice"
+        self.assertEqual(sorted(r["username"] for r in records), ["alice", "bob", "ghost"])
+        ok = next(r for r in records if r["username"] == "alice")
+        self.assertEqual(ok["report"]["username"], "alice")
+        self.assertIn("not found", next(r for r in records if r["status"] == "error")["error"])
+
+    def test_resume_skips_completed_users(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "out.jsonl")
+            with open(path, "w") as f:
+                f.write(json.dumps({"username": "Alice", "status": "ok"}) + "\n")
+                f.write(json.dumps({"username": "ghost", "status": "error"}) + "\n")
+                f.write('{"username": "bo') # Interrupted mid-line
+            self.assertEqual(completed_usernames(path), {"alice"})
+            self.assertEqual(completed_usernames(path, retry_failed=False), {"alice", "ghost"})
+
+            output = io.StringIO()
+            counts = run_batch(["alice", "bob", "ghost"], output, self.service, skip=completed_usernames(path),
+                               skip_llm=True, log=io.StringIO())
+            self.assertEqual(counts, {"ok": 1, "error": 1, "skipped": 1})
+            records = {r["username"]: r for r in map(json.loads, output.getvalue().splitlines())}
+            self.assertEqual(records["bob"]["report"]["overall_score"]["level"], "Estimated")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import os
+import tempfile
+import unittest
+from app.history_store import SQLiteHistoryStore
+from app.columnar_export import export_history, iter_parts, read_column_part, load_manifest
+
+def make_record(analysis_id, username, created_at, overall):
+    repo = {
+        "name": "api", "html_url": f"https://github.com/{username}/api", "language": "Python",
+        "maturity_label": "Hobby", "maturity_score": {"score": 40}, "has_ci": True,
+        "dependencies": ["flask", "redis"], "commit_frequency": 1.5, "description": None
+    }
+    report = {"username": username, "overall_score": {"score": overall, "level": "AI Generated"},
+              "details": {"followers": 3, "repositories": [repo]}}
+    return {"analysis_id": analysis_id, "model": "llama3", "created_at": created_at, "report": report}
+
+def column(directory, table, name):
+    values = []
+    for part in iter_parts(directory, table):
+        values.extend(list(read_column_part(part, table)[name]))
+    return values
+
+class TestColumnarExport(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = SQLiteHistoryStore(os.path.join(self.tmp.name, "history.db"))
+        self.out = os.path.join(self.tmp.name, "export")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_incremental_export_appends_parts(self):
+        self.store.save_many([make_record("a1", "Dev", 1.0, 60), make_record("a2", "ops", 2.0, 80)])
+        counts = export_history(self.store, self.out, fmt="columnar", chunk_size=1)
+        self.assertEqual(counts, {"analyses": 2, "repositories": 2, "dependencies": 4})
+
+        self.assertEqual(export_history(self.store, self.out)["analyses"], 0) # Nothing new
+        self.store.save_many([make_record("a3", "dev", 3.0, 70)])
+        self.assertEqual(export_history(self.store, self.out)["analyses"], 1)
+
+        manifest = load_manifest(self.out)
+        self.assertEqual((manifest["parts"], manifest["rows"]["analyses"]), (2, 3))
+        self.assertEqual(column(self.out, "analyses", "username"), ["dev", "ops", "dev"])
+        self.assertEqual([int(v) for v in column(self.out, "analyses", "overall_score")], [60, 80, 70])
+        self.assertEqual(column(self.out, "dependencies", "dependency")[:2], ["flask", "redis"])
+        self.assertEqual([bool(v) for v in column(self.out, "repositories", "has_ci")], [True] * 3)
+
+    def test_full_export_starts_over(self):
+        self.store.save_many([make_record("a1", "dev", 1.0, 60)])
+        export_history(self.store, self.out, fmt="columnar")
+        export_history(self.store, self.out, fmt="columnar", full=True)
+        self.assertEqual(load_manifest(self.out)["rows"]["analyses"], 1)
+        self.assertEqual(len(list(iter_parts(self.out, "analyses"))), 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,36 @@
+import pickle
+import unittest
+from app.models.file_tree import FileTree
+from app.services.collectors import StructureCollector
+
+class TestFileTree(unittest.TestCase):
+    def setUp(self):
+        self.paths = [
+            "README.md", "src", "src/app", "src/app/main.py", "src/app/tests/test_main.py",
+            ".github/workflows/ci.yml", "deploy/Dockerfile", "src/app/main.py.bak", "LICENSE"
+        ]
+
+    def test_round_trip_preserves_order(self):
+        tree = FileTree.from_paths(self.paths)
+        self.assertEqual(tree.to_list(), self.paths)
+        self.assertEqual(len(tree), len(self.paths))
+        self.assertEqual(FileTree.from_compact(tree.to_compact()), self.paths)
+        self.assertEqual(pickle.loads(pickle.dumps(tree)), tree)
+
+    def test_segments_are_interned_once(self):
+        tree = FileTree.from_paths([f"src/app/module_{i}.py" for i in range(100)])
+        self.assertEqual(tree.segments.count("src"), 1)
+        self.assertEqual(len(tree.segments), 102)
+
+    def test_membership_and_root_names(self):
+        tree = FileTree.from_paths(self.paths)
+        self.assertIn("src/app/main.py", tree)
+        self.assertNotIn("main.py", tree)
+        self.assertEqual(tree.root_names(), ["README.md", "src", "LICENSE"])
+
+    def test_structure_collector_accepts_tree(self):
+        collector = StructureCollector()
+        self.assertEqual(collector.analyze(FileTree.from_paths(self.paths)), collector.analyze(self.paths))
+
+if __name__ == "__main__":
+    unittest.main()
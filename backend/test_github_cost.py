@@ -0,0 +1,106 @@
+import unittest
+import concurrent.futures
+from types import SimpleNamespace
+from requests.structures import CaseInsensitiveDict
+from app.services import github_metering
+from app.services.github_provider import GithubProvider
+
+class StubSession:
+    def __init__(self, status=200, body=b"{}", remaining=4999):
+        self.status, self.body, self.remaining = status, body, remaining
+
+    def get(self, url, **kwargs):
+        headers = CaseInsensitiveDict({
+            "content-length": str(len(self.body)),
+            "x-ratelimit-remaining": str(self.remaining),
+            "x-ratelimit-resource": "core"
+        })
+        return SimpleNamespace(status_code=self.status, headers=headers, content=self.body, text="")
+
+def send(path, session):
+    connection = github_metering.MeteredHTTPSConnection("api.github.com")
+    connection.session = session
+    connection.request("GET", path, None, {})
+    return connection.getresponse()
+
+class FakeRepo:
+    name = "svc"
+    default_branch = "main"
+    description = None
+    language = "Python"
+    stargazers_count = 0
+    forks_count = 0
+    html_url = "https://github.com/u/svc"
+    updated_at = SimpleNamespace(isoformat=lambda: "2024-01-01T00:00:00")
+
+    def __init__(self):
+        self.called = []
+
+    def get_git_tree(self, ref, recursive=False):
+        self.called.append("tree")
+        return SimpleNamespace(tree=[SimpleNamespace(path="README.md")])
+
+    def get_readme(self):
+        self.called.append("readme")
+        raise LookupError("no readme")
+
+    def get_commits(self):
+        self.called.append("commits")
+        return []
+
+    def get_topics(self):
+        self.called.append("topics")
+        return ["api"]
+
+class TestGithubCost(unittest.TestCase):
+    def test_endpoint_pattern(self):
+        self.assertEqual(github_metering.endpoint_pattern("/repos/a/b/git/trees/main"), "/repos/:owner/:repo/git/trees")
+        self.assertEqual(github_metering.endpoint_pattern("/repos/a/b/contents/go.mod"), "/repos/:owner/:repo/contents")
+        self.assertEqual(github_metering.endpoint_pattern("/repos/a/b"), "/repos/:owner/:repo")
+        self.assertEqual(github_metering.endpoint_pattern("/users/a/repos"), "/users/:user/repos")
+        self.assertEqual(github_metering.endpoint_pattern("/rate_limit"), "/rate_limit")
+
+    def test_requests_are_attributed_to_the_job_and_repository(self):
+        with github_metering.track() as ledger:
+            send("/users/alice", StubSession(body=b"x" * 10))
+            with github_metering.attribute("svc"):
+                send("/repos/alice/svc/topics", StubSession(body=b"x" * 5, remaining=4990))
+                send("/repos/alice/svc/topics", StubSession(status=304, body=b""))
+        send("/users/bob", StubSession()) # Outside the job
+        cost = ledger.to_dict()
+        self.assertEqual(cost["calls"], 3)
+        self.assertEqual(cost["bytes"], 15)
+        self.assertEqual(cost["rate_limit_points"], 2) # 304s are free
+        self.assertEqual(cost["rate_limit_remaining"], 4990)
+        self.assertEqual(cost["repositories"]["profile"]["calls"], 1)
+        self.assertEqual(cost["repositories"]["svc"], {"calls": 2, "bytes": 5, "cache_hit": 0})
+        self.assertEqual(cost["endpoints"]["/repos/:owner/:repo/topics"], 2)
+
+    def test_bind_carries_the_ledger_into_pool_threads(self):
+        with github_metering.track() as ledger, concurrent.futures.ThreadPoolExecutor(2) as pool:
+            list(pool.map(lambda fn: fn(), [github_metering.bind(lambda: send("/users/a", StubSession()))] * 3))
+        self.assertEqual(ledger.calls, 3)
+
+    def test_budget_skips_commits_and_topics(self):
+        provider = GithubProvider()
+        with github_metering.track(budget=1) as ledger:
+            with github_metering.attribute("svc"):
+                send("/users/alice", StubSession())
+            repo = FakeRepo()
+            data = provider._process_single_repo(repo)
+        self.assertEqual(repo.called, ["tree", "readme"])
+        self.assertEqual(data.topics, [])
+        self.assertEqual(ledger.skipped, ["svc:commits", "svc:topics"])
+        self.assertTrue(ledger.skipped_in("svc"))
+        self.assertFalse(ledger.skipped_in("other"))
+
+    def test_without_budget_everything_is_fetched(self):
+        repo = FakeRepo()
+        with github_metering.track() as ledger:
+            data = GithubProvider()._process_single_repo(repo)
+        self.assertEqual(repo.called, ["tree", "readme", "commits", "topics"])
+        self.assertEqual(data.topics, ["api"])
+        self.assertFalse(ledger.degraded)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,5 @@
 import unittest
-from app.models.dtos import ScoreDetail, Repository
+from app.models.dtos import ScoreDetail, Repository, trusted, dump_model
 from app.services.insight_engine import ProfileReadmeAnalyzer, RepoDocumentationAnalyzer, CommitHygieneAnalyzer, MaturityAnalyzer
 
 class TestGranularScoring(unittest.TestCase):
@@ -11,6 +11,25 @@ class TestGranularScoring(unittest.TestCase):
         self.assertIn("Yes", detail.positives)
         self.assertIn("No", detail.negatives)
 
+    def test_trusted_construction_applies_fresh_defaults(self):
+        first = trusted(Repository, name="a", updated_at="2025-01-01T00:00:00Z", html_url="http://example.com")
+        second = trusted(Repository, name="b", updated_at="2025-01-01T00:00:00Z", html_url="http://example.com")
+        first.recommendations.append("Add tests")
+
+        self.assertEqual(second.recommendations, [])
+        self.assertEqual(first.maturity_score.level, "Hobby")
+        self.assertEqual(dump_model(first, include={"name"}), {"name": "a"})
+
+    def test_trusted_construction_matches_validated_model(self):
+        fields = dict(name="a", updated_at="2025-01-01T00:00:00Z", html_url="http://example.com", topics=["api"],
+                      maturity_score={"score": 40, "level": "Prototype"})
+        built = trusted(Repository, **dict(fields))
+        self.assertEqual(built, Repository(**fields))
+        self.assertIsInstance(built.maturity_score, ScoreDetail)
+        self.assertEqual(built.maturity_score.positives, [])
+        with self.assertRaises(TypeError):
+            trusted(ScoreDetail, score=1)
+
     def test_profile_readme_analyzer(self):
         analyzer = ProfileReadmeAnalyzer()
         content = "# About Me\nHi.\n# Tech Stack\nPython."
@@ -0,0 +1,67 @@
+import os
+import time
+import tempfile
+import unittest
+from app.history_store import SQLiteHistoryStore, HistoryWriter
+
+def make_report(username, overall, repos):
+    return {
+        "username": username,
+        "overall_score": {"score": overall},
+        "profile_score": {"score": 50},
+        "details": {"repositories": repos}
+    }
+
+def make_repo(name, maturity, label="Hobby"):
+    return {
+        "name": name, "html_url": f"https://github.com/dev/{name}", "language": "Python",
+        "maturity_label": label, "maturity_score": {"score": maturity},
+        "repo_documentation_score": {"score": 40}, "code_hygiene_score": {"score": 60}
+    }
+
+class TestHistoryStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = SQLiteHistoryStore(os.path.join(self.tmp.name, "history.db"))
+        self.store.save_many([
+            {"analysis_id": "a1", "model": "llama3", "created_at": 100.0,
+             "report": make_report("Dev", 60, [make_repo("api", 50), make_repo("old", 30)])},
+            {"analysis_id": "a2", "model": "llama3", "created_at": 200.0,
+             "report": make_report("dev", 72, [make_repo("api", 70, "Production-Grade"), make_repo("new", 40)])}
+        ])
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_latest_returns_full_report(self):
+        latest = self.store.latest("DEV")
+        self.assertEqual(latest["analysis_id"], "a2")
+        self.assertEqual(latest["overall_score"], 72)
+        self.assertEqual(latest["report"]["details"]["repositories"][1]["name"], "new")
+        self.assertIsNone(self.store.latest("nobody"))
+
+    def test_trend_is_oldest_first(self):
+        trend = self.store.trend("dev")
+        self.assertEqual([t["overall_score"] for t in trend], [60, 72])
+        self.assertEqual([t["analysis_id"] for t in self.store.trend("dev", since=150)], ["a2"])
+        self.assertEqual([t["analysis_id"] for t in self.store.trend("dev", limit=1)], ["a2"])
+
+    def test_delta_between_last_two(self):
+        delta = self.store.delta("dev")
+        self.assertEqual(delta["scores"], {"overall_score": 12})
+        self.assertEqual(delta["repositories"]["added"], ["new"])
+        self.assertEqual(delta["repositories"]["removed"], ["old"])
+        changed = delta["repositories"]["changed"][0]
+        self.assertEqual(changed["changes"], {"maturity_score": 20, "maturity_label": "Production-Grade"})
+        self.assertIsNone(self.store.delta("dev", "a1", "missing"))
+
+    def test_writer_batches_and_flushes_on_close(self):
+        writer = HistoryWriter(self.store, batch_size=10, flush_seconds=5)
+        writer.submit("a3", "llama3", make_report("dev", 80, []))
+        writer.submit("a4", "llama3", make_report("other", 10, []))
+        writer.close()
+        self.assertEqual(self.store.latest("dev")["analysis_id"], "a3")
+        self.assertEqual(self.store.latest("other")["overall_score"], 10)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,22 @@
+import gzip
+import unittest
+from werkzeug.datastructures import Accept
+from app.http_encoding import MIN_COMPRESS_BYTES, compress_body, pick_encoding
+
+class TestHttpEncoding(unittest.TestCase):
+    def test_small_bodies_are_not_compressed(self):
+        accept = Accept([("gzip", 1)])
+        self.assertIsNone(pick_encoding(accept, MIN_COMPRESS_BYTES - 1))
+        self.assertEqual(pick_encoding(accept, MIN_COMPRESS_BYTES), "gzip")
+
+    def test_respects_accept_encoding(self):
+        self.assertIsNone(pick_encoding(Accept([("identity", 1)]), 10_000))
+        self.assertIsNone(pick_encoding(Accept([]), 10_000))
+
+    def test_gzip_round_trip(self):
+        body = b'{"result":' + b'"x",' * 1000 + b'null}'
+        self.assertEqual(gzip.decompress(compress_body(body, "gzip")), body)
+        self.assertIs(compress_body(body, None), body)
+
+if __name__ == "__main__":
+    unittest.main()
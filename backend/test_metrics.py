@@ -0,0 +1,74 @@
+import unittest
+from unittest import mock
+from app import metrics, redis_client
+from app.services import github_metering
+
+class TestMetrics(unittest.TestCase):
+    def test_series_sorts_labels(self):
+        self.assertEqual(metrics._series("m", {}), "m")
+        self.assertEqual(metrics._series("m", {"b": 2, "a": "x"}), 'm{a="x",b="2"}')
+
+    def test_label_values_are_escaped(self):
+        series = metrics._series("llm_prompt_chars_bucket", {"model": 'a"b,c\\d\ne', "le": "1000"})
+        self.assertEqual(series, 'llm_prompt_chars_bucket{le="1000",model="a\\"b,c\\\\d\\ne"}')
+        lines = dict(metrics._cumulative_buckets("llm_prompt_chars", {series: 2}))
+        self.assertEqual(lines['llm_prompt_chars_bucket{model="a\\"b,c\\\\d\\ne",le="+Inf"}'], 2)
+
+    def test_observe_buckets_and_cumulative_render(self):
+        buffer = metrics.MetricsBuffer(flush_seconds=3600)
+        buffer.enabled = True
+        for value in (0.2, 3, 3, 900):
+            buffer.observe("analysis_stage_duration_seconds", value, stage="fetch")
+        buckets = {k: v for k, v in buffer._values.items() if "_bucket" in k}
+        self.assertEqual(buckets['analysis_stage_duration_seconds_bucket{le="5",stage="fetch"}'], 2)
+        self.assertEqual(buckets['analysis_stage_duration_seconds_bucket{le="+Inf",stage="fetch"}'], 1)
+        self.assertEqual(buffer._values['analysis_stage_duration_seconds_count{stage="fetch"}'], 4)
+
+        lines = dict(metrics._cumulative_buckets("analysis_stage_duration_seconds", buckets))
+        self.assertEqual(lines['analysis_stage_duration_seconds_bucket{stage="fetch",le="0.5"}'], 1)
+        self.assertEqual(lines['analysis_stage_duration_seconds_bucket{stage="fetch",le="2.5"}'], 1)
+        self.assertEqual(lines['analysis_stage_duration_seconds_bucket{stage="fetch",le="5"}'], 3)
+        self.assertEqual(lines['analysis_stage_duration_seconds_bucket{stage="fetch",le="+Inf"}'], 4)
+
+    def test_disabled_buffer_records_nothing(self):
+        buffer = metrics.MetricsBuffer(flush_seconds=3600)
+        buffer.enabled = False
+        buffer.inc("analysis_requests_total", source="new")
+        self.assertEqual(buffer._values, {})
+
+    def test_metric_name_strips_histogram_suffixes(self):
+        self.assertEqual(metrics._metric_name('llm_prompt_chars_sum{model="x"}'), "llm_prompt_chars")
+        self.assertEqual(metrics._metric_name('analysis_requests_total{source="new"}'), "analysis_requests_total")
+
+    def test_exit_flush_only_writes_pending_updates_over_an_open_connection(self):
+        buffer = metrics.MetricsBuffer(flush_seconds=3600)
+        buffer.enabled = True
+        with mock.patch.object(buffer, "flush") as flush, mock.patch.object(redis_client, "_connection", object()):
+            metrics._flush_at_exit(buffer)
+            flush.assert_not_called()
+            buffer.inc("analysis_requests_total", source="new")
+            metrics._flush_at_exit(buffer)
+            flush.assert_called_once()
+        with mock.patch.object(buffer, "flush") as flush, mock.patch.object(redis_client, "_connection", None):
+            metrics._flush_at_exit(buffer)
+            flush.assert_not_called()
+
+class TestGithubMetering(unittest.TestCase):
+    def test_listener_records_status_bytes_and_rate_limit(self):
+        request = {"verb": "GET", "path": "/users/x", "status": 200, "bytes": 512, "seconds": 0.1,
+                   "rate_remaining": 4990, "rate_used": 10, "rate_reset": 1700000000, "rate_resource": "core"}
+        with mock.patch.object(metrics, "inc") as inc, mock.patch.object(metrics, "set_gauge") as set_gauge:
+            github_metering._record_metrics(request)
+        inc.assert_any_call("github_requests_total", status="2xx")
+        inc.assert_any_call("github_response_bytes_total", 512)
+        set_gauge.assert_any_call("github_rate_limit_remaining", 4990)
+
+    def test_search_rate_limit_does_not_overwrite_core_gauge(self):
+        request = {"verb": "GET", "path": "/search/code", "status": 200, "bytes": 0, "seconds": 0.1,
+                   "rate_remaining": 9, "rate_used": 1, "rate_reset": 1, "rate_resource": "search"}
+        with mock.patch.object(metrics, "inc"), mock.patch.object(metrics, "set_gauge") as set_gauge:
+            github_metering._record_metrics(request)
+        set_gauge.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+from app.percentile_index import PercentileIndex, language_averages, SEEN_KEY
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+DAY = 86400
+
+def make_report(username, overall, repos=()):
+    return {
+        "username": username,
+        "overall_score": {"score": overall},
+        "profile_score": overall,
+        "details": {"repositories": [
+            {"language": language, "maturity_score": {"score": maturity}} for language, maturity in repos
+        ]}
+    }
+
+class TestPercentileIndex(unittest.TestCase):
+    def test_language_averages(self):
+        repos = [
+            {"language": "Python", "maturity_score": {"score": 40}, "code_hygiene_score": {"score": 70}},
+            {"language": "Python", "maturity_score": {"score": 81}},
+            {"language": None, "maturity_score": {"score": 99}}
+        ]
+        self.assertEqual(language_averages(repos), {"Python": {"maturity_score": 60.5, "code_hygiene_score": 70.0}})
+
+    def test_mid_rank_percentile(self):
+        self.assertEqual(PercentileIndex._percentile(10, 9, 1), 95.0)
+        self.assertEqual(PercentileIndex._percentile(4, 0, 4), 50.0)
+        self.assertIsNone(PercentileIndex._percentile(0, 0, 0))
+
+@unittest.skipUnless(fakeredis, "fakeredis is not installed")
+class TestPercentileIndexRedis(unittest.TestCase):
+    def setUp(self):
+        self.redis = fakeredis.FakeStrictRedis()
+        self.index = PercentileIndex(self.redis)
+        self.index.retention_seconds = 30 * DAY
+        self.now = 1_700_000_000.0
+
+    def record(self, report, days_ago=0):
+        self.index.record(report, now=self.now - days_ago * DAY)
+
+    def test_record_and_lookup(self):
+        for i, score in enumerate([10, 20, 30, 40]):
+            self.record(make_report(f"user{i}", score, [("Python", score)]))
+        self.record(make_report("Gopher", 90, [("Go", 50)]))
+
+        percentiles = self.index.lookup(make_report("user2", 30, [("Python", 30)]))
+        self.assertEqual(percentiles["population"], 5)
+        self.assertEqual(percentiles["scores"]["overall_score"], 50.0)
+        self.assertEqual(percentiles["languages"]["Python"], {"population": 4, "maturity_score": 62.5})
+
+    def test_reanalysis_replaces_entries(self):
+        self.record(make_report("Dev", 80, [("Python", 70), ("Go", 40)]))
+        self.record(make_report("other", 50, [("Go", 60)]))
+        # Re-analyzed: lower score, and the Go repositories are gone
+        self.record(make_report("dev", 20, [("Python", 65)]))
+
+        self.assertEqual(self.redis.zscore(PercentileIndex._key("overall_score"), "dev"), 20.0)
+        self.assertEqual(self.redis.zrange(PercentileIndex._key("maturity_score", "Go"), 0, -1), [b"other"])
+        self.assertEqual(self.redis.zcard(SEEN_KEY), 2)
+        go = self.index.lookup(make_report("other", 50, [("Go", 60)]))["languages"]["Go"]
+        self.assertEqual(go, {"population": 1, "maturity_score": 50.0})
+
+    def test_dropped_dimension_is_removed(self):
+        self.record(make_report("dev", 80))
+        report = make_report("dev", 70)
+        del report["profile_score"]
+        self.record(report)
+        self.assertIsNone(self.redis.zscore(PercentileIndex._key("profile_score"), "dev"))
+
+    def test_compact_drops_users_past_retention(self):
+        self.record(make_report("old", 10, [("Rust", 10)]), days_ago=40)
+        self.record(make_report("recent", 50, [("Rust", 50)]), days_ago=1)
+
+        self.assertEqual(self.index.compact(self.now), 1)
+        self.assertEqual(self.index.compact(self.now), 0)
+        self.assertEqual(self.redis.zrange(PercentileIndex._key("maturity_score", "Rust"), 0, -1), [b"recent"])
+        self.assertEqual(self.index.lookup(make_report("x", 30))["population"], 1)
+
+        # A compacted user who comes back is recorded from scratch
+        self.record(make_report("old", 60, [("Rust", 60)]))
+        self.assertEqual(self.redis.zcard(PercentileIndex._key("maturity_score", "Rust")), 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,250 @@
+import os
+import time
+import unittest
+from unittest import mock
+from types import SimpleNamespace
+from datetime import datetime, timedelta, timezone
+from app.core.interfaces import IGithubProvider, ILLMProvider, RepositoryStream
+from app.models.dtos import UserProfile, Repository
+from app.services.analysis_service import AnalysisService
+from app.services.github_provider import GithubProvider
+from app.stage_store import profile_to_payload, profile_from_payload
+from app.pipeline import stage_job_id, upstream_job_ids, downstream_job_ids, stage_fingerprints, inflight_ttl, \
+    STAGE_DEADLINES, DEADLINE_GRACE_SECONDS
+from app.cancellation import StageGuard, StageDeadlineExceeded
+
+def make_repo(i: int) -> Repository:
+    now = datetime.now(timezone.utc)
+    return Repository(
+        name=f"repo-{i}",
+        description="A sample repository used for pipeline tests" if i % 2 else None,
+        language="Python",
+        updated_at=(now - timedelta(days=i * 40)).isoformat(),
+        html_url=f"http://example.com/repo-{i}",
+        file_tree=["README.md", "tests/test_app.py", ".github/workflows/ci.yml"][: (i % 3) + 1],
+        dependency_files={"requirements.txt": "flask\nrequests\n"},
+        readme_content="# Usage\n```\nrun\n```" * (i + 1),
+        commit_history=[
+            {"date": (now - timedelta(days=d)).isoformat(), "message": f"feat: change number {d}"}
+            for d in range(0, i * 5 + 2, 2)
+        ]
+    )
+
+class ShuffledProvider(IGithubProvider):
+    """Returns repositories in reverse completion order to mimic as_completed."""
+    def get_user_profile(self, username: str) -> UserProfile:
+        repos = [make_repo(i) for i in range(6)]
+        return UserProfile(
+            username=username, public_repos=6, followers=1, following=1,
+            avatar_url="http://example.com/a.png", html_url="http://example.com",
+            readme_content="# About Me", repositories=repos
+        )
+
+    def stream_user_profile(self, username: str, deadline=None):
+        profile = self.get_user_profile(username)
+        repos = list(reversed(profile.repositories))
+        profile.repositories = []
+        return profile, RepositoryStream(iter(repos), len(repos))
+
+class StaticLLM(ILLMProvider):
+    def generate_analysis(self, context_data: str, timeout=None):
+        return {"profile_score": 50, "repo_quality_score": 50, "overall_score": 50, "summary": "ok", "suggestions": []}
+
+class TestPipelinedAnalysis(unittest.TestCase):
+    def test_pipelined_matches_sequential(self):
+        pipelined = AnalysisService(ShuffledProvider(), StaticLLM(), pipelined=True).analyze_user("dev")
+        sequential = AnalysisService(ShuffledProvider(), StaticLLM(), pipelined=False).analyze_user("dev")
+
+        self.assertEqual(pipelined.avg_code_hygiene_score.score, sequential.avg_code_hygiene_score.score)
+        self.assertEqual(pipelined.avg_repo_docs_score.score, sequential.avg_repo_docs_score.score)
+        self.assertEqual(
+            [r["name"] for r in pipelined.details["repositories"]],
+            [r["name"] for r in sequential.details["repositories"]]
+        )
+        self.assertEqual(
+            [r["maturity_score"] for r in pipelined.details["repositories"]],
+            [r["maturity_score"] for r in sequential.details["repositories"]]
+        )
+
+    def test_pipeline_timings_reported(self):
+        report = AnalysisService(ShuffledProvider(), StaticLLM(), pipelined=True).analyze_user("dev")
+        timings = report.details["pipeline"]
+        self.assertEqual(timings["mode"], "pipelined")
+        self.assertGreaterEqual(timings["max_overlap_seconds"], 0.0)
+        self.assertLessEqual(timings["max_overlap_seconds"], timings["scoring_seconds"])
+
+        sequential = AnalysisService(ShuffledProvider(), StaticLLM(), pipelined=False).analyze_user("dev")
+        self.assertEqual(sequential.details["pipeline"]["max_overlap_seconds"], 0.0)
+
+    def test_report_excludes_raw_repository_data(self):
+        received = []
+        report = AnalysisService(ShuffledProvider(), StaticLLM()).analyze_user("dev", repository_sink=received.extend)
+
+        summary = report.details["repositories"][0]
+        self.assertNotIn("file_tree", summary)
+        self.assertNotIn("readme_content", summary)
+        self.assertIn("maturity_score", summary)
+        self.assertEqual(len(received), 6)
+        self.assertTrue(received[0].readme_content)
+
+    def test_progress_phases(self):
+        events = []
+        AnalysisService(ShuffledProvider(), StaticLLM()).analyze_user("dev", progress=lambda phase, **data: events.append((phase, data)))
+
+        phases = [phase for phase, _ in events]
+        self.assertEqual(phases[0], "fetching")
+        self.assertEqual(phases[-2:], ["llm", "finalizing"])
+        self.assertIn(("fetching", {"done": 6, "total": 6}), events)
+
+    def test_staged_matches_single_job(self):
+        # fetch -> (serialize) -> score -> summarize -> build_report, as the stage jobs do
+        service = AnalysisService(ShuffledProvider(), StaticLLM())
+        fetched = profile_from_payload(profile_to_payload(service.fetch_profile("dev")))
+        service.score_repositories(fetched.repositories)
+        summary = service.summarize(fetched)
+        staged = service.build_report(summary, StaticLLM().generate_analysis(summary["context"]))
+
+        single = AnalysisService(ShuffledProvider(), StaticLLM()).analyze_user("dev")
+        self.assertEqual(staged.avg_code_hygiene_score, single.avg_code_hygiene_score)
+        self.assertEqual(staged.avg_repo_docs_score, single.avg_repo_docs_score)
+        strip = lambda repos: [{k: v for k, v in r.items() if k != "updated_at"} for r in repos]
+        self.assertEqual(strip(staged.details["repositories"]), strip(single.details["repositories"]))
+
+    def test_stage_job_ids(self):
+        self.assertEqual(stage_job_id("abc", "llm"), "abc")
+        self.assertEqual(upstream_job_ids("abc"), ["abc-fetch", "abc-score"])
+        self.assertEqual(downstream_job_ids("abc", "fetch"), ["abc-score", "abc"])
+
+    def test_inflight_ttl_outlasts_staged_analysis(self):
+        with mock.patch.dict(os.environ, {}, clear=False):
+            os.environ.pop("ANALYSIS_INFLIGHT_TTL", None)
+            hard_stops = sum(STAGE_DEADLINES.values()) + len(STAGE_DEADLINES) * DEADLINE_GRACE_SECONDS
+            self.assertGreater(inflight_ttl(), hard_stops)
+        with mock.patch.dict(os.environ, {"ANALYSIS_INFLIGHT_TTL": "900"}):
+            self.assertEqual(inflight_ttl(), 900)
+
+    def test_stage_fingerprints(self):
+        self.assertEqual(stage_fingerprints("Dev"), stage_fingerprints("dev"))
+        self.assertNotEqual(stage_fingerprints("dev")["fetch"], stage_fingerprints("other")["fetch"])
+        self.assertNotEqual(stage_fingerprints("dev")["fetch"], stage_fingerprints("dev")["score"])
+
+    def test_stage_guard_deadline(self):
+        guard = StageGuard(None, "fetch", deadline_seconds=0)
+        events = []
+        progress = guard.wrap(lambda phase, **data: events.append(phase))
+        with self.assertRaises(StageDeadlineExceeded):
+            progress("fetching", done=1, total=2)
+        self.assertEqual(events, [])
+        StageGuard(None, "score").wrap(lambda phase, **data: events.append(phase))("scoring")
+        self.assertEqual(events, ["scoring"])
+
+    def test_closing_stream_stops_fetching(self):
+        closed = []
+        def repos():
+            try:
+                for i in range(5):
+                    yield make_repo(i)
+            finally:
+                closed.append(True)
+        class Provider(ShuffledProvider):
+            def stream_user_profile(self, username):
+                profile = self.get_user_profile(username)
+                profile.repositories = []
+                return profile, RepositoryStream(repos(), 5)
+        def progress(phase, done=0, **data):
+            if done == 2:
+                raise StageDeadlineExceeded("deadline")
+        with self.assertRaises(StageDeadlineExceeded):
+            AnalysisService(Provider(), StaticLLM()).fetch_profile("dev", progress=progress)
+        self.assertEqual(closed, [True])
+
+    def test_deadline_returns_partial_report(self):
+        class SlowProvider(ShuffledProvider):
+            def stream_user_profile(self, username, deadline=None):
+                profile, stream = super().stream_user_profile(username)
+                def slow():
+                    for repo in stream:
+                        time.sleep(0.1)
+                        yield repo
+                return profile, RepositoryStream(slow(), stream.total)
+
+        report = AnalysisService(SlowProvider(), StaticLLM()).analyze_user("dev", deadline=time.time() + 1.35)
+        coverage = report.details["coverage"]
+        self.assertTrue(coverage["partial"])
+        self.assertEqual(coverage["repos_requested"], 6)
+        self.assertLess(coverage["repos_analyzed"], 6)
+        self.assertEqual(coverage["repos_analyzed"], len(report.details["repositories"]))
+        self.assertEqual(coverage["stages_skipped"], ["llm"])
+        self.assertEqual(report.overall_score.level, "Estimated")
+
+    def test_full_run_reports_complete_coverage(self):
+        report = AnalysisService(ShuffledProvider(), StaticLLM()).analyze_user("dev")
+        self.assertEqual(report.details["coverage"], {
+            "partial": False, "repos_analyzed": 6, "repos_requested": 6, "stages_skipped": []
+        })
+
+    def test_missed_readme_is_not_scored(self):
+        service = AnalysisService(ShuffledProvider(), StaticLLM())
+        profile = service.fetch_profile("dev")
+        service.score_repositories(profile.repositories)
+        coverage = {"partial": True, "repos_analyzed": 6, "repos_requested": 6, "stages_skipped": ["profile_readme"]}
+        summary = service.summarize(profile, coverage)
+        self.assertEqual(summary["personal_readme_score"]["level"], "Not analyzed")
+        self.assertIn("PARTIAL DATA", summary["context"])
+        estimate = service.estimate_llm_result(summary)
+        docs, hygiene = summary["avg_repo_docs_score"]["score"], summary["avg_code_hygiene_score"]["score"]
+        self.assertEqual(estimate["overall_score"], round((docs + hygiene) / 2))
+
+    def test_github_stream_stops_at_deadline(self):
+        provider = GithubProvider.__new__(GithubProvider)
+        provider.max_workers = 4
+        provider._fetch_repository = lambda delay: time.sleep(delay) or delay
+        provider._fetch_profile_readme = lambda user, username: time.sleep(0.5) or "# Hi"
+        profile = SimpleNamespace(username="dev", readme_content=None)
+        skipped = []
+        fetched = list(provider._iter_repositories([0.01, 0.02, 0.5, 0.5], profile=profile,
+                                                   deadline=time.time() + 0.2, skipped=skipped))
+        self.assertEqual(sorted(fetched), [0.01, 0.02])
+        self.assertEqual(skipped, ["profile_readme"])
+        self.assertIsNone(profile.readme_content)
+
+    def _deadline_report(self, readme_delay: float):
+        """Runs analyze_user against the real repository stream until the scoring loop hits the deadline."""
+        class StreamingProvider(ShuffledProvider):
+            def stream_user_profile(self, username, deadline=None):
+                profile, _ = super().stream_user_profile(username)
+                profile.readme_content = None
+                provider = GithubProvider.__new__(GithubProvider)
+                provider.max_workers = 4
+                provider._fetch_repository = lambda i: time.sleep(0 if i < 2 else 1.5) or make_repo(i)
+                provider._fetch_profile_readme = lambda user, name: time.sleep(readme_delay) or \
+                    "# Hi, I'm Dev\n## About me\nBackend engineer.\n## Skills\nPython, Go\n## Contact\nmail"
+                skipped = []
+                stream = provider._iter_repositories(range(3), profile=profile, deadline=deadline, skipped=skipped)
+                return profile, RepositoryStream(stream, 3, skipped)
+
+        class SlowScoringService(AnalysisService):
+            def _score_repository(self, repo):
+                time.sleep(0.2)
+                super()._score_repository(repo)
+
+        # The fetch deadline (0.3s in) passes while the second repository is scored, so the service closes the stream
+        service = SlowScoringService(StreamingProvider(), StaticLLM())
+        return service.analyze_user("dev", deadline=time.time() + 1.3)
+
+    def test_deadline_keeps_readme_that_arrived_in_time(self):
+        report = self._deadline_report(readme_delay=0)
+        coverage = report.details["coverage"]
+        self.assertTrue(coverage["partial"])
+        self.assertEqual(coverage["repos_analyzed"], 2)
+        self.assertNotIn("profile_readme", coverage["stages_skipped"])
+        self.assertNotEqual(report.personal_readme_score.level, "Missing")
+        self.assertGreater(report.personal_readme_score.score, 0)
+
+    def test_deadline_reports_readme_still_in_flight(self):
+        report = self._deadline_report(readme_delay=1.5)
+        self.assertIn("profile_readme", report.details["coverage"]["stages_skipped"])
+        self.assertEqual(report.personal_readme_score.level, "Not analyzed")
+
+if __name__ == "__main__":
+    unittest.main()
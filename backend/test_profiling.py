@@ -0,0 +1,45 @@
+import time
+import unittest
+import threading
+import tracemalloc
+from types import SimpleNamespace
+from app import profiling
+
+def allocate():
+    return [bytearray(1024) for _ in range(2000)]
+
+class TestProfiling(unittest.TestCase):
+    def test_parse_mode(self):
+        self.assertEqual(profiling.parse_mode(True), "deterministic")
+        self.assertEqual(profiling.parse_mode("sampling"), "sampling")
+        self.assertIsNone(profiling.parse_mode(False))
+        self.assertIsNone(profiling.parse_mode("flamegraph"))
+
+    def test_requested_mode_reads_job_meta(self):
+        self.assertEqual(profiling.requested_mode(SimpleNamespace(meta={"profile": "sampling"})), "sampling")
+        self.assertIsNone(profiling.requested_mode(SimpleNamespace(meta={})))
+
+    def test_deterministic_profile_and_memory(self):
+        with profiling.profile_job("deterministic", "score") as profile:
+            data = allocate()
+        functions = {row["function"].split(" ")[0]: row for row in profile["functions"]}
+        self.assertEqual(functions["allocate"]["calls"], 1)
+        self.assertGreaterEqual(profile["memory"]["peak_kb"], 2000)
+        self.assertTrue(any("test_profiling.py" in a["location"] for a in profile["memory"]["top_allocations"]))
+        self.assertFalse(tracemalloc.is_tracing())
+        del data
+
+    def test_sampling_sees_other_threads(self):
+        def wait_in_thread():
+            time.sleep(0.1)
+
+        with profiling.profile_job("sampling", "fetch") as profile:
+            worker = threading.Thread(target=wait_in_thread)
+            worker.start()
+            worker.join()
+        self.assertGreater(profile["samples"], 0)
+        self.assertTrue(any("wait_in_thread" in entry["stack"] for entry in profile["stacks"]))
+        self.assertNotIn("functions", profile)
+
+if __name__ == '__main__':
+    unittest.main()
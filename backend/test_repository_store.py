@@ -0,0 +1,23 @@
+import unittest
+from app.repository_store import encode_repository, decode_repository
+from test_pipeline import make_repo
+
+class TestRepositoryEncoding(unittest.TestCase):
+    def test_round_trip_keeps_only_raw_fields(self):
+        repo = make_repo(3)
+        data = decode_repository(encode_repository(repo))
+        self.assertEqual(set(data), {"name", "file_tree", "dependency_files", "readme_content", "commit_history"})
+        self.assertEqual(data["readme_content"], repo.readme_content)
+        self.assertEqual(data["file_tree"], repo.file_tree.to_list())
+
+    def test_compact_tree_on_request(self):
+        repo = make_repo(2)
+        data = decode_repository(encode_repository(repo), ["file_tree"], compact_tree=True)
+        self.assertEqual(set(data["file_tree"]), {"segments", "parents", "names", "entries"})
+
+    def test_field_selection(self):
+        blob = encode_repository(make_repo(1))
+        self.assertEqual(set(decode_repository(blob, ["file_tree"])), {"name", "file_tree"})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,25 @@
+import unittest
+from app.result_codec import ResultCodec, SERIALIZERS, COMPRESSORS, encode_result, decode_result, is_encoded
+
+class TestResultCodec(unittest.TestCase):
+    def setUp(self):
+        self.report = {"username": "dev", "details": {"repositories": [{"name": "a", "score": 10}] * 20}}
+
+    def test_every_available_codec_round_trips(self):
+        for serializer in SERIALIZERS:
+            for compressor in COMPRESSORS:
+                codec = ResultCodec(f"{serializer}+{compressor}")
+                self.assertEqual(decode_result(codec.encode(self.report)), self.report, codec.name)
+
+    def test_plain_results_pass_through(self):
+        self.assertEqual(decode_result(self.report), self.report)
+        self.assertIsNone(decode_result(None))
+        self.assertFalse(is_encoded(b"plain bytes"))
+
+    def test_default_codec_is_self_describing(self):
+        blob = encode_result(self.report)
+        self.assertTrue(is_encoded(blob))
+        self.assertEqual(decode_result(blob), self.report)
+
+if __name__ == "__main__":
+    unittest.main()
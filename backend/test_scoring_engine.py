@@ -0,0 +1,33 @@
+import unittest
+from app.services import scoring_engine
+from app.services.scoring_engine import ScoringEngine, build_scoring_input, shutdown_shared_pool, warm_shared_pool
+from test_pipeline import make_repo
+
+class TestScoringEngine(unittest.TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutdown_shared_pool()
+
+    def test_pool_matches_in_process(self):
+        inputs = [build_scoring_input(make_repo(i)) for i in range(10)]
+        in_process = ScoringEngine(min_batch_size=1000).score_batch(inputs)
+        pooled = ScoringEngine(min_batch_size=1, chunk_size=3, max_workers=2).score_batch(inputs)
+
+        self.assertEqual(len(pooled), len(inputs))
+        self.assertEqual([r.dict() for r in in_process], [r.dict() for r in pooled])
+
+    def test_warm_pool_starts_every_process(self):
+        warm_shared_pool(max_workers=2)
+        pool = scoring_engine.get_shared_pool()
+        self.assertEqual(len(pool._processes), 2)
+        self.assertTrue(pool.submit(scoring_engine._ready).result())
+
+    def test_compact_input_drops_unused_fields(self):
+        repo = make_repo(2)
+        repo.commit_history[0].update({"sha": "abc123", "author": "dev"})
+        data = build_scoring_input(repo)
+        self.assertNotIn("html_url", data)
+        self.assertEqual(set(data["commit_history"][0]), {"message", "date"})
+
+if __name__ == "__main__":
+    unittest.main()
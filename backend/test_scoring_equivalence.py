@@ -0,0 +1,261 @@
+"""
+Seeded randomized comparison of the rule-based analyzers against the
+if-chain implementations they replaced (kept below as the reference).
+"""
+import re
+import random
+import unittest
+from datetime import datetime, timedelta, timezone
+from app.models.dtos import Repository
+from app.services.insight_engine import (
+    ProfileReadmeAnalyzer, RepoDocumentationAnalyzer, CommitHygieneAnalyzer, MaturityAnalyzer
+)
+
+# --- Reference implementations (previous if-chains) ---
+
+def legacy_profile_readme(content):
+    if not content:
+        return 0, "Missing", [], ["No README found"]
+    score, positives, negatives = 0, [], []
+    lower = content.lower()
+    checks = [
+        (("about me", "introduction", "hi, i'm"), "Includes 'About Me' / Introduction", "Missing 'About Me' section"),
+        (("tech stack", "skills", "technologies", "tools"), "Lists Tech Stack / Skills", "Missing Tech Stack / Skills section"),
+        (("contact", "social", "connect with me"), "Includes Contact / Social links", "Missing Contact / Socials section"),
+        (("github-readme-stats", "github-profile-trophy", "github-trophy", "streak-stats", "metrics"),
+         "Uses GitHub Stats / Badges", "No GitHub Stats or Badges found"),
+    ]
+    for keywords, positive, negative in checks:
+        if any(k in lower for k in keywords):
+            score += 20
+            positives.append(positive)
+        else:
+            negatives.append(negative)
+    if len(content) > 500:
+        score += 20
+        positives.append("Detailed content (> 500 chars)")
+    else:
+        negatives.append("Content is brief (< 500 chars)")
+    score = min(score, 100)
+    level = "Strong" if score >= 80 else "Adequate" if score >= 40 else "Weak"
+    return score, level, positives, negatives
+
+HEADER_GROUPS = {
+    "Installation": ["installation", "instalação", "instalación", "setup", "configuração"],
+    "Usage": ["usage", "uso", "utilização", "how to run", "como rodar", "como usar"],
+    "Getting Started": ["getting started", "começando", "primeiros passos", "empezando"],
+    "API/Docs": ["api", "documentation", "documentação", "documentación", "docs"],
+    "Contributing": ["contributing", "contribuição", "contribuyendo", "contribute"]
+}
+
+def legacy_documentation(repo):
+    readme = repo.readme_content or ""
+    if not readme:
+        return 0, "Missing", [], ["No README found"]
+    score, positives, negatives = 0, [], []
+    if len(readme) > 500:
+        score += 10
+        positives.append("Detailed README content")
+    else:
+        negatives.append("Short README content")
+    lower = readme.lower()
+    found = [name for name, keywords in HEADER_GROUPS.items() if any(k in lower for k in keywords)]
+    missing = [name for name in HEADER_GROUPS if name not in found]
+    score += 10 * len(found)
+    if found:
+        positives.append(f"Contains sections: {', '.join(found)}")
+    if missing:
+        negatives.append(f"Missing sections: {', '.join(missing)}")
+    if "```" in readme:
+        score += 20
+        positives.append("Includes code blocks/examples")
+    else:
+        negatives.append("No code blocks/examples found")
+    score = min(score, 100)
+    level = "Excellent" if score >= 80 else "Good" if score >= 50 else "Basic"
+    return score, level, positives, negatives
+
+def legacy_hygiene(history):
+    if not history:
+        return (0, "Inactive", [], ["No commit history"]), 0.0, 0.0
+    positives, negatives = [], []
+    cc_pattern = r'^(feat|fix|docs|style|refactor|perf|test|build|ci|chore|revert)(\(.+\))?: .+'
+    cc_ratio = sum(1 for c in history if re.match(cc_pattern, c.get("message", "").strip())) / len(history)
+    dates = []
+    for c in history:
+        if c.get("date"):
+            try:
+                dates.append(datetime.fromisoformat(c["date"].replace("Z", "+00:00")))
+            except ValueError:
+                pass
+    dates.sort()
+    avg_days = 0.0
+    if len(dates) >= 2:
+        deltas = [(dates[i + 1] - dates[i]).total_seconds() / 86400 for i in range(len(dates) - 1)]
+        avg_days = sum(deltas) / len(deltas)
+    avg_msg_len = sum(len(c.get("message", "")) for c in history) / len(history)
+    score = 0
+    if avg_days < 7:
+        score += 40
+        positives.append("Excellent commit frequency (Active)")
+    elif avg_days < 30:
+        score += 20
+        positives.append("Moderate commit frequency")
+    else:
+        negatives.append("Low commit frequency (> 30 days between commits)")
+    if avg_msg_len > 15:
+        score += 30
+        positives.append("Descriptive commit messages")
+    else:
+        negatives.append("Commit messages are too short/vague")
+    score += int(cc_ratio * 30)
+    if cc_ratio > 0.5:
+        positives.append("Strong adherence to Conventional Commits")
+    elif cc_ratio > 0.2:
+        positives.append("Partial usage of Conventional Commits")
+    else:
+        negatives.append("Lack of Conventional Commits (feat:, fix:)")
+    if score >= 80:
+        level = "Professional"
+    elif score >= 60:
+        level = "Hygiene"
+    elif score >= 40:
+        level = "Active"
+    elif avg_days > 60:
+        level = "Inactive"
+    else:
+        level = "Standard"
+    return (score, level, positives, negatives), cc_ratio, avg_days
+
+def legacy_maturity(repo):
+    score, positives, negatives = 0, [], []
+    for flag, points, positive, negative in (
+        (repo.has_ci, 20, "CI/CD configured (GitHub Actions, etc.)", "Add CI/CD pipelines (e.g., GitHub Actions)"),
+        (repo.has_tests, 20, "Testing framework detected", "Implement automated tests"),
+        (repo.has_docker, 10, "Containerization (Docker) detected", "Add Dockerfile for containerization"),
+        (repo.has_license, 10, "License file present", "Add a License file"),
+    ):
+        if flag:
+            score += points
+            positives.append(positive)
+        else:
+            negatives.append(negative)
+    if repo.has_ci and repo.has_tests:
+        score += 15
+        positives.append("DevOps Synergy (CI + Tests)")
+    if repo.description:
+        score += 5
+        if len(repo.description) > 30:
+            score += 5
+            positives.append("Detailed repository description")
+        if len(repo.description) > 100:
+            score += 10
+    else:
+        negatives.append("Add a detailed repository description")
+    if repo.conventional_commits_ratio > 0.5:
+        score += 10
+        positives.append("Consistent commit conventions")
+    elif repo.conventional_commits_ratio > 0.2:
+        score += 5
+    is_ghost = False
+    try:
+        last_update = datetime.fromisoformat(repo.updated_at.replace("Z", "+00:00"))
+        if last_update.tzinfo is None:
+            last_update = last_update.replace(tzinfo=timezone.utc)
+        if (datetime.now(timezone.utc) - last_update).days > 365:
+            score -= 30
+            is_ghost = True
+            negatives.append("Revive or archive this project (inactive > 1 year)")
+    except (ValueError, TypeError):
+        pass
+    score = max(0, min(score, 100))
+    academic = ["study", "bootcamp", "course", "challenge", "exercise", "estudo", "curso", "desafio"]
+    text = ((repo.description or "") + " " + repo.name + " " + " ".join(repo.topics or [])).lower()
+    is_utility = bool(repo.file_tree) and len(repo.file_tree) < 3 and bool(repo.readme_content)
+    if is_ghost:
+        level = "Archived/Ghost"
+    elif any(k in text for k in academic):
+        level = "Academic"
+    elif is_utility:
+        level = "Utility"
+    elif score >= 75:
+        level = "Production-Grade"
+        if not repo.description or not repo.readme_content:
+            level = "Prototype"
+            negatives.append("Downgraded to Prototype due to missing description/README")
+    elif score >= 45:
+        level = "Prototype"
+    else:
+        level = "Hobby"
+    return score, level, positives, negatives
+
+# --- Random inputs ---
+
+WORDS = ["about me", "skills", "contact", "metrics", "usage", "setup", "api", "docs", "contribute",
+         "getting started", "```code```", "course", "hello", "project", "tools", "instalação", "lorem ipsum"]
+
+def random_text(rng):
+    if rng.random() < 0.15:
+        return None
+    words = [rng.choice(WORDS) for _ in range(rng.randint(0, 12))]
+    return " ".join(words) + "x" * rng.choice([0, 0, 200, 600])
+
+def random_history(rng):
+    start = datetime(2024, 1, 1)
+    history = []
+    suffix = rng.choice(["", "Z"]) # Both implementations reject mixing naive and aware dates
+    for _ in range(rng.randint(0, 15)):
+        start += timedelta(days=rng.choice([0.5, 3, 10, 45, 90]))
+        message = rng.choice(["fix", "feat: add parser", "wip", "chore(ci): bump actions version", "update readme file"])
+        date = rng.choice([start.isoformat() + suffix, start.isoformat() + suffix, "not-a-date", None])
+        history.append({"message": message, "date": date})
+    return history
+
+def random_repository(rng):
+    now = datetime.now(timezone.utc)
+    updated = rng.choice([now - timedelta(days=10), now - timedelta(days=400), None])
+    return Repository(
+        name=rng.choice(["svc", "bootcamp-app", "tool", "api"]),
+        description=rng.choice([None, "", "short", "a" * 40, "b" * 120, "my course exercise"]),
+        updated_at=updated.isoformat() if updated else "bad-date",
+        html_url="",
+        has_ci=rng.random() < 0.5, has_tests=rng.random() < 0.5,
+        has_docker=rng.random() < 0.5, has_license=rng.random() < 0.5,
+        conventional_commits_ratio=rng.choice([0.0, 0.3, 0.8]),
+        topics=rng.choice([[], ["challenge"], ["web"]]),
+        file_tree=["f"] * rng.choice([0, 1, 2, 5]),
+        readme_content=random_text(rng)
+    )
+
+def as_tuple(detail):
+    return detail.score, detail.level, detail.positives, detail.negatives
+
+class TestRuleEngineEquivalence(unittest.TestCase):
+    SAMPLES = 400
+
+    def setUp(self):
+        self.rng = random.Random(1234)
+
+    def test_profile_readme(self):
+        analyzer = ProfileReadmeAnalyzer()
+        contents = [random_text(self.rng) for _ in range(self.SAMPLES)]
+        for content, detail in zip(contents, analyzer.analyze_batch(contents)):
+            self.assertEqual(as_tuple(detail), legacy_profile_readme(content), content)
+
+    def test_documentation_and_maturity(self):
+        repos = [random_repository(self.rng) for _ in range(self.SAMPLES)]
+        docs, maturity = RepoDocumentationAnalyzer(), MaturityAnalyzer()
+        for repo, doc, mat in zip(repos, docs.analyze_batch(repos), maturity.analyze_batch(repos)):
+            self.assertEqual(as_tuple(doc), legacy_documentation(repo), repo.readme_content)
+            self.assertEqual(as_tuple(mat), legacy_maturity(repo), repo)
+
+    def test_commit_hygiene(self):
+        histories = [random_history(self.rng) for _ in range(self.SAMPLES)]
+        for history, (detail, ratio, days) in zip(histories, CommitHygieneAnalyzer().analyze_batch(histories)):
+            (score, level, positives, negatives), legacy_ratio, legacy_days = legacy_hygiene(history)
+            self.assertEqual(as_tuple(detail), (score, level, positives, negatives), history)
+            self.assertAlmostEqual(ratio, legacy_ratio)
+            self.assertAlmostEqual(days, legacy_days)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+from app.models.dtos import Repository
+from app.services.scoring_rules import CompiledRuleSet, MATURITY_RULES, rows_to_table, load_rule_sets, rules_fingerprint
+from app.services.insight_engine import MaturityAnalyzer, RepoDocumentationAnalyzer, CommitHygieneAnalyzer
+
+class TestScoringRules(unittest.TestCase):
+    def test_condition_forms(self):
+        rules = CompiledRuleSet({
+            "rules": [
+                {"when": "a", "points": 10, "positive": "A", "negative": "no A"},
+                {"when": ["n", ">", 5], "points": 5},
+                {"when": {"all": ["a", {"not": "b"}]}, "points": 1, "warning": "A without B"}
+            ],
+            "levels": [{"when": ["score", ">=", 15], "level": "High"}, {"level": "Low"}]
+        })
+        results = rules.evaluate({"a": [True, False, True], "b": [False, False, True], "n": [6, None, 1]})
+
+        self.assertEqual([r.score for r in results], [16, 0, 10])
+        self.assertEqual([r.level for r in results], ["High", "Low", "Low"])
+        self.assertEqual(results[0].negatives, ["A without B"])
+        self.assertEqual(results[1].negatives, ["no A"])
+
+    def test_batch_matches_single_row(self):
+        repos = [
+            Repository(name="svc", description="A production service with a long description", readme_content="# Usage\n```x```",
+                       updated_at="2099-01-01T00:00:00Z", html_url="", has_ci=True, has_tests=True, has_docker=True,
+                       has_license=True, conventional_commits_ratio=0.7, file_tree=["a"] * 10),
+            Repository(name="old", updated_at="2001-01-01T00:00:00Z", html_url=""),
+            Repository(name="course-work", updated_at="bad-date", html_url="", readme_content="# Instalação")
+        ]
+        for analyzer in (MaturityAnalyzer(), RepoDocumentationAnalyzer()):
+            self.assertEqual(analyzer.analyze_batch(repos), [analyzer.analyze(r) for r in repos])
+
+        histories = [[], [{"date": "2024-01-01T00:00:00", "message": "feat: long enough message"}]]
+        hygiene = CommitHygieneAnalyzer()
+        self.assertEqual(hygiene.analyze_batch(histories), [hygiene.analyze(h) for h in histories])
+
+    def test_custom_rule_version_rescores_table(self):
+        spec = dict(MATURITY_RULES, version=2)
+        spec["rules"] = [dict(r) for r in MATURITY_RULES["rules"]]
+        spec["rules"][0]["points"] = 50  # CI weighs more in v2
+        analyzer = MaturityAnalyzer(rules=CompiledRuleSet(spec))
+
+        repo = Repository(name="svc", updated_at="2099-01-01T00:00:00Z", html_url="", has_ci=True)
+        table = rows_to_table([analyzer.extract_features(repo)])
+        self.assertEqual(analyzer.rules.evaluate(table)[0].score, MaturityAnalyzer().analyze(repo).score + 30)
+
+    def test_rules_fingerprint_tracks_specs(self):
+        spec = dict(MATURITY_RULES, version=2)
+        self.assertEqual(rules_fingerprint(load_rule_sets()), rules_fingerprint(load_rule_sets()))
+        self.assertNotEqual(
+            rules_fingerprint({"maturity": CompiledRuleSet(MATURITY_RULES)}),
+            rules_fingerprint({"maturity": CompiledRuleSet(spec)})
+        )
+
+if __name__ == "__main__":
+    unittest.main()
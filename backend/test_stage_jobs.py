@@ -0,0 +1,110 @@
+import os
+import unittest
+import requests
+from unittest import mock
+from datetime import datetime, timedelta, timezone
+from app import redis_client
+from app import tasks
+from app.pipeline import enqueue_analysis, stage_job_id, STAGE_QUEUES
+from app.job_store import JobStore
+from app.services.analysis_service import AnalysisService
+from app.services.llm_provider import OllamaProvider
+from test_pipeline import ShuffledProvider
+
+try:
+    import fakeredis
+    from rq import SimpleWorker, Queue
+    from rq.registry import ScheduledJobRegistry
+    from rq.scheduler import RQScheduler
+except ImportError:
+    fakeredis = None
+
+class FailingFetchService:
+    def fetch_profile(self, username, progress=None):
+        raise ConnectionError("GitHub unavailable")
+
+def unreachable_ollama_service(model_name="llama3", strict_llm=False):
+    llm = OllamaProvider(model=model_name, strict=strict_llm)
+    llm.session.post = mock.Mock(side_effect=requests.exceptions.ConnectionError("connection refused"))
+    return AnalysisService(ShuffledProvider(), llm)
+
+class TestProviderCache(unittest.TestCase):
+    def test_only_configured_models_are_cached(self):
+        with mock.patch.dict(os.environ, {"LLM_MODELS": "llama3,mistral"}), mock.patch.dict(tasks._providers, clear=True):
+            self.assertIs(tasks.get_llm_provider("mistral"), tasks.get_llm_provider("mistral"))
+            for i in range(5):
+                tasks.get_llm_provider(f"unknown-{i}")
+            self.assertEqual(list(tasks._providers), [("ollama", "mistral", False)])
+
+@unittest.skipUnless(fakeredis, "fakeredis is not installed")
+class TestStageJobs(unittest.TestCase):
+    QUEUES = ("github", "score", "llm", "default")
+
+    def setUp(self):
+        self.redis = fakeredis.FakeStrictRedis()
+        redis_client.reset_connection()
+        redis_client._connection = self.redis
+        self.patches = [
+            mock.patch.object(tasks.metrics, "flush"),
+            mock.patch("app.services.llm_provider.time.sleep"),
+            mock.patch.dict(os.environ, {"HISTORY_STORE": "none"})
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        redis_client.reset_connection()
+
+    def run_until_settled(self, rounds: int = 6) -> None:
+        """Burst workers with a scheduler; scheduled retries are made due between rounds."""
+        queues = [Queue(name, connection=self.redis) for name in self.QUEUES]
+        for _ in range(rounds):
+            SimpleWorker(queues, connection=self.redis).work(burst=True, with_scheduler=True, logging_level="WARNING")
+            due = datetime.now(timezone.utc) - timedelta(seconds=1)
+            pending = 0
+            for queue in queues:
+                registry = ScheduledJobRegistry(queue=queue)
+                for job_id in registry.get_job_ids():
+                    registry.connection.zadd(registry.key, {job_id: due.timestamp()})
+                    pending += 1
+            if not pending and not any(queue.count for queue in queues):
+                return
+
+    def test_failed_stage_with_retries_reaches_terminal_state(self):
+        with mock.patch.object(tasks, "_build_service", lambda *a, **kw: FailingFetchService()):
+            analysis_id = enqueue_analysis("dev", force_refresh=True)
+            self.run_until_settled()
+
+        fetch_job = Queue("github", connection=self.redis).fetch_job(stage_job_id(analysis_id, "fetch"))
+        self.assertEqual(fetch_job.get_status(), "failed")
+        self.assertEqual(fetch_job.retries_left, 0)
+        self.assertEqual(Queue(STAGE_QUEUES["llm"], connection=self.redis).fetch_job(analysis_id).get_status(), "canceled")
+        self.assertEqual(JobStore().get_status(analysis_id), "failed")
+
+    def test_ollama_outage_without_scheduler_returns_degraded_report(self):
+        with mock.patch.object(tasks, "_build_service", unreachable_ollama_service):
+            analysis_id = enqueue_analysis("dev", force_refresh=True)
+            queues = [Queue(name, connection=self.redis) for name in self.QUEUES]
+            SimpleWorker(queues, connection=self.redis).work(burst=True, logging_level="WARNING")
+
+        store = JobStore()
+        self.assertEqual(store.get_status(analysis_id), "finished")
+        self.assertIn("Analysis unavailable", store.get_result(analysis_id)["summary"])
+        self.assertEqual(ScheduledJobRegistry(queue=queues[2]).count, 0)
+
+    def test_ollama_outage_with_scheduler_retries_llm_stage(self):
+        # A live scheduler holds the lock of the queue it serves
+        self.redis.set(RQScheduler.get_locking_key(STAGE_QUEUES["llm"]), "scheduler")
+        with mock.patch.object(tasks, "_build_service", unreachable_ollama_service):
+            analysis_id = enqueue_analysis("dev", force_refresh=True)
+            queues = [Queue(name, connection=self.redis) for name in self.QUEUES]
+            SimpleWorker(queues, connection=self.redis).work(burst=True, logging_level="WARNING")
+
+        llm_job = Queue(STAGE_QUEUES["llm"], connection=self.redis).fetch_job(analysis_id)
+        self.assertEqual(llm_job.get_status(), "scheduled")
+        self.assertIn(analysis_id, ScheduledJobRegistry(queue=queues[2]).get_job_ids())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import threading
+import unittest
+import concurrent.futures
+from app import tracing
+
+class TestTracing(unittest.TestCase):
+    def setUp(self):
+        tracing.set_enabled(True)
+        self.exporter = tracing.InMemoryExporter()
+        tracing.set_exporter(self.exporter)
+
+    def tearDown(self):
+        tracing.set_enabled(False)
+        tracing.set_exporter(None)
+
+    def test_disabled_spans_are_shared_noops(self):
+        tracing.set_enabled(False)
+        with tracing.start_trace("fetch") as trace:
+            self.assertIsNone(trace)
+            self.assertIs(tracing.span("a"), tracing.span("b"))
+        self.assertEqual(len(self.exporter.spans), 0)
+
+    def test_spans_outside_a_trace_are_not_recorded(self):
+        with tracing.span("orphan"):
+            pass
+        self.assertEqual(len(self.exporter.spans), 0)
+
+    def test_nested_spans_and_breakdown(self):
+        @tracing.traced("collector")
+        def collect():
+            return 1
+
+        with tracing.start_trace("score", "job-1") as trace:
+            with tracing.span("outer", repos=2) as outer:
+                collect()
+                collect()
+                outer.set(done=True)
+        spans = {s["name"]: s for s in self.exporter.spans}
+        self.assertEqual(spans["collector"]["parent_id"], spans["outer"]["span_id"])
+        self.assertEqual(spans["outer"]["attrs"], {"repos": 2, "done": True})
+        breakdown = trace.breakdown()
+        self.assertEqual(breakdown["stage"], "score")
+        self.assertEqual(breakdown["spans"]["collector"]["count"], 2)
+
+    def test_bind_carries_the_trace_into_pool_threads(self):
+        def fetch():
+            with tracing.span("fetch"):
+                return threading.current_thread().name
+
+        with tracing.start_trace("fetch"):
+            with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+                threads = [f.result() for f in [executor.submit(tracing.bind(fetch)) for _ in range(3)]]
+        self.assertEqual(len(self.exporter.spans), 3)
+        self.assertNotIn(threading.current_thread().name, threads)
+
+    def test_errors_are_recorded(self):
+        with self.assertRaises(ValueError):
+            with tracing.start_trace("llm"):
+                with tracing.span("llm.request"):
+                    raise ValueError("boom")
+        self.assertEqual(self.exporter.spans[0]["error"], "ValueError: boom")
+
+if __name__ == "__main__":
+    unittest.main()
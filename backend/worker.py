@@ -14,17 +14,42 @@ load_dotenv()
 # macOS specific hack to avoid fork safety issues with some libraries
 os.environ["OBJC_DISABLE_INITIALIZE_FORK_SAFETY"] = "YES"
 
-listen = ['default']
+# Analysis stage queues plus 'default' for single-job analyses (ANALYSIS_STAGED=0).
+# Set WORKER_QUEUES (e.g. "github" or "llm") to run a worker dedicated to one stage.
+listen = [q.strip() for q in os.getenv('WORKER_QUEUES', 'github,score,llm,default').split(',') if q.strip()]
+
+# WORKER_PROCESSES > 1 (or WORKER_MAX_PROCESSES) starts a supervised pool of forked
+# worker processes (Linux), each keeping warm providers across jobs.
+processes = int(os.getenv('WORKER_PROCESSES', '1'))
+max_processes = int(os.getenv('WORKER_MAX_PROCESSES', '0')) or None
+max_jobs = int(os.getenv('WORKER_MAX_JOBS', '0')) or None # Recycle a process after this many jobs
+warm_models = [m.strip() for m in os.getenv('WORKER_WARM_MODELS', 'llama3').split(',') if m.strip()]
 
 if __name__ == '__main__':
     try:
         conn = get_redis_connection()
-        # Explicitly pass connection to Queues
-        queues = [Queue(name, connection=conn) for name in listen]
-        
-        # Use SimpleWorker to avoid fork() issues on macOS, passing connection explicitly
-        worker = SimpleWorker(queues, connection=conn)
-        print(f"🚀 Worker started (Simple/No-Fork). Listening on queues: {', '.join(listen)}")
-        worker.work()
+
+        if processes > 1 or max_processes:
+            from app.worker_pool import AnalysisWorkerPool, preload
+            preload()
+            pool = AnalysisWorkerPool(
+                listen, connection=conn, num_workers=processes, max_workers=max_processes,
+                jobs_per_worker=int(os.getenv('WORKER_JOBS_PER_PROCESS', '2')),
+                max_jobs=max_jobs, warm_models=warm_models
+            )
+            scaling = f", autoscaling up to {pool.max_workers}" if pool.max_workers else ""
+            print(f"🚀 Worker pool started with {processes} processes{scaling}. Listening on queues: {', '.join(listen)}")
+            pool.start()
+        else:
+            from app.tasks import warm_up
+            warm_up(warm_models, queues=listen)
+            # Explicitly pass connection to Queues
+            queues = [Queue(name, connection=conn) for name in listen]
+
+            # Use SimpleWorker to avoid fork() issues on macOS, passing connection explicitly
+            worker = SimpleWorker(queues, connection=conn)
+            print(f"🚀 Worker started (Simple/No-Fork). Listening on queues: {', '.join(listen)}")
+            # Stage retries wait in the scheduled registry, which only a scheduler drains
+            worker.work(max_jobs=max_jobs, with_scheduler=True)
     except Exception as e:
         print(f"❌ Worker failed to start: {e}")
@@ -36,10 +36,11 @@ def debug_full_flow(username):
         print(f"GitHub Fetch Failed: {e}")
         return
 
-    # 3. Prepare Context
+    # 3. Score repositories and prepare the LLM context
     llm_provider = OllamaProvider(model="llama3")
     service = AnalysisService(gh_provider, llm_provider)
-    context = service._prepare_context(user_profile)
+    service.score_repositories(user_profile.repositories)
+    context = service.summarize(user_profile)["context"]
     print("\n--- Generated Context (First 500 chars) ---")
     print(context[:500])
     print(" কুক\n")
@@ -7,9 +7,20 @@ import { useGithubAnalysis } from './hooks/useGithubAnalysis';
 import ReactMarkdown from 'react-markdown';
 
 const App: React.FC = () => {
-  const { data, loading, error, status, analyzeProfile } = useGithubAnalysis();
+  const { data, loading, error, status, progress, analyzeProfile, cancelAnalysis } = useGithubAnalysis();
 
   const getStatusMessage = () => {
+      if (progress && status === 'started') {
+          switch(progress.phase) {
+              case 'fetching':
+                  return progress.total
+                      ? `Fetching repositories (${progress.done ?? 0}/${progress.total})...`
+                      : 'Fetching repositories...';
+              case 'scoring': return 'Scoring repositories...';
+              case 'llm': return 'Generating career roadmap (this may take a minute)...';
+              case 'finalizing': return 'Finalizing report...';
+          }
+      }
       switch(status) {
           case 'queued': return 'Analysis queued...';
           case 'started': return 'Analyzing profile (this may take a minute)...';
@@ -42,6 +53,15 @@ const App: React.FC = () => {
                 <div className="inline-block animate-pulse text-sm font-medium text-gray-400 uppercase tracking-widest">
                     {getStatusMessage()}
                 </div>
+                <div className="mt-4">
+                    <button
+                        type="button"
+                        onClick={cancelAnalysis}
+                        className="text-xs font-medium text-gray-400 hover:text-gray-600 underline underline-offset-4"
+                    >
+                        Cancel
+                    </button>
+                </div>
             </div>
         )}
 
@@ -72,6 +92,12 @@ const App: React.FC = () => {
                        <div className="prose prose-lg text-gray-600 max-w-none leading-relaxed">
                           <ReactMarkdown>{data.summary}</ReactMarkdown>
                        </div>
+                       {data.details.coverage?.partial && (
+                           <p className="mt-6 text-xs text-gray-400">
+                               Partial report: {data.details.coverage.repos_analyzed} of {data.details.coverage.repos_requested} repositories analyzed
+                               {data.details.coverage.stages_skipped.length > 0 && ` (skipped: ${data.details.coverage.stages_skipped.join(', ')})`}.
+                           </p>
+                       )}
                    </div>
                    
                    <div className="hidden lg:block w-px bg-gray-100 mx-4"></div>
@@ -89,6 +115,11 @@ const App: React.FC = () => {
                        }`}>
                            {data.overall_score.level}
                        </div>
+                       {data.details.percentiles?.scores.overall_score != null && data.details.percentiles.population > 1 && (
+                           <span className="-mt-6 mb-10 text-xs text-gray-400">
+                               Top {Math.max(1, Math.round(100 - data.details.percentiles.scores.overall_score))}% of {data.details.percentiles.population} analyzed profiles
+                           </span>
+                       )}
                        
                        <div className="w-full flex justify-between gap-8 px-4">
                            <div className="flex flex-col items-center">
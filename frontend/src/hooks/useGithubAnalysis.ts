@@ -1,12 +1,14 @@
-import { useState, useCallback } from 'react';
-import { AnalysisReport, ApiError, JobStatus } from '../types';
+import { useState, useCallback, useEffect, useRef } from 'react';
+import { AnalysisProgress, AnalysisReport, ApiError, JobStatus } from '../types';
 
 interface UseGithubAnalysisResult {
     data: AnalysisReport | null;
     loading: boolean;
     error: string | null;
     status: string;
+    progress: AnalysisProgress | null;
     analyzeProfile: (username: string) => Promise<void>;
+    cancelAnalysis: () => void;
 }
 
 const API_BASE_URL = 'http://localhost:5001/api';
@@ -16,6 +18,12 @@ export const useGithubAnalysis = (): UseGithubAnalysisResult => {
   const [loading, setLoading] = useState<boolean>(false);
   const [error, setError] = useState<string | null>(null);
   const [status, setStatus] = useState<string>('idle');
+  const [progress, setProgress] = useState<AnalysisProgress | null>(null);
+  // The active job and a function that stops listening to it (closes the stream or polling)
+  const activeJob = useRef<string | null>(null);
+  // Our subscription to the active job; it may be shared with other clients
+  const subscription = useRef<string | null>(null);
+  const stopListening = useRef<() => void>(() => {});
 
   const pollStatus = useCallback(async (jobId: string) => {
     const intervalId = setInterval(async () => {
@@ -29,10 +37,12 @@ export const useGithubAnalysis = (): UseGithubAnalysisResult => {
 
             if (jobStatus.status === 'finished' && jobStatus.result) {
                 clearInterval(intervalId);
+                activeJob.current = null;
                 setData(jobStatus.result);
                 setLoading(false);
-            } else if (jobStatus.status === 'failed') {
+            } else if (jobStatus.status === 'failed' || jobStatus.status === 'canceled') {
                 clearInterval(intervalId);
+                activeJob.current = null;
                 setError(jobStatus.error || 'Analysis failed');
                 setLoading(false);
             }
@@ -43,12 +53,64 @@ export const useGithubAnalysis = (): UseGithubAnalysisResult => {
             setLoading(false);
         }
     }, 2000);
+    stopListening.current = () => clearInterval(intervalId);
   }, []);
 
+  // Server-Sent Events: the worker pushes phase transitions and the final result once.
+  // Falls back to polling when EventSource is unavailable or the stream drops.
+  const streamStatus = useCallback((jobId: string) => {
+    if (typeof EventSource === 'undefined') {
+        pollStatus(jobId);
+        return;
+    }
+
+    const source = new EventSource(`${API_BASE_URL}/stream/${jobId}`);
+    let settled = false;
+    stopListening.current = () => {
+        settled = true;
+        source.close();
+    };
+
+    source.addEventListener('progress', (event) => {
+        const update: AnalysisProgress = JSON.parse((event as MessageEvent).data);
+        setStatus('started');
+        setProgress(update);
+    });
+
+    source.addEventListener('result', (event) => {
+        settled = true;
+        source.close();
+        activeJob.current = null;
+        setStatus('finished');
+        setData(JSON.parse((event as MessageEvent).data));
+        setLoading(false);
+    });
+
+    source.addEventListener('failed', (event) => {
+        settled = true;
+        source.close();
+        activeJob.current = null;
+        const payload = JSON.parse((event as MessageEvent).data);
+        setStatus('failed');
+        setError(payload.error || 'Analysis failed');
+        setLoading(false);
+    });
+
+    const fallback = () => {
+        if (settled) return;
+        settled = true;
+        source.close();
+        pollStatus(jobId);
+    };
+    source.addEventListener('timeout', fallback);
+    source.onerror = fallback;
+  }, [pollStatus]);
+
   const analyzeProfile = async (username: string) => {
     setLoading(true);
     setError(null);
     setData(null);
+    setProgress(null);
     setStatus('starting');
 
     try {
@@ -69,7 +131,9 @@ export const useGithubAnalysis = (): UseGithubAnalysisResult => {
       // result should be { message: "...", job_id: "...", status_url: "..." }
       
       if (result.job_id) {
-          pollStatus(result.job_id);
+          activeJob.current = result.job_id;
+          subscription.current = result.subscription ?? null;
+          streamStatus(result.job_id);
       } else {
           throw new Error('No job ID returned');
       }
@@ -84,5 +148,31 @@ export const useGithubAnalysis = (): UseGithubAnalysisResult => {
     }
   };
 
-  return { data, loading, error, status, analyzeProfile };
-};
\ No newline at end of file
+  // Tells the backend to stop the active job, so abandoned analyses don't keep workers busy
+  const cancelAnalysis = useCallback(() => {
+    const jobId = activeJob.current;
+    if (!jobId) return;
+    const token = subscription.current;
+    activeJob.current = null;
+    subscription.current = null;
+    stopListening.current();
+    // Only our subscription is dropped; the backend cancels the job once nobody else is waiting for it.
+    // keepalive lets the request finish while the page is unloading
+    if (token) {
+        fetch(`${API_BASE_URL}/jobs/${jobId}?subscription=${encodeURIComponent(token)}`, { method: 'DELETE', keepalive: true }).catch(() => {});
+    }
+    setStatus('canceled');
+    setProgress(null);
+    setLoading(false);
+  }, []);
+
+  useEffect(() => {
+    window.addEventListener('pagehide', cancelAnalysis);
+    return () => {
+        window.removeEventListener('pagehide', cancelAnalysis);
+        cancelAnalysis();
+    };
+  }, [cancelAnalysis]);
+
+  return { data, loading, error, status, progress, analyzeProfile, cancelAnalysis };
+};
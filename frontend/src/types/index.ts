@@ -41,6 +41,19 @@ export interface Repository {
     is_ghost?: boolean;
 }
 
+export interface AnalysisCoverage {
+    partial: boolean;
+    repos_analyzed: number;
+    repos_requested: number;
+    stages_skipped: string[];
+}
+
+export interface AnalysisPercentiles {
+    population: number;
+    scores: Record<string, number | null>;
+    languages: Record<string, Record<string, number | null>>;
+}
+
 export interface AnalysisDetails {
     repo_count?: number;
     followers?: number;
@@ -49,6 +62,8 @@ export interface AnalysisDetails {
     experimentation_stack?: string[];
     career_roadmap?: CareerRoadmapStep[];
     repositories?: Repository[];
+    coverage?: AnalysisCoverage;
+    percentiles?: AnalysisPercentiles;
     [key: string]: unknown;
 }
 
@@ -73,7 +88,16 @@ export interface ApiError {
 
 export interface JobStatus {
     job_id: string;
-    status: 'queued' | 'started' | 'deferred' | 'finished' | 'failed' | 'unknown';
+    status: 'queued' | 'started' | 'deferred' | 'finished' | 'failed' | 'canceled' | 'unknown';
     result?: AnalysisReport;
     error?: string;
-}
\ No newline at end of file
+}
+
+export interface AnalysisProgress {
+    job_id: string;
+    phase: 'fetching' | 'scoring' | 'llm' | 'finalizing' | 'completed';
+    done?: number;
+    total?: number | null;
+    model?: string | null;
+    ts: number;
+}